@@ -0,0 +1,84 @@
+"""CPU accounting overhead benchmark
+
+This benchmark runs a workload of greenlets which compute Fibonacci numbers recursively, bounce a
+byte over socket pairs, and spawn short-lived greenlets with `guv.spawn_n()`, and compares its best
+run time out of 5:
+
+- without accounting
+- with `guv.util.accounting.CPUAccounting`, which charges time on every switch
+- with `guv.util.sampling.SamplingProfiler` at 100 Hz, for comparison
+
+It then prints the accounting tables of the last run.
+
+Usage::
+
+    python bench_accounting.py [iterations]
+"""
+import sys
+import time
+
+import guv
+from guv.greenio import socketpair
+from guv.util.accounting import CPUAccounting
+from guv.util.sampling import SamplingProfiler
+
+
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+def noop():
+    pass
+
+
+def work(sock, n):
+    for _ in range(n):
+        fib(10)
+        guv.spawn_n(noop)
+        sock.sendall(b'x')
+        sock.recv(1)
+
+
+def run(n, concurrency=10):
+    """:return: elapsed time
+    """
+    pairs = [socketpair() for _ in range(concurrency // 2)]
+    start = time.perf_counter()
+    gts = [guv.spawn(work, sock, n) for pair in pairs for sock in pair]
+    for gt in gts:
+        gt.wait()
+    elapsed = time.perf_counter() - start
+    for a, b in pairs:
+        a.close()
+        b.close()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    names = ['none', 'accounting', 'sampling (100 Hz)']
+    times = {name: [] for name in names}
+
+    # the modes are interleaved, so that they are equally affected by other load on the machine
+    for _ in range(5):
+        for name in names:
+            if name == 'accounting':
+                with CPUAccounting() as accounting:
+                    times[name].append(run(n))
+            elif name.startswith('sampling'):
+                with SamplingProfiler(hz=100):
+                    times[name].append(run(n))
+            else:
+                times[name].append(run(n))
+
+    baseline = min(times['none'])
+    for name in names:
+        elapsed = min(times[name])
+        print('{}: {:.3f}s ({:+.1f}%)'.format(name, elapsed, (elapsed / baseline - 1) * 100))
+    switches = sum(stats['switches'] for stats in accounting.entry_point_stats())
+    print('{} switches per run'.format(switches))
+    print()
+    print(accounting.format_top(5))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Scheduled callback benchmark
+
+This benchmark measures:
+
+- the throughput of callbacks scheduled with `schedule_call_now()`
+- the latency of socket I/O while a spawn storm (many greenlets yielding to each other) keeps the
+  hub busy running scheduled callbacks, with and without a callback budget
+
+Usage::
+
+    python bench_callbacks.py [num_greenlets]
+"""
+import sys
+import time
+
+import guv
+from guv.greenio import socketpair
+from guv.hubs import get_hub
+
+
+def bench_schedule(n):
+    hub = get_hub()
+
+    def cb(arg):
+        pass
+
+    start = time.perf_counter()
+    for i in range(n):
+        hub.schedule_call_now(cb, i)
+
+    guv.gyield()
+    return time.perf_counter() - start
+
+
+def bench_io_latency(n, budget):
+    """Measure socket round trip latency while `n` greenlets each yield 10 times
+
+    :return: (elapsed, max latency, number of round trips)
+    """
+    hub = get_hub()
+    hub.callback_budget = budget
+    a, b = socketpair()
+    done = []
+    latencies = []
+
+    def echo():
+        while True:
+            data = b.recv(1)
+            if not data:
+                break
+            b.sendall(data)
+
+    def ping():
+        while not done:
+            start = time.perf_counter()
+            a.sendall(b'x')
+            a.recv(1)
+            latencies.append(time.perf_counter() - start)
+
+    def work():
+        for _ in range(10):
+            guv.gyield()
+
+    guv.spawn(echo)
+    pinger = guv.spawn(ping)
+    guv.gyield()
+
+    start = time.perf_counter()
+    pool = guv.GreenPool(n)
+    for _ in range(n):
+        pool.spawn_n(work)
+    pool.waitall()
+    elapsed = time.perf_counter() - start
+
+    done.append(True)
+    pinger.wait()
+    a.close()
+    b.close()
+    return elapsed, max(latencies), len(latencies)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    elapsed = bench_schedule(n * 10)
+    print('schedule + run {} callbacks: {:.3f}s ({:.0f} callbacks/sec)'
+          .format(n * 10, elapsed, n * 10 / elapsed))
+
+    for budget in [None, get_hub().callback_budget]:
+        elapsed, max_latency, round_trips = bench_io_latency(n, budget)
+        print('budget {}: {} greenlets x 10 yields: {:.3f}s, {} round trips, max latency {:.1f}ms'
+              .format(budget, n, elapsed, round_trips, max_latency * 1000))
+
+
+if __name__ == '__main__':
+    main()
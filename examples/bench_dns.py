@@ -0,0 +1,80 @@
+"""DNS resolver benchmark
+
+This benchmark measures the rate of `getaddrinfo()` lookups made by many concurrent greenlets, while
+a ticker greenlet measures how responsive the hub is, with each resolver:
+
+- blocking: the socket module's `getaddrinfo()`, which blocks the hub
+- uvdns: `guv.support.uvdns`, which runs lookups in libuv's thread pool (or guv.tpool)
+- greendns: `guv.support.greendns` (if dnspython is installed)
+
+The names are resolved with the system resolver by the blocking and uvdns resolvers, so names in
+/etc/hosts don't require network access.
+
+Usage::
+
+    python bench_dns.py [num_lookups] [concurrency] [name ...]
+"""
+import socket
+import sys
+import time
+
+import guv
+from guv.support import uvdns
+
+try:
+    from guv.support import greendns
+except ImportError:
+    greendns = None
+
+
+def run(getaddrinfo, names, n, concurrency):
+    """Look up `names` `n` times in total from `concurrency` greenlets
+
+    :return: (elapsed, maximum interval between ticks)
+    """
+    done = []
+    ticks = []
+
+    def ticker():
+        while not done:
+            ticks.append(time.perf_counter())
+            guv.sleep(0.001)
+
+    def lookup(i):
+        getaddrinfo(names[i % len(names)], 80, 0, socket.SOCK_STREAM)
+
+    ticker_gt = guv.spawn(ticker)
+    guv.gyield()
+
+    start = time.perf_counter()
+    pool = guv.GreenPool(concurrency)
+    for i in range(n):
+        pool.spawn_n(lookup, i)
+    pool.waitall()
+    elapsed = time.perf_counter() - start
+
+    guv.sleep(0.002)
+    done.append(True)
+    ticker_gt.wait()
+    max_interval = max(b - a for a, b in zip(ticks, ticks[1:]))
+    return elapsed, max_interval
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    names = sys.argv[3:] or ['localhost', socket.gethostname()]
+
+    resolvers = [('blocking', socket.getaddrinfo), ('uvdns', uvdns.getaddrinfo)]
+    if greendns:
+        resolvers.append(('greendns', greendns.getaddrinfo))
+
+    for name, getaddrinfo in resolvers:
+        elapsed, max_interval = run(getaddrinfo, names, n, concurrency)
+        print('{}: {} lookups, concurrency {}: {:.3f}s ({:.0f} lookups/sec), '
+              'max tick interval {:.1f}ms'
+              .format(name, n, concurrency, elapsed, n / elapsed, max_interval * 1000))
+
+
+if __name__ == '__main__':
+    main()
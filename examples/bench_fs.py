@@ -0,0 +1,95 @@
+"""Regular-file I/O benchmark
+
+This benchmark reads a large file (evicted from the page cache before each run, where supported)
+in chunks and with a single `read()`, while a ticker greenlet measures how responsive the hub is:
+
+- with the built-in `open()`, which blocks the hub
+- with `guv.fs.open()`, with and without readahead
+
+Usage::
+
+    python bench_fs.py [size_mb]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import guv
+from guv import fs
+
+
+def consume(chunk):
+    """Simulate processing a chunk, such as sending it to a client
+    """
+    guv.sleep(0)
+
+
+def evict(path):
+    """Evict the file from the page cache, so that it is read from disk
+    """
+    if hasattr(os, 'posix_fadvise'):
+        fd = os.open(path, os.O_RDONLY)
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(fd)
+
+
+def run(path, chunked, open_fn, **kwargs):
+    """Read the file
+
+    :return: (elapsed, number of ticks, maximum interval between ticks)
+    """
+    evict(path)
+    done = []
+    ticks = []
+
+    def ticker():
+        while not done:
+            ticks.append(time.perf_counter())
+            guv.sleep(0.001)
+
+    ticker_gt = guv.spawn(ticker)
+    guv.gyield()
+
+    start = time.perf_counter()
+    with open_fn(path, 'rb', **kwargs) as f:
+        if chunked:
+            for chunk in iter(lambda: f.read(fs.DEFAULT_BUFFER_SIZE), b''):
+                consume(chunk)
+        else:
+            consume(f.read())
+    elapsed = time.perf_counter() - start
+
+    guv.sleep(0.002)
+    done.append(True)
+    ticker_gt.wait()
+    max_interval = max(b - a for a, b in zip(ticks, ticks[1:]))
+    return elapsed, len(ticks), max_interval
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+
+    fd, path = tempfile.mkstemp()
+    try:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            os.write(fd, chunk)
+        os.close(fd)
+
+        for chunked in [True, False]:
+            for name, open_fn, kwargs in [('open()', open, {}),
+                                          ('fs.open()', fs.open, {}),
+                                          ('fs.open(readahead=True)', fs.open,
+                                           {'readahead': True})]:
+                elapsed, ticks, max_interval = run(path, chunked, open_fn, **kwargs)
+                print('{} {}: {} MB in {:.3f}s ({:.0f} MB/s), {} ticks, max tick interval {:.1f}ms'
+                      .format(name, 'chunks' if chunked else 'read()', size_mb, elapsed,
+                              size_mb / elapsed, ticks, max_interval * 1000))
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""greendns benchmark
+
+This benchmark runs a local DNS server (which answers after a simulated network latency).
+
+It first looks up a few names many times from concurrent greenlets, like a crawler fetching many
+URLs of the same hosts:
+
+- uncached: with `greendns.resolver.query()`, which makes a query for each lookup (other than
+  dnspython's own cache of positive answers, which doesn't help concurrent lookups)
+- cached: with `greendns.resolve()`, which caches answers (including names which don't exist) and
+  makes one query for concurrent lookups of the same name
+
+It then resolves many distinct names at once, like a service discovery sweep:
+
+- with `greendns.resolve()` from concurrent greenlets, which use a socket per query
+- with `greendns.resolve_many()`, which multiplexes the queries over a few sockets
+
+Usage::
+
+    python bench_greendns.py [num_lookups] [concurrency] [latency_ms]
+"""
+import sys
+import time
+
+import dns.message
+import dns.rcode
+import dns.rrset
+
+import guv
+from guv.green import socket
+from guv.support import greendns
+
+NAMES = ['host{}.example.com'.format(i) for i in range(8)] + ['nx.example.com']
+
+
+def serve(sock, latency, queries, clients):
+    """Answer queries for A records after `latency` seconds
+
+    Names starting with "nx." don't exist.
+    """
+    def answer(wire, addr):
+        guv.sleep(latency)
+        query = dns.message.from_wire(wire)
+        response = dns.message.make_response(query)
+        name = query.question[0].name
+        if name.to_text().startswith('nx.'):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        else:
+            response.answer.append(dns.rrset.from_text(name, 300, 'IN', 'A', '10.0.0.1'))
+        sock.sendto(response.to_wire(), addr)
+
+    while True:
+        wire, addr = sock.recvfrom(65535)
+        queries.append(wire)
+        clients.add(addr)
+        guv.spawn_n(answer, wire, addr)
+
+
+def lookup(resolve, name):
+    try:
+        resolve(name)
+    except Exception:
+        # NXDOMAIN
+        pass
+
+
+def run(resolve, names, n, concurrency):
+    start = time.perf_counter()
+    pool = guv.GreenPool(concurrency)
+    for i in range(n):
+        pool.spawn_n(lookup, resolve, names[i % len(names)])
+    pool.waitall()
+    return time.perf_counter() - start
+
+
+def run_many(names):
+    start = time.perf_counter()
+    for _ in greendns.resolve_many(names):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind(('127.0.0.1', 0))
+    queries = []
+    clients = set()
+    guv.spawn(serve, sock, latency, queries, clients)
+
+    def reset():
+        greendns.reset()
+        resolver = greendns.resolver.get_resolver()
+        resolver.nameservers = ['127.0.0.1']
+        resolver.port = sock.getsockname()[1]
+        del queries[:]
+        clients.clear()
+
+    for name, resolve in [('uncached', lambda name: greendns.resolver.query(name)),
+                          ('cached', greendns.resolve)]:
+        reset()
+        elapsed = run(resolve, NAMES, n, concurrency)
+        print('{}: {} lookups of {} names, concurrency {}: {:.3f}s ({:.0f} lookups/sec), '
+              '{} queries sent'.format(name, n, len(NAMES), concurrency, elapsed, n / elapsed,
+                                       len(queries)))
+
+    print('cache stats: {}'.format(greendns.cache.stats()))
+
+    names = ['sweep{}.example.com'.format(i) for i in range(n // 5)]
+    for name in ['resolve()', 'resolve_many()']:
+        reset()
+        if name == 'resolve()':
+            elapsed = run(greendns.resolve, names, len(names), concurrency)
+        else:
+            elapsed = run_many(names)
+        print('{}: {} distinct names: {:.3f}s ({:.0f} lookups/sec), {} queries from {} sockets'
+              .format(name, len(names), elapsed, len(names) / elapsed, len(queries),
+                      len(clients)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""pyuv_cffi handle benchmark
+
+This benchmark measures the cost of creating, starting and closing pyuv_cffi handles, as done by
+the hub for every new socket:
+
+- creating, starting and closing handles one at a time
+- opening many handles, keeping all of them alive, and closing them
+
+Usage::
+
+    python bench_handles.py [num_handles] [num_live_handles]
+"""
+import socket
+import sys
+import time
+
+import pyuv_cffi
+
+
+def bench_timer_handles(loop, n):
+    def cb(timer_h):
+        pass
+
+    start = time.perf_counter()
+    for i in range(n):
+        timer_h = pyuv_cffi.Timer(loop)
+        timer_h.start(cb, 10, 0)
+        timer_h.stop()
+        timer_h.close()
+
+        if i % 1000 == 0:
+            # run close callbacks
+            loop.run(pyuv_cffi.UV_RUN_NOWAIT)
+
+    loop.run(pyuv_cffi.UV_RUN_NOWAIT)
+    return time.perf_counter() - start
+
+
+def bench_live_handles(loop, n):
+    """Open `n` poll and `n` timer handles, then close all of them
+    """
+    sock = socket.socket()
+    start = time.perf_counter()
+    handles = []
+    for i in range(n):
+        handles.append(pyuv_cffi.Poll(loop, sock.fileno()))
+        handles.append(pyuv_cffi.Timer(loop))
+
+    for handle in handles:
+        handle.close()
+
+    loop.run(pyuv_cffi.UV_RUN_NOWAIT)
+    elapsed = time.perf_counter() - start
+    sock.close()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    loop = pyuv_cffi.Loop.default_loop()
+
+    elapsed = bench_timer_handles(loop, n)
+    print('create + start + close {} timer handles: {:.3f}s ({:.0f} handles/sec)'
+          .format(n, elapsed, n / elapsed))
+
+    n_live = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    elapsed = bench_live_handles(loop, n_live)
+    print('open + close {} poll and {} timer handles: {:.3f}s ({:.0f} handles/sec)'
+          .format(n_live, n_live, elapsed, 2 * n_live / elapsed))
+
+
+if __name__ == '__main__':
+    main()
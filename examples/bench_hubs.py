@@ -0,0 +1,34 @@
+"""Hub comparison benchmark
+
+This runs the trampoline and timer benchmarks once for every available hub, by setting the
+``GUV_HUB`` environment variable for a subprocess.
+
+Usage::
+
+    python bench_hubs.py [hub ...]
+"""
+import os
+import subprocess
+import sys
+
+HUBS = ['pyuv_cffi', 'epoll', 'uring']
+BENCHMARKS = [['bench_trampoline.py', '100000'], ['bench_timers.py', '50000']]
+
+
+def main():
+    hubs = sys.argv[1:] or HUBS
+    thisdir = os.path.dirname(os.path.realpath(__file__))
+
+    for hub in hubs:
+        print('hub: {}'.format(hub))
+        env = dict(os.environ, GUV_HUB=hub)
+        for args in BENCHMARKS:
+            cmd = [sys.executable, os.path.join(thisdir, args[0])] + args[1:]
+            output = subprocess.check_output(cmd, env=env, cwd=thisdir,
+                                             stderr=subprocess.DEVNULL)
+            for line in output.decode().splitlines():
+                print('    {}'.format(line))
+
+
+if __name__ == '__main__':
+    main()
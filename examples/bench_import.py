@@ -0,0 +1,51 @@
+"""Import time benchmark
+
+This benchmark measures how long it takes a fresh interpreter to ``import guv``, which is paid by
+every worker process on startup. On Python 3.7 and newer, the cumulative import time of pyuv_cffi
+is also reported, as measured by ``python -X importtime``.
+
+Usage::
+
+    python bench_import.py [num_runs]
+"""
+import os
+import subprocess
+import sys
+import time
+
+
+def run_import(thisdir):
+    start = time.perf_counter()
+    subprocess.check_call([sys.executable, '-c', 'import guv'], cwd=thisdir,
+                          stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def pyuv_cffi_importtime(thisdir):
+    """Return the cumulative import time of pyuv_cffi (in seconds) reported by `-X importtime`
+    """
+    output = subprocess.check_output([sys.executable, '-X', 'importtime', '-c', 'import guv'],
+                                     cwd=thisdir, stderr=subprocess.STDOUT)
+    for line in output.decode().splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == 'pyuv_cffi':
+            return int(fields[1]) / 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    thisdir = os.path.dirname(os.path.realpath(__file__))
+
+    times = sorted(run_import(thisdir) for _ in range(n))
+    print('import guv: min {:.3f}s, median {:.3f}s ({} runs)'.format(times[0], times[n // 2], n))
+
+    if sys.version_info >= (3, 7):
+        print('import pyuv_cffi (cumulative): {:.3f}s'.format(pyuv_cffi_importtime(thisdir)))
+
+    import pyuv_cffi
+    print('pyuv_cffi bindings: {}'.format('prebuilt' if pyuv_cffi.prebuilt else 'ffi.verify()'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Process pool benchmark
+
+This benchmark runs CPU-bound work while a ticker greenlet measures how responsive the hub is:
+
+- directly on the hub
+- with `guv.procpool.ProcessPool.map()`
+
+It then measures the throughput of many small tasks submitted in bulk with `map()` and
+`imap_unordered()`, compared with one `execute()` call at a time.
+
+Usage::
+
+    python bench_procpool.py [num_tasks]
+"""
+import sys
+import time
+
+import guv
+from guv.procpool import ProcessPool
+
+
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+def square(x):
+    return x * x
+
+
+def run_cpu(n, pool):
+    """Compute `fib(22)` `n` times, either on the hub or in the pool
+
+    :return: (elapsed, number of ticks, maximum interval between ticks)
+    """
+    done = []
+    ticks = []
+
+    def ticker():
+        while not done:
+            ticks.append(time.perf_counter())
+            guv.sleep(0.001)
+
+    ticker_gt = guv.spawn(ticker)
+    guv.gyield()
+
+    start = time.perf_counter()
+    if pool:
+        pool.map(fib, [22] * n)
+    else:
+        for _ in range(n):
+            fib(22)
+    elapsed = time.perf_counter() - start
+
+    guv.sleep(0.002)
+    done.append(True)
+    ticker_gt.wait()
+    max_interval = max(b - a for a, b in zip(ticks, ticks[1:]))
+    return elapsed, len(ticks), max_interval
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pool = ProcessPool()
+
+    for use_pool in [False, True]:
+        elapsed, ticks, max_interval = run_cpu(n, pool if use_pool else None)
+        print('{} x fib(22) {}: {:.3f}s, {} ticks, max tick interval {:.1f}ms'
+              .format(n, 'in {} processes'.format(pool.size) if use_pool else 'on hub', elapsed,
+                      ticks, max_interval * 1000))
+
+    small = n * 100
+    start = time.perf_counter()
+    pool.map(square, range(small))
+    elapsed = time.perf_counter() - start
+    print('map: {} small tasks: {:.3f}s ({:.0f} tasks/sec)'.format(small, elapsed, small / elapsed))
+
+    start = time.perf_counter()
+    for _ in pool.imap_unordered(square, range(small)):
+        pass
+    elapsed = time.perf_counter() - start
+    print('imap_unordered: {} small tasks: {:.3f}s ({:.0f} tasks/sec)'
+          .format(small, elapsed, small / elapsed))
+
+    one = small // 10
+    start = time.perf_counter()
+    for x in range(one):
+        pool.execute(square, x)
+    elapsed = time.perf_counter() - start
+    print('execute: {} small tasks one at a time: {:.3f}s ({:.0f} tasks/sec)'
+          .format(one, elapsed, one / elapsed))
+
+    print('stats: {}'.format(pool.stats()))
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
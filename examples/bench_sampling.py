@@ -0,0 +1,77 @@
+"""Sampling profiler overhead benchmark
+
+This benchmark runs a workload mixing Python function calls and switches between greenlets (greenlets
+computing Fibonacci numbers recursively, and bouncing a byte over socket pairs), and compares its
+best run time out of 5:
+
+- without profiling
+- with `guv.util.sampling.SamplingProfiler` at 100 Hz
+- with `cProfile`, which hooks every function call like `guv.util.profile`
+
+Usage::
+
+    python bench_sampling.py [iterations]
+"""
+import cProfile
+import sys
+import time
+
+import guv
+from guv.greenio import socketpair
+from guv.util.sampling import SamplingProfiler
+
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+def work(sock, n):
+    for _ in range(n):
+        fib(10)
+        sock.sendall(b'x')
+        sock.recv(1)
+
+
+def run(n, concurrency=10):
+    """:return: elapsed time
+    """
+    pairs = [socketpair() for _ in range(concurrency // 2)]
+    start = time.perf_counter()
+    gts = [guv.spawn(work, sock, n) for pair in pairs for sock in pair]
+    for gt in gts:
+        gt.wait()
+    elapsed = time.perf_counter() - start
+    for a, b in pairs:
+        a.close()
+        b.close()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    names = ['none', 'sampling (100 Hz)', 'cProfile']
+    times = {name: [] for name in names}
+    samples = 0
+
+    # the modes are interleaved, so that they are equally affected by other load on the machine
+    for _ in range(5):
+        for name in names:
+            if name == 'cProfile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+                times[name].append(run(n))
+                profiler.disable()
+            elif name.startswith('sampling'):
+                with SamplingProfiler(hz=100) as profiler:
+                    times[name].append(run(n))
+                samples += profiler.samples
+            else:
+                times[name].append(run(n))
+
+    baseline = min(times['none'])
+    for name in names:
+        elapsed = min(times[name])
+        print('{}: {:.3f}s ({:+.1f}%)'.format(name, elapsed, (elapsed / baseline - 1) * 100))
+    print('{} samples taken'.format(samples))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""select / poll / selectors benchmark
+
+A greenlet waits for one of many registered sockets to become readable, over and over, while
+another greenlet writes to one socket at a time, like a connection pool waiting for responses:
+
+- select(): with `guv.green.select.select()`, which waits on the hub for every socket, on every
+  call
+- poll: with a `guv.green.select.poll` object, which keeps its registrations across calls
+- DefaultSelector: with `guv.green.selectors.DefaultSelector`
+
+Usage::
+
+    python bench_select.py [num_sockets] [num_waits]
+"""
+import socket
+import sys
+import time
+
+import guv
+from guv.green import select, selectors
+
+
+def run(name, pairs, n):
+    """Wait for `n` sockets to become readable
+
+    :return: elapsed time
+    """
+    readers = [a for a, b in pairs]
+    fds = {a.fileno(): a for a in readers}
+    if name == 'poll':
+        p = select.poll()
+        for a in readers:
+            p.register(a, select.POLLIN)
+        wait = lambda: [fds[fd] for fd, _ in p.poll()]
+    elif name == 'DefaultSelector':
+        sel = selectors.DefaultSelector()
+        for a in readers:
+            sel.register(a, selectors.EVENT_READ)
+        wait = lambda: [key.fileobj for key, _ in sel.select()]
+    else:
+        wait = lambda: select.select(readers, [], [])[0]
+
+    def write():
+        for i in range(n):
+            pairs[i * 7 % len(pairs)][1].send(b'x')
+            guv.gyield()
+
+    start = time.perf_counter()
+    guv.spawn(write)
+    received = 0
+    while received < n:
+        for a in wait():
+            a.recv(1)
+            received += 1
+    return time.perf_counter() - start
+
+
+def main():
+    num_sockets = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    pairs = [socket.socketpair() for _ in range(num_sockets)]
+    for name in ['select()', 'poll', 'DefaultSelector']:
+        elapsed = run(name, pairs, n)
+        print('{}: {} waits on {} sockets: {:.3f}s ({:.0f} waits/sec)'
+              .format(name, n, num_sockets, elapsed, n / elapsed))
+
+
+if __name__ == '__main__':
+    main()
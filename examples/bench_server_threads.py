@@ -0,0 +1,84 @@
+"""Multi-threaded server benchmark
+
+This benchmark serves requests whose handler spends its time in a C extension which releases the GIL
+(`hashlib.pbkdf2_hmac()`), with `guv.serve_threads()` and an increasing number of threads, each
+running its own hub and accepting connections on its own `SO_REUSEPORT` listening socket.
+
+Clients are forked processes using blocking sockets, so that they don't compete with the server for
+the GIL. Requests per second should scale with the number of threads, up to the number of CPUs.
+
+Usage::
+
+    python bench_server_threads.py [num_requests] [max_threads]
+"""
+import hashlib
+import os
+import socket
+import sys
+import time
+
+import guv
+from guv.green import os as green_os
+
+NUM_CLIENTS = 16
+
+
+def handle(sock, addr):
+    while sock.recv(64):
+        sock.sendall(hashlib.pbkdf2_hmac('sha256', b'password', b'salt', 2000))
+    sock.close()
+
+
+def client(addr, n):
+    sock = socket.create_connection(addr)
+    for _ in range(n):
+        sock.sendall(b'x')
+        sock.recv(64)
+    sock.close()
+
+
+def run(threads, n):
+    """Serve `n` requests with `threads` threads
+
+    :return: elapsed time
+    """
+    sock = guv.listen(('127.0.0.1', 0), reuse_port=True)
+    addr = sock.getsockname()
+    server = guv.spawn(guv.serve_threads, sock, handle, threads)
+    guv.sleep(0.1)  # let the threads start listening
+
+    start = time.perf_counter()
+    pids = []
+    for _ in range(NUM_CLIENTS):
+        pid = os.fork()
+        if pid == 0:
+            client(addr, n // NUM_CLIENTS)
+            os._exit(0)
+        pids.append(pid)
+
+    for pid in pids:
+        green_os.waitpid(pid, 0)
+    elapsed = time.perf_counter() - start
+
+    server.kill(guv.StopServe())
+    server.wait()
+    sock.close()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+
+    threads = 1
+    while True:
+        elapsed = run(threads, n)
+        print('{} thread(s): {} requests in {:.3f}s ({:.0f} requests/s)'
+              .format(threads, n, elapsed, n / elapsed))
+        if threads >= max_threads:
+            break
+        threads = min(threads * 2, max_threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Child process wait benchmark
+
+This benchmark forks many child processes which exit after a delay, and waits for each from its own
+greenlet:
+
+- polling: with `os.waitpid(pid, os.WNOHANG)` every 10 ms (how `guv.green.os.waitpid()` used to
+  wait)
+- SIGCHLD: with `guv.green.os.waitpid()`, which is woken up by the hub when it receives SIGCHLD
+
+It reports the CPU time used by the parent process while waiting, and the latency between the exit
+of a child process and its waiting greenlet being woken up.
+
+It then pipes data through `cat` child processes:
+
+- select: with a loop around `guv.green.select.select()` and 32 KiB reads, like the stdlib's
+  `Popen._communicate()`, which the green `Popen` used to run against the green select module
+- communicate(): with `guv.green.subprocess.Popen.communicate()`
+- iter_lines(): reading the output line by line with `Popen.iter_lines()`
+
+Usage::
+
+    python bench_subprocess.py [num_children] [delay] [megabytes]
+"""
+import os
+import sys
+import time
+
+import guv
+from guv.green import os as green_os
+from guv.green import select
+from guv.green import subprocess
+
+
+def poll_waitpid(pid, options):
+    while True:
+        rpid, status = os.waitpid(pid, options | os.WNOHANG)
+        if rpid:
+            return rpid, status
+        guv.sleep(0.01)
+
+
+def run(waitpid, n, delay):
+    """Wait for `n` child processes which exit `delay` seconds from now
+
+    :return: (CPU time, mean latency, maximum latency)
+    """
+    exit_time = time.monotonic() + delay
+    pids = []
+    for _ in range(n):
+        pid = os.fork()
+        if pid == 0:
+            time.sleep(max(exit_time - time.monotonic(), 0))
+            os._exit(0)
+        pids.append(pid)
+
+    latencies = []
+
+    def wait(pid):
+        waitpid(pid, 0)
+        latencies.append(time.monotonic() - exit_time)
+
+    cpu = time.process_time()
+    pool = guv.GreenPool(n)
+    for pid in pids:
+        pool.spawn_n(wait, pid)
+    pool.waitall()
+    cpu = time.process_time() - cpu
+    return cpu, sum(latencies) / n, max(latencies)
+
+
+def select_communicate(p, data):
+    """Send `data` to stdin and read stdout until EOF with a select() loop
+
+    The pipes are read and written until they would block, to wait for the hub as rarely as
+    possible.
+    """
+    stdin = p.stdin.fileno()
+    stdout = p.stdout.fileno()
+    view = memoryview(data)
+    chunks = []
+    writers = [stdin]
+    while True:
+        select.select([stdout], writers, [])
+        try:
+            while view and writers:
+                view = view[os.write(stdin, view):]
+        except BlockingIOError:
+            pass
+        if writers and not view:
+            p.stdin.close()
+            writers = []
+
+        try:
+            while True:
+                chunk = os.read(stdout, 32768)
+                if not chunk:
+                    p.stdout.close()
+                    p.wait()
+                    return b''.join(chunks)
+                chunks.append(chunk)
+        except BlockingIOError:
+            pass
+
+
+def run_pipe(name, data, concurrency):
+    """Pipe `data` through `concurrency` child processes at once
+
+    :return: elapsed time
+    """
+    def run_one():
+        p = subprocess.Popen(['cat'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        if name == 'select':
+            output = select_communicate(p, data)
+        elif name == 'communicate()':
+            output = p.communicate(data)[0]
+        else:
+            output = b''.join(p.iter_lines(data))
+            p.wait()
+        assert len(output) == len(data)
+
+    start = time.perf_counter()
+    pool = guv.GreenPool(concurrency)
+    for _ in range(concurrency):
+        pool.spawn_n(run_one)
+    pool.waitall()
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    megabytes = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    for name, waitpid in [('polling', poll_waitpid), ('SIGCHLD', green_os.waitpid)]:
+        cpu, mean, maximum = run(waitpid, n, delay)
+        print('{}: {} children exiting after {}s: parent CPU time {:.3f}s, '
+              'latency mean {:.1f}ms, max {:.1f}ms'
+              .format(name, n, delay, cpu, mean * 1000, maximum * 1000))
+
+    # lines of 100 bytes
+    data = (b'x' * 99 + b'\n') * (megabytes * 1024 * 1024 // 100)
+    concurrency = 4
+    for name in ['select', 'communicate()', 'iter_lines()']:
+        elapsed = run_pipe(name, data, concurrency)
+        print('{}: {} x {} MiB through cat: {:.3f}s ({:.0f} MiB/s)'
+              .format(name, concurrency, megabytes, elapsed,
+                      concurrency * megabytes / elapsed))
+
+
+if __name__ == '__main__':
+    main()
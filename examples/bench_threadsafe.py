@@ -0,0 +1,92 @@
+"""Cross-thread call benchmark
+
+This benchmark measures the rate of calls scheduled with `hub.schedule_call_threadsafe()` by a
+native OS thread:
+
+- one-way: a thread schedules many calls as fast as possible
+- round trip: a thread schedules a call, then waits for the hub to reply
+
+Usage::
+
+    python bench_threadsafe.py [num_messages]
+"""
+import sys
+import threading
+import time
+
+import greenlet
+
+from guv.hubs import get_hub
+
+
+def bench_one_way(n):
+    hub = get_hub()
+    current = greenlet.getcurrent()
+    received = []
+    wakeups = [0]
+
+    fire = hub._fire_threadsafe_callbacks
+
+    def fire_counted():
+        wakeups[0] += 1
+        fire()
+
+    hub._fire_threadsafe_callbacks = fire_counted
+
+    def produce():
+        for i in range(n):
+            hub.schedule_call_threadsafe(received.append, i)
+        hub.schedule_call_threadsafe(current.switch)
+
+    start = time.perf_counter()
+    hub.ref_threadsafe()
+    thread = threading.Thread(target=produce)
+    thread.start()
+    hub.switch()
+    hub.unref_threadsafe()
+    elapsed = time.perf_counter() - start
+
+    thread.join()
+    del hub._fire_threadsafe_callbacks
+    assert len(received) == n
+    return elapsed, wakeups[0]
+
+
+def bench_round_trip(n):
+    hub = get_hub()
+    current = greenlet.getcurrent()
+    reply = threading.Event()
+
+    def produce():
+        for i in range(n):
+            reply.clear()
+            hub.schedule_call_threadsafe(reply.set)
+            reply.wait()
+        hub.schedule_call_threadsafe(current.switch)
+
+    start = time.perf_counter()
+    hub.ref_threadsafe()
+    thread = threading.Thread(target=produce)
+    thread.start()
+    hub.switch()
+    hub.unref_threadsafe()
+    elapsed = time.perf_counter() - start
+
+    thread.join()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    elapsed, wakeups = bench_one_way(n)
+    print('one-way: {} calls: {:.3f}s ({:.0f} calls/sec, {} wakeups)'
+          .format(n, elapsed, n / elapsed, wakeups))
+
+    n //= 10
+    elapsed = bench_round_trip(n)
+    print('round trip: {} calls: {:.3f}s ({:.0f} round trips/sec)'.format(n, elapsed, n / elapsed))
+
+
+if __name__ == '__main__':
+    main()
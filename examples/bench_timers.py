@@ -0,0 +1,54 @@
+"""Timer benchmark
+
+This benchmark measures the cost of timers on the current hub:
+
+- scheduling and cancelling many timers, as done by every `Timeout` and every socket operation
+  with a timeout that completes before the timeout elapses
+- many greenlets sleeping concurrently, where every timer actually fires
+
+Usage::
+
+    python bench_timers.py [num_timers]
+"""
+import sys
+import time
+
+import guv
+from guv.hubs import get_hub
+
+
+def bench_cancel(n):
+    hub = get_hub()
+    start = time.perf_counter()
+    timers = [hub.schedule_call_global(60, lambda: None) for _ in range(n)]
+    for t in timers:
+        t.cancel()
+
+    # let the hub run an iteration to clean up
+    guv.sleep(0)
+    return time.perf_counter() - start
+
+
+def bench_sleep(n):
+    pool = guv.GreenPool(n)
+    start = time.perf_counter()
+    for i in range(n):
+        pool.spawn_n(guv.sleep, 0.01)
+    pool.waitall()
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    elapsed = bench_cancel(n)
+    print('schedule + cancel {} timers: {:.3f}s ({:.0f} timers/sec)'.format(n, elapsed,
+                                                                            n / elapsed))
+
+    elapsed = bench_sleep(n)
+    print('{} concurrent sleep(0.01): {:.3f}s ({:.0f} timers/sec)'.format(n, elapsed,
+                                                                         n / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Thread pool benchmark
+
+This benchmark runs blocking calls (`hashlib.pbkdf2_hmac()`, which releases the GIL, and
+`time.sleep()`) from many greenlets while a ticker greenlet measures how responsive the hub is:
+
+- directly in the greenlets, which blocks the hub
+- with `guv.tpool.execute()`
+
+Usage::
+
+    python bench_tpool.py [num_calls]
+"""
+import hashlib
+import sys
+import time
+
+import guv
+from guv import tpool
+
+
+def pbkdf2():
+    return hashlib.pbkdf2_hmac('sha256', b'password', b'salt', 20000)
+
+
+def blocking_sleep():
+    time.sleep(0.01)
+
+
+def run(n, fn, use_tpool):
+    """Call `fn` `n` times from `n` greenlets
+
+    :return: (elapsed, number of ticks, maximum interval between ticks)
+    """
+    done = []
+    ticks = []
+
+    def ticker():
+        while not done:
+            ticks.append(time.perf_counter())
+            guv.sleep(0.001)
+
+    def call():
+        if use_tpool:
+            tpool.execute(fn)
+        else:
+            fn()
+
+    ticker_gt = guv.spawn(ticker)
+    guv.gyield()
+
+    start = time.perf_counter()
+    pool = guv.GreenPool(n)
+    for _ in range(n):
+        pool.spawn_n(call)
+    pool.waitall()
+    elapsed = time.perf_counter() - start
+
+    done.append(True)
+    ticker_gt.wait()
+    max_interval = max(b - a for a, b in zip(ticks, ticks[1:]))
+    return elapsed, len(ticks), max_interval
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    for fn in [pbkdf2, blocking_sleep]:
+        for use_tpool in [False, True]:
+            elapsed, ticks, max_interval = run(n, fn, use_tpool)
+            print('{} x {}() {}: {:.3f}s ({:.0f} calls/sec), {} ticks, max tick interval {:.1f}ms'
+                  .format(n, fn.__name__, 'in tpool' if use_tpool else 'on hub', elapsed,
+                          n / elapsed, ticks, max_interval * 1000))
+
+    print('tpool stats: {}'.format(tpool.stats()))
+
+
+if __name__ == '__main__':
+    main()
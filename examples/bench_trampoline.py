@@ -0,0 +1,47 @@
+"""Trampoline benchmark
+
+This benchmark measures how many :func:`~guv.hubs.switch.trampoline` calls per second the current
+hub can handle. Two greenlets bounce a single byte back and forth over a socket pair, so every
+`recv()` finds the socket empty and has to wait in the hub for the peer to write.
+
+Usage::
+
+    python bench_trampoline.py [round_trips]
+"""
+import sys
+import time
+
+import guv
+from guv.greenio import socketpair
+
+
+def ping(sock, n):
+    for _ in range(n):
+        sock.sendall(b'x')
+        sock.recv(1)
+
+
+def pong(sock, n):
+    for _ in range(n):
+        sock.recv(1)
+        sock.sendall(b'x')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    a, b = socketpair()
+
+    start = time.perf_counter()
+    gt_pong = guv.spawn(pong, b, n)
+    gt_ping = guv.spawn(ping, a, n)
+    gt_ping.wait()
+    gt_pong.wait()
+    elapsed = time.perf_counter() - start
+
+    # every round trip causes one trampoline in each greenlet
+    print('{} trampolines in {:.3f}s: {:.0f} trampolines/sec'.format(2 * n, elapsed,
+                                                                     2 * n / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Wait profiler overhead benchmark
+
+This benchmark runs greenlets which bounce a byte over socket pairs and pass items through a queue,
+so that nearly all of their time is spent waiting, and compares the best run time out of 5:
+
+- without profiling, where each wait only checks whether a wait profiler is started
+- with `guv.util.waits.WaitProfiler`, which records every wait
+- with `guv.util.waits.WaitProfiler(stacks=False)`, which doesn't record the whole stack of waits
+
+It then prints the waits recorded in the last run.
+
+Usage::
+
+    python bench_waits.py [iterations]
+"""
+import sys
+import time
+
+import guv
+from guv.greenio import socketpair
+from guv.queue import LightQueue
+from guv.util.waits import WaitProfiler
+
+
+def ping(sock, n):
+    for _ in range(n):
+        sock.sendall(b'x')
+        sock.recv(1)
+
+
+def produce(queue, n):
+    for i in range(n):
+        queue.put(i)
+
+
+def consume(queue, n):
+    for _ in range(n):
+        queue.get()
+
+
+def run(n, concurrency=10):
+    """:return: elapsed time
+    """
+    pairs = [socketpair() for _ in range(concurrency // 2)]
+    queue = LightQueue(1)
+    start = time.perf_counter()
+    gts = [guv.spawn(ping, sock, n) for pair in pairs for sock in pair]
+    gts.append(guv.spawn(produce, queue, n))
+    gts.append(guv.spawn(consume, queue, n))
+    for gt in gts:
+        gt.wait()
+    elapsed = time.perf_counter() - start
+    for a, b in pairs:
+        a.close()
+        b.close()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    names = ['none', 'wait profiler', 'wait profiler (no stacks)']
+    times = {name: [] for name in names}
+
+    # the modes are interleaved, so that they are equally affected by other load on the machine
+    for _ in range(5):
+        for name in names:
+            if name.startswith('wait profiler'):
+                with WaitProfiler(stacks=name == 'wait profiler') as profiler:
+                    times[name].append(run(n))
+            else:
+                times[name].append(run(n))
+
+    baseline = min(times['none'])
+    for name in names:
+        elapsed = min(times[name])
+        print('{}: {:.3f}s ({:+.1f}%)'.format(name, elapsed, (elapsed / baseline - 1) * 100))
+    waits = sum(stats['count'] for stats in profiler.reason_stats())
+    print('{} waits per run'.format(waits))
+    print()
+    print(profiler.format_stats(5))
+
+if __name__ == '__main__':
+    main()
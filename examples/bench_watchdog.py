@@ -0,0 +1,63 @@
+"""Watchdog overhead benchmark
+
+This benchmark measures the overhead of `guv.util.watchdog.Watchdog` on a busy hub: two greenlets
+bounce a single byte back and forth over a socket pair (like `bench_trampoline.py`), with and
+without a watchdog thread checking the hub.
+
+Usage::
+
+    python bench_watchdog.py [round_trips] [threshold]
+"""
+import sys
+import time
+
+import guv
+from guv.greenio import socketpair
+from guv.util.watchdog import Watchdog
+
+
+def ping(sock, n):
+    for _ in range(n):
+        sock.sendall(b'x')
+        sock.recv(1)
+
+
+def pong(sock, n):
+    for _ in range(n):
+        sock.recv(1)
+        sock.sendall(b'x')
+
+
+def run(n):
+    """:return: elapsed time for `n` round trips
+    """
+    a, b = socketpair()
+    start = time.perf_counter()
+    gt_pong = guv.spawn(pong, b, n)
+    gt_ping = guv.spawn(ping, a, n)
+    gt_ping.wait()
+    gt_pong.wait()
+    elapsed = time.perf_counter() - start
+    a.close()
+    b.close()
+    return elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+
+    for name in ['no watchdog', 'watchdog', 'no watchdog', 'watchdog']:
+        detected = ''
+        if name == 'watchdog':
+            with Watchdog(threshold, callback=lambda event: None) as watchdog:
+                elapsed = run(n)
+            detected = ' ({} blocking events detected)'.format(watchdog.detected)
+        else:
+            elapsed = run(n)
+        print('{}: {} round trips in {:.3f}s: {:.0f} round trips/sec{}'
+              .format(name, n, elapsed, n / elapsed, detected))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,12 @@ version_info = (0, 35, 2)
 __version__ = '.'.join(map(str, version_info))
 
 try:
-    import pyuv_cffi  # only to compile the shared library before monkey-patching
+    try:
+        import pyuv_cffi  # only to compile the shared library before monkey-patching
+    except ImportError as e:
+        if 'greenlet' in str(e):
+            raise
+        # libuv is not available; the hub falls back to a backend which does not require it
 
     from . import greenpool
     from . import queue
@@ -11,7 +16,7 @@ try:
     from .greenpool import GreenPool, GreenPile
     from .timeout import Timeout, with_timeout
     from .patcher import import_patched, monkey_patch
-    from .server import serve, listen, connect, StopServe, wrap_ssl
+    from .server import serve, serve_threads, listen, connect, StopServe, wrap_ssl
 
     try:
         from .support.gunicorn_worker import GuvWorker
@@ -120,11 +120,16 @@ class Event:
         """
         current = greenlet.getcurrent()
         if self._result is _NONE:
+            profiler = get_hub().wait_profiler
+            if profiler is not None:
+                start = profiler.wait_started()
             self._waiters.add(current)
             try:
                 gyield(False)
             finally:
                 self._waiters.discard(current)
+                if profiler is not None:
+                    profiler.wait_ended('event', start)
         if self._exc is not None:
             current.throw(*self._exc)
         return self._result
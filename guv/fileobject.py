@@ -1,20 +1,32 @@
-"""Greenified file class implementing standard file operations
+"""Cooperative file objects for pipes and other pollable file descriptors
 
 Not supported on Windows.
+
+The file descriptor is set to non-blocking mode. Reads and writes which would block suspend only the
+calling greenlet until the hub reports the file descriptor ready. This works for anything the hub
+can poll (pipes, FIFOs, terminals, sockets); see :mod:`guv.fs` for regular files.
+
+Usage::
+
+    from guv.fileobject import fdopen
+
+    r, w = os.pipe()
+    with fdopen(r, 'rb') as f:
+        for line in f:
+            ...
 """
+import io
 import os
-from socket import SocketIO
-from errno import EBADF, EAGAIN, EINTR
 
 import fcntl
-from .hubs import get_hub
-from .support import PYPY
-from .green.os import read, write
-from .exceptions import FileObjectClosed
+from . import hubs
+from .const import READ, WRITE
+from .exceptions import IOClosed
 
-__all__ = ['FileObjectPosix', 'FileObject']
+__all__ = ['FileObjectPosix', 'FileObject', 'fdopen', 'set_nonblocking', 'DEFAULT_BUFFER_SIZE']
 
-IGNORED_ERRORS = {EAGAIN, EINTR}
+#: default buffer size (the default capacity of a pipe on Linux)
+DEFAULT_BUFFER_SIZE = 64 * 1024
 
 
 def set_nonblocking(fd):
@@ -28,160 +40,158 @@ def set_nonblocking(fd):
         return True
 
 
-class SocketAdapter:
-    """Socket-like API on top of a file descriptor.
-
-    The main purpose of it is to re-use _fileobject to create proper cooperative file objects
-    from file descriptors on POSIX platforms.
+class FileObjectPosix(io.RawIOBase):
+    """Raw file object for a non-blocking file descriptor whose operations only suspend the calling
+    greenlet
     """
 
-    def __init__(self, fileno, mode=None, close=True):
-        if not isinstance(fileno, int):
-            raise TypeError('fileno must be int: %r' % fileno)
-        self._fileno = fileno
-        self._mode = mode or 'rb'
-        self._close = close
-        self._translate = 'U' in self._mode
-        set_nonblocking(fileno)
-        self._eat_newline = False
-        self.hub = get_hub()
-        io = self.hub.loop.io
-        self._read_event = io(fileno, 1)
-        self._write_event = io(fileno, 2)
-        self._refcount = 1
-
-    def __repr__(self):
-        if self._fileno is None:
-            return '<%s at 0x%x closed>' % (self.__class__.__name__, id(self))
+    def __init__(self, fobj, mode='rb', close=True):
+        """
+        :param fobj: file descriptor, or file object (such as :class:`io.FileIO`) owning the file
+            descriptor
+        :type fobj: int or file
+        :param str mode: 'r' or 'w', optionally with 'b'
+        :param bool close: close the file descriptor (or file object) when the file is closed
+        """
+        if isinstance(fobj, int):
+            fd = fobj
+            fobj = None
         else:
-            args = (self.__class__.__name__, id(self), getattr(self, '_fileno', 'N/A'),
-                    getattr(self, '_mode', 'N/A'))
-            return '<%s at 0x%x (%r, %r)>' % args
+            fd = fobj.fileno()
 
-    def makefile(self, *args, **kwargs):
-        return SocketIO(self, *args, **kwargs)
+        mode = mode.replace('b', '')
+        if mode not in ('r', 'w'):
+            raise ValueError('invalid mode: {!r}'.format(mode))
 
-    def fileno(self):
-        result = self._fileno
-        if result is None:
-            raise IOError(EBADF, 'Bad file descriptor (SocketAdapter object is closed')
-        return result
+        self._fd = fd
+        self._fobj = fobj
+        self._close = close
+        self.mode = mode + 'b'
+        set_nonblocking(fd)
 
-    def detach(self):
-        x = self._fileno
-        self._fileno = None
-        return x
+    def __repr__(self):
+        if self.closed:
+            return '<{} closed>'.format(type(self).__name__)
+        return '<{} fd={} mode={!r}>'.format(type(self).__name__, self._fd, self.mode)
 
-    def _reuse(self):
-        self._refcount += 1
+    def fileno(self):
+        self._check_closed()
+        return self._fd
 
-    def _drop(self):
-        self._refcount -= 1
-        if self._refcount <= 0:
-            self._realclose()
+    def readable(self):
+        self._check_closed()
+        return self.mode == 'rb'
 
-    def close(self):
-        self._drop()
+    def writable(self):
+        self._check_closed()
+        return self.mode == 'wb'
 
-    def _realclose(self):
-        # TODO: should we notify the hub that this fd is closed?
-        fileno = self._fileno
-        if fileno is not None:
-            self._fileno = None
-            if self._close:
-                os.close(fileno)
+    def readinto(self, b):
+        self._check_closed()
+        if self.mode != 'rb':
+            raise io.UnsupportedOperation('File not open for reading')
 
-    def sendall(self, data):
-        fileno = self.fileno()
-        bytes_total = len(data)
-        bytes_written = 0
         while True:
             try:
-                bytes_written += write(fileno, memoryview(data)[bytes_written:])
-            except (IOError, OSError) as ex:
-                code = ex.args[0]
-                if code not in IGNORED_ERRORS:
-                    raise
-            if bytes_written >= bytes_total:
-                return
-            self.hub.wait(self._write_event)
-
-    def recv(self, size):
-        while True:
+                return os.readv(self._fd, [b])
+            except BlockingIOError:
+                pass
+
             try:
-                data = read(self.fileno(), size)
-            except (IOError, OSError) as ex:
-                code = ex.args[0]
-                if code not in IGNORED_ERRORS:
-                    raise
-            else:
-                if not self._translate or not data:
-                    return data
-                if self._eat_newline:
-                    self._eat_newline = False
-                    if data.startswith('\n'):
-                        data = data[1:]
-                        if not data:
-                            return self.recv(size)
-                if data.endswith('\r'):
-                    self._eat_newline = True
-                return self._translate_newlines(data)
-            self.hub.wait(self._read_event)
-
-    def _translate_newlines(self, data):
-        data = data.replace("\r\n", "\n")
-        data = data.replace("\r", "\n")
-        return data
-
-
-class FileObjectPosix(SocketIO):
-    def __init__(self, fobj, mode='rb', bufsize=-1, close=True):
-        if isinstance(fobj, int):
-            fileno = fobj
-            fobj = None
-        else:
-            fileno = fobj.fileno()
+                hubs.trampoline(self._fd, READ)
+            except IOClosed:
+                # closed by another greenlet
+                return 0
+
+    def readall(self):
+        # read in large chunks rather than io.DEFAULT_BUFFER_SIZE chunks
+        data = bytearray()
+        buf = bytearray(DEFAULT_BUFFER_SIZE)
+        view = memoryview(buf)
+        while True:
+            n = self.readinto(buf)
+            if not n:
+                return bytes(data)
+            data += view[:n]
 
-        sock = SocketAdapter(fileno, mode, close=close)
-        self._fobj = fobj
-        self._closed = False
-        super().__init__(sock, mode)
-        if PYPY:
-            sock._drop()
+    def write(self, b):
+        self._check_closed()
+        if self.mode != 'wb':
+            raise io.UnsupportedOperation('File not open for writing')
 
-    def __repr__(self):
-        if self._sock is None:
-            return '<%s closed>' % self.__class__.__name__
-        elif self._fobj is None:
-            return '<%s %s>' % (self.__class__.__name__, self._sock)
-        else:
-            return '<%s %s _fobj=%r>' % (self.__class__.__name__, self._sock, self._fobj)
+        while True:
+            try:
+                return os.write(self._fd, b)
+            except BlockingIOError:
+                pass
+
+            hubs.trampoline(self._fd, WRITE)
 
     def close(self):
-        if self._closed:
-            # make sure close() is only ran once when called concurrently
-            # cannot rely on self._sock for this because we need to keep that until flush()
-            # is done
-            return
-        self._closed = True
-        sock = self._sock
-        if sock is None:
+        if self.closed:
             return
+
         try:
-            self.flush()
+            super().close()
         finally:
-            if self._fobj is not None or not self._close:
-                sock.detach()
-            else:
-                sock._drop()
-            self._sock = None
+            if self._close:
+                # wake up greenlets waiting on the file descriptor, and drop the hub's watcher
+                # before the file descriptor can be recycled
+                hubs.get_hub().notify_close(self._fd)
+                if self._fobj is not None:
+                    self._fobj.close()
+                else:
+                    os.close(self._fd)
             self._fobj = None
 
-    def __getattr__(self, item):
-        assert item != '_fobj'
-        if self._fobj is None:
-            raise FileObjectClosed
-        return getattr(self._fobj, item)
+    def _check_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
 
 
 FileObject = FileObjectPosix
+
+
+def fdopen(fobj, mode='rb', buffering=-1, encoding=None, errors=None, newline=None, close=True):
+    """Open a file descriptor for cooperative I/O
+
+    The arguments are the same as for :func:`os.fdopen`, except:
+
+    :param fobj: file descriptor, or file object owning the file descriptor
+    :type fobj: int or file
+    :param str mode: 'r' or 'w', optionally with 'b' or 't'
+    :param int buffering: size of the buffer (default: :data:`DEFAULT_BUFFER_SIZE`), or 0 to
+        disable buffering (only in binary mode)
+    :param bool close: close the file descriptor (or file object) when the file is closed
+    :return: :class:`FileObjectPosix` (unbuffered), a buffered reader or writer (binary mode), or
+        a :class:`io.TextIOWrapper` (text mode)
+    """
+    binary = 'b' in mode
+    if binary and 't' in mode:
+        raise ValueError("can't have text and binary mode at once")
+
+    line_buffering = buffering == 1
+    if buffering < 0 or line_buffering:
+        buffering = DEFAULT_BUFFER_SIZE
+
+    raw = FileObjectPosix(fobj, mode.replace('t', ''), close)
+    try:
+        if buffering == 0:
+            if not binary:
+                raise ValueError("can't have unbuffered text I/O")
+            return raw
+
+        if raw.writable():
+            buffered = io.BufferedWriter(raw, buffering)
+        else:
+            buffered = io.BufferedReader(raw, buffering)
+
+        if binary:
+            return buffered
+
+        text = io.TextIOWrapper(buffered, encoding, errors, newline, line_buffering)
+        text.mode = mode
+        return text
+    except:
+        raw.close()
+        raise
@@ -0,0 +1,487 @@
+"""Cooperative regular-file I/O
+
+Regular files are always "ready" for reading and writing, so :func:`guv.green.os.read` and friends
+can't wait for them cooperatively: reading a large file, or writing to a slow disk, blocks the hub
+and every greenlet with it. The functions in this module run file operations in a thread pool and
+suspend only the calling greenlet until the operation completes:
+
+- With the pyuv_cffi hub, operations are submitted to the libuv loop (`uv_fs_*()` functions) and run
+  in libuv's thread pool.
+- With other hubs, operations run in the :mod:`guv.tpool` thread pool.
+
+:func:`open` returns a file object similar to the built-in :func:`open`. Files are read and written
+in large chunks (:data:`DEFAULT_BUFFER_SIZE`, a multiple of the page size) to keep the number of
+round trips to the thread pool low. With `readahead`, the next chunk of a file which is read
+sequentially is read in the background while the caller processes the current one.
+
+Usage::
+
+    from guv import fs
+
+    with fs.open('/var/www/index.html', 'rb', readahead=True) as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sock.sendall(chunk)
+"""
+import io
+import mmap
+import os
+
+import greenlet
+
+from . import greenthread, tpool
+from .hubs import get_hub
+
+try:
+    import pyuv_cffi
+except ImportError:
+    # libuv is not available; operations run in the thread pool
+    pyuv_cffi = None
+
+__all__ = ['open', 'GreenFileIO', 'pread', 'pwrite', 'stat', 'fstat', 'DEFAULT_BUFFER_SIZE']
+
+#: default chunk size for reading and writing
+DEFAULT_BUFFER_SIZE = max(256 * 1024, mmap.PAGESIZE)
+
+
+def _read(fd, length, offset):
+    if offset < 0:
+        return os.read(fd, length)
+    return os.pread(fd, length, offset)
+
+
+def _write(fd, data, offset):
+    if offset < 0:
+        return os.write(fd, data)
+    return os.pwrite(fd, data, offset)
+
+
+def _readall(fd, offset):
+    # read the rest of the file in one read if possible, like io.FileIO.readall()
+    chunks = []
+    size = max(os.fstat(fd).st_size - offset, 0) + 1
+    while True:
+        chunk = os.pread(fd, max(size, DEFAULT_BUFFER_SIZE), offset)
+        if not chunk:
+            return b''.join(chunks)
+
+        chunks.append(chunk)
+        offset += len(chunk)
+        size = DEFAULT_BUFFER_SIZE
+
+
+#: blocking implementations of the operations, used if the hub has no libuv loop
+_blocking = {
+    'open': os.open,
+    'read': _read,
+    'write': _write,
+    'stat': os.stat,
+    'fstat': os.fstat,
+}
+
+
+class _Request:
+    """Operation submitted to the libuv loop of the hub
+    """
+    __slots__ = ['hub', 'greenlet', 'done', 'result', 'error']
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.greenlet = None
+        self.done = False
+        self.result = None
+        self.error = 0
+
+    def _callback(self, request):
+        self.done = True
+        self.result = request.result
+        self.error = request.error
+
+        g = self.greenlet
+        if g is not None:
+            self.greenlet = None
+            g.switch()
+
+    def wait(self):
+        """Wait for the operation to complete
+
+        :return: result of the operation
+        :raise OSError: if the operation failed
+        """
+        if not self.done:
+            current = greenlet.getcurrent()
+            assert self.hub is not current, 'do not call blocking functions from the mainloop'
+            self.greenlet = current
+            try:
+                while not self.done:
+                    self.hub.switch()
+            finally:
+                self.greenlet = None
+
+        if self.error:
+            raise OSError(-self.error, os.strerror(-self.error))
+
+        return self.result
+
+
+class _Done:
+    """Operation which has already completed
+    """
+    __slots__ = ['result']
+
+    def __init__(self, result):
+        self.result = result
+
+    def wait(self):
+        return self.result
+
+
+class _ThreadOperation:
+    """Operation running in the :mod:`guv.tpool` thread pool, in a greenthread
+
+    Exceptions are returned by the greenthread and raised by :meth:`wait`, so that the hub doesn't
+    print them.
+    """
+    __slots__ = ['gt']
+
+    def __init__(self, fn, *args):
+        self.gt = greenthread.spawn(self._run, fn, args)
+
+    @staticmethod
+    def _run(fn, args):
+        try:
+            return True, tpool.execute(fn, *args)
+        except Exception as e:
+            return False, e
+
+    def wait(self):
+        ok, value = self.gt.wait()
+        if not ok:
+            raise value
+        return value
+
+
+def _submit(name, *args):
+    """Start an operation without waiting for it
+
+    :param str name: name of the operation (a key of `_blocking`)
+    :return: object whose `wait()` method waits for and returns the result of the operation
+    """
+    hub = get_hub()
+    loop = getattr(hub, 'loop', None)
+    if pyuv_cffi is not None and isinstance(loop, pyuv_cffi.Loop):
+        request = _Request(hub)
+        getattr(pyuv_cffi, 'fs_' + name)(loop, *args, callback=request._callback)
+        return request
+
+    return _ThreadOperation(_blocking[name], *args)
+
+
+def pread(fd, length, offset=-1):
+    """Read up to `length` bytes from a file descriptor
+
+    :param int offset: offset in the file, or -1 to read from (and advance) the current position
+    :rtype: bytes
+    """
+    return _submit('read', fd, length, offset).wait()
+
+
+def pwrite(fd, data, offset=-1):
+    """Write data to a file descriptor
+
+    :param int offset: offset in the file, or -1 to write at (and advance) the current position
+    :return: number of bytes written
+    :rtype: int
+    """
+    return _submit('write', fd, data, offset).wait()
+
+
+def stat(path):
+    """Get the status of a file
+
+    :rtype: os.stat_result
+    """
+    return _submit('stat', path).wait()
+
+
+def fstat(fd):
+    """Get the status of a file descriptor
+
+    :rtype: os.stat_result
+    """
+    return _submit('fstat', fd).wait()
+
+
+def _parse_mode(mode):
+    """Return the flags for :func:`os.open`, and whether the file is readable and writable
+
+    :param str mode: mode without 'b' or 't'
+    :rtype: tuple(int, bool, bool)
+    """
+    modes = set(mode)
+    if len(modes) != len(mode) or modes - set('rwxa+') or len(modes & set('rwxa')) != 1:
+        raise ValueError('invalid mode: {!r}'.format(mode))
+
+    plus = '+' in modes
+    if 'r' in modes:
+        flags = 0
+        readable, writable = True, plus
+    elif 'w' in modes:
+        flags = os.O_CREAT | os.O_TRUNC
+        readable, writable = plus, True
+    elif 'x' in modes:
+        flags = os.O_CREAT | os.O_EXCL
+        readable, writable = plus, True
+    else:
+        flags = os.O_CREAT | os.O_APPEND
+        readable, writable = plus, True
+
+    if readable and writable:
+        flags |= os.O_RDWR
+    elif writable:
+        flags |= os.O_WRONLY
+    else:
+        flags |= os.O_RDONLY
+
+    return flags | getattr(os, 'O_CLOEXEC', 0), readable, writable
+
+
+class GreenFileIO(io.RawIOBase):
+    """Raw file object for regular files whose operations only suspend the calling greenlet
+
+    Reads and writes use explicit offsets (except writes in append mode), so the position of the
+    underlying file descriptor is not used.
+    """
+
+    def __init__(self, file, mode='r', closefd=True, readahead=0):
+        """
+        :param file: path or file descriptor
+        :type file: str or bytes or int
+        :param str mode: 'r', 'w', 'x' or 'a', optionally with '+'
+        :param bool closefd: close the file descriptor when the file is closed (must be True if
+            `file` is a path)
+        :param int readahead: size of the chunk to read in the background when the file is read
+            sequentially (rounded up to a multiple of the page size), or 0 to disable readahead
+        """
+        self._fd = -1
+        self._closefd = False
+
+        #: data read ahead: (offset, operation) or None
+        self._ahead = None
+
+        mode = mode.replace('b', '')
+        flags, self._readable, self._writable = _parse_mode(mode)
+        self._append = 'a' in mode
+        self.mode = mode + 'b'
+
+        if isinstance(file, int):
+            self._fd = file
+            self._closefd = closefd
+        else:
+            if not closefd:
+                raise ValueError('Cannot use closefd=False with file name')
+            self._fd = _submit('open', file, flags, 0o666).wait()
+            self._closefd = True
+
+        self.name = file
+        self._pos = os.lseek(self._fd, 0, os.SEEK_END if self._append else os.SEEK_CUR)
+
+        if readahead:
+            readahead = -(-readahead // mmap.PAGESIZE) * mmap.PAGESIZE
+        self.readahead = readahead
+
+    def __repr__(self):
+        return '<{} name={!r} mode={!r}>'.format(type(self).__name__, self.name, self.mode)
+
+    def fileno(self):
+        self._check_closed()
+        return self._fd
+
+    def readable(self):
+        self._check_closed()
+        return self._readable
+
+    def writable(self):
+        self._check_closed()
+        return self._writable
+
+    def seekable(self):
+        self._check_closed()
+        return True
+
+    def tell(self):
+        self._check_closed()
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._check_closed()
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = fstat(self._fd).st_size + offset
+        else:
+            raise ValueError('invalid whence ({}, should be 0, 1 or 2)'.format(whence))
+
+        if pos < 0:
+            raise OSError(22, 'Invalid argument')
+
+        self._pos = pos
+        return pos
+
+    def readinto(self, b):
+        self._check_closed()
+        if not self._readable:
+            raise io.UnsupportedOperation('File not open for reading')
+
+        want = len(b)
+        data = b''
+        ahead = self._ahead
+        self._ahead = None
+        if ahead is not None:
+            offset, op = ahead
+            if offset == self._pos:
+                data = op.wait()
+                if len(data) > want:
+                    # keep the rest for the next read
+                    self._ahead = (self._pos + want, _Done(data[want:]))
+                    data = data[:want]
+            else:
+                self._discard(op)
+
+        if not data:
+            data = pread(self._fd, max(want, self.readahead), self._pos)
+            if len(data) > want:
+                self._ahead = (self._pos + want, _Done(data[want:]))
+                data = data[:want]
+
+        n = len(data)
+        b[:n] = data
+        self._pos += n
+
+        if self.readahead and n and self._ahead is None:
+            self._ahead = (self._pos, _submit('read', self._fd, self.readahead, self._pos))
+
+        return n
+
+    def readall(self):
+        self._check_closed()
+        if not self._readable:
+            raise io.UnsupportedOperation('File not open for reading')
+
+        # the result of a libuv read is copied into a bytes object in the hub, which blocks the hub
+        # for a while for a large file, so read the rest of the file in the thread pool instead
+        self._drop_readahead()
+        data = tpool.execute(_readall, self._fd, self._pos)
+        self._pos += len(data)
+        return data
+
+    def write(self, b):
+        self._check_closed()
+        if not self._writable:
+            raise io.UnsupportedOperation('File not open for writing')
+
+        self._drop_readahead()
+        if self._append:
+            n = pwrite(self._fd, b, -1)
+            self._pos = os.lseek(self._fd, 0, os.SEEK_CUR)
+        else:
+            n = pwrite(self._fd, b, self._pos)
+            self._pos += n
+
+        return n
+
+    def truncate(self, size=None):
+        self._check_closed()
+        if not self._writable:
+            raise io.UnsupportedOperation('File not open for writing')
+
+        self._drop_readahead()
+        if size is None:
+            size = self._pos
+
+        tpool.execute(os.ftruncate, self._fd, size)
+        return size
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            self._drop_readahead()
+            super().close()
+        finally:
+            if self._closefd and self._fd >= 0:
+                os.close(self._fd)
+
+    def _check_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+    def _drop_readahead(self):
+        if self._ahead is not None:
+            op = self._ahead[1]
+            self._ahead = None
+            self._discard(op)
+
+    def _discard(self, op):
+        # wait until the operation completes, so that the file descriptor isn't closed (and
+        # possibly reused) while a read is in progress; this isn't possible when the file is
+        # closed by the garbage collector in the hub, but reads ahead use explicit offsets and
+        # don't have side effects
+        if greenlet.getcurrent() is get_hub():
+            return
+
+        try:
+            op.wait()
+        except OSError:
+            pass
+
+
+def open(file, mode='r', buffering=-1, encoding=None, errors=None, newline=None, closefd=True,
+         readahead=0):
+    """Open a regular file for cooperative I/O
+
+    The arguments are the same as for the built-in :func:`open`, except:
+
+    :param int buffering: size of the buffer (default: :data:`DEFAULT_BUFFER_SIZE`), or 0 to
+        disable buffering (only in binary mode)
+    :param readahead: read the next chunk of a file which is read sequentially in the background;
+        True to use the buffer size as the chunk size, or the size of the chunk
+    :type readahead: bool or int
+    :return: :class:`GreenFileIO` (unbuffered), a buffered reader or writer (binary mode), or a
+        :class:`io.TextIOWrapper` (text mode)
+    """
+    binary = 'b' in mode
+    if binary and 't' in mode:
+        raise ValueError("can't have text and binary mode at once")
+
+    line_buffering = buffering == 1
+    if buffering < 0 or line_buffering:
+        buffering = DEFAULT_BUFFER_SIZE
+    if readahead is True:
+        readahead = buffering or DEFAULT_BUFFER_SIZE
+
+    raw = GreenFileIO(file, mode.replace('t', ''), closefd, readahead)
+    try:
+        if buffering == 0:
+            if not binary:
+                raise ValueError("can't have unbuffered text I/O")
+            return raw
+
+        if raw.readable() and raw.writable():
+            buffered = io.BufferedRandom(raw, buffering)
+        elif raw.writable():
+            buffered = io.BufferedWriter(raw, buffering)
+        else:
+            buffered = io.BufferedReader(raw, buffering)
+
+        if binary:
+            return buffered
+
+        text = io.TextIOWrapper(buffered, encoding, errors, newline, line_buffering)
+        text.mode = mode
+        return text
+    except:
+        raw.close()
+        raise
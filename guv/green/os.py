@@ -2,6 +2,8 @@ import os as os_orig
 import errno
 import socket
 
+import greenlet
+
 from ..exceptions import IOClosed
 from ..support import get_errno
 from .. import hubs, greenthread
@@ -64,18 +66,38 @@ def wait():
 def waitpid(pid, options):
     """Wait for completion of a given child process
 
+    The calling greenlet is woken up by the hub when it receives SIGCHLD for the child process. If
+    the hub can't receive SIGCHLD (see :meth:`~guv.hubs.abc.AbstractHub.watch_child`), this falls
+    back to checking every 10 ms.
+
     :return: (pid, status)
     """
     if options & os_orig.WNOHANG != 0:
         return __waitpid(pid, options)
-    else:
-        new_options = options | os_orig.WNOHANG
+
+    new_options = options | os_orig.WNOHANG
+    hub = hubs.get_hub()
+    current = greenlet.getcurrent()
+    assert hub is not current, 'do not call blocking functions from the mainloop'
+
+    watcher = hub.watch_child(pid, options, current.switch, current.throw)
+    if watcher is None:
         while True:
             rpid, status = __waitpid(pid, new_options)
-            if rpid and status >= 0:
+            if rpid:
                 return rpid, status
             greenthread.sleep(0.01)
 
+    try:
+        # the child process may have exited before the watcher was registered
+        rpid, status = __waitpid(pid, new_options)
+        if rpid:
+            return rpid, status
+
+        return hub.switch()
+    finally:
+        hub.unwatch_child(watcher)
+
 
 def open(file, flags, mode=0o777):
     """Wrap os.open
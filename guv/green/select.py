@@ -1,14 +1,38 @@
+"""Greenified :mod:`select` module
+
+- :func:`select` returns the file descriptors which are ready without waiting, if any, and
+  otherwise waits on the hub for every file descriptor it is given.
+- :class:`poll` and :class:`epoll` keep their registrations across calls: :meth:`epoll.poll` checks
+  for events without blocking, and otherwise waits for the file descriptor of the epoll object
+  itself to become readable, which it does when any of the registered file descriptors is ready.
+  Each wait therefore costs a single hub listener, however many file descriptors are registered.
+  :class:`poll` objects read their results from a real poll object, and mirror their registrations
+  in an :class:`epoll` object to wait.
+
+:mod:`guv.green.selectors` uses these, so that :class:`selectors.DefaultSelector` is green too.
+"""
+import errno
 import select as select_orig
+import time
 
 error = select_orig.error
 from greenlet import getcurrent
 
+from .. import hubs
 from ..hubs import get_hub
 from ..const import READ, WRITE
+from ..patcher import copy_attributes
 
 ERROR = 'error'
 
-__patched__ = ['select']
+__patched__ = ['select', 'poll', 'epoll']
+
+# kqueue and devpoll objects aren't greenified, so they must not be picked by selectors
+copy_attributes(select_orig, globals(), ignore=__patched__ + ['devpoll', 'kqueue', 'kevent'],
+                srckeys=dir(select_orig))
+
+_poll = select_orig.poll
+_epoll = getattr(select_orig, 'epoll', None)
 
 
 def get_fileno(obj):
@@ -49,6 +73,11 @@ def select(read_list, write_list, error_list, timeout=None):
     for e in error_list:
         files.setdefault(get_fileno(e), {})[ERROR] = e
 
+    # report the files which are ready already, like select.select(), without waiting for the hub
+    ready = _select_ready(files)
+    if ready is not None or timeout == 0:
+        return ready or ([], [], [])
+
     listeners = []
 
     def on_read(d):
@@ -73,9 +102,9 @@ def select(read_list, write_list, error_list, timeout=None):
         timers.append(hub.schedule_call_global(timeout, on_timeout))
     try:
         for fd, v in files.items():
-            if v.get(READ):
+            if READ in v:
                 listeners.append(hub.add(READ, fd, on_read, on_error, (fd,)))
-            if v.get(WRITE):
+            if WRITE in v:
                 listeners.append(hub.add(WRITE, fd, on_write, on_error, (fd,)))
         try:
             return hub.switch()
@@ -85,3 +114,223 @@ def select(read_list, write_list, error_list, timeout=None):
     finally:
         for t in timers:
             t.cancel()
+
+
+def _select_ready(files):
+    """Check which files passed to :func:`select` are ready, without blocking
+
+    :param dict files: {fd: {READ/WRITE/ERROR: file}}
+    :return: (readable, writable, exceptional), or None if no file is ready
+    """
+    p = _poll()
+    for fd, v in files.items():
+        mask = 0
+        if READ in v:
+            mask |= POLLIN
+        if WRITE in v:
+            mask |= POLLOUT
+        if ERROR in v:
+            mask |= POLLPRI
+        p.register(fd, mask)
+
+    events = p.poll(0)
+    if not events:
+        return None
+
+    r, w, x = [], [], []
+    for fd, revents in events:
+        if revents & POLLNVAL:
+            raise error(errno.EBADF, 'Bad file descriptor')
+
+        v = files[fd]
+        if READ in v and revents & (POLLIN | POLLHUP | POLLERR):
+            r.append(v[READ])
+        if WRITE in v and revents & (POLLOUT | POLLERR):
+            w.append(v[WRITE])
+        if ERROR in v and revents & POLLPRI:
+            x.append(v[ERROR])
+
+    return r, w, x
+
+
+class _PollTimeout(Exception):
+    pass
+
+
+def _deadline(timeout):
+    """Get the monotonic time at which a timeout in seconds expires, or None for no timeout
+    """
+    if timeout is None or timeout < 0:
+        return None
+    return time.monotonic() + timeout
+
+
+def _wait(fd, deadline):
+    """Wait until the file descriptor is readable, or the deadline passes
+
+    :return: False if the deadline has passed
+    """
+    if deadline is None:
+        hubs.trampoline(fd, READ)
+        return True
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return False
+
+    try:
+        hubs.trampoline(fd, READ, remaining, _PollTimeout)
+    except _PollTimeout:
+        pass
+    return True
+
+
+if _epoll is not None:
+    class epoll:
+        """Greenified :class:`select.epoll` object
+
+        Registrations are kept by the kernel, so repeated calls to :meth:`poll` with the same
+        registrations don't require any work other than waiting for the file descriptor of the
+        epoll object.
+        """
+
+        def __init__(self, sizehint=-1, flags=0):
+            self._epoll = _epoll(sizehint, flags)
+            self._hub = get_hub()
+
+            # the file descriptor is new, but may have been recycled
+            self._hub.notify_opened(self._epoll.fileno())
+
+        @classmethod
+        def fromfd(cls, fd):
+            self = cls.__new__(cls)
+            self._epoll = _epoll.fromfd(fd)
+            self._hub = get_hub()
+            return self
+
+        def __del__(self):
+            if getattr(self, '_epoll', None) is not None:
+                self.close()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.close()
+
+        @property
+        def closed(self):
+            return self._epoll.closed
+
+        def close(self):
+            if not self._epoll.closed:
+                self._hub.notify_close(self._epoll.fileno())
+                self._epoll.close()
+
+        def fileno(self):
+            return self._epoll.fileno()
+
+        def register(self, fd, eventmask=EPOLLIN | EPOLLPRI | EPOLLOUT):
+            self._epoll.register(fd, eventmask)
+
+        def modify(self, fd, eventmask):
+            self._epoll.modify(fd, eventmask)
+
+        def unregister(self, fd):
+            self._epoll.unregister(fd)
+
+        def poll(self, timeout=-1, maxevents=-1):
+            """Wait for events
+
+            :param float timeout: maximum time to wait in seconds, or None or a negative number to
+                wait indefinitely
+            :param int maxevents: maximum number of events to return, or -1 for no limit
+            :return: list of (fd, events)
+            """
+            deadline = _deadline(timeout)
+            while True:
+                events = self._epoll.poll(0, maxevents)
+                if events or not _wait(self._epoll.fileno(), deadline):
+                    return events
+
+
+class poll:
+    """Greenified :func:`select.poll` object
+
+    Events are read from a real poll object, so they are exactly those of :func:`select.poll`. To
+    wait, the registrations are mirrored in an :class:`epoll` object if available (the event masks
+    of poll and epoll are the same on Linux), or passed to :func:`select` otherwise.
+    """
+
+    def __init__(self):
+        self._poll = _poll()
+
+        #: registered file descriptors: {fd: eventmask}
+        self._fds = {}
+
+        #: registrations which can be waited for: :class:`epoll` or None
+        self._epoll = epoll() if _epoll is not None else None
+
+    def register(self, fd, eventmask=POLLIN | POLLPRI | POLLOUT):
+        fd = get_fileno(fd)
+        self._poll.register(fd, eventmask)
+        self._mirror(fd, eventmask)
+
+    def modify(self, fd, eventmask):
+        fd = get_fileno(fd)
+        self._poll.modify(fd, eventmask)
+        self._mirror(fd, eventmask)
+
+    def unregister(self, fd):
+        fd = get_fileno(fd)
+        self._poll.unregister(fd)
+        del self._fds[fd]
+        if self._epoll is not None:
+            try:
+                self._epoll.unregister(fd)
+            except (OSError, ValueError):
+                pass
+
+    def _mirror(self, fd, eventmask):
+        self._fds[fd] = eventmask
+        if self._epoll is None:
+            return
+
+        eventmask &= POLLIN | POLLPRI | POLLOUT
+        try:
+            self._epoll.register(fd, eventmask)
+        except FileExistsError:
+            self._epoll.modify(fd, eventmask)
+        except OSError:
+            # regular files can't be registered (EPERM), but are always ready; invalid file
+            # descriptors are reported as POLLNVAL without waiting either
+            pass
+
+    def poll(self, timeout=None):
+        """Wait for events
+
+        :param int timeout: maximum time to wait in milliseconds, or None or a negative number to
+            wait indefinitely
+        :return: list of (fd, events)
+        """
+        deadline = _deadline(None if timeout is None else timeout / 1000)
+        while True:
+            events = self._poll.poll(0)
+            if events:
+                return events
+
+            if self._epoll is not None:
+                if not _wait(self._epoll.fileno(), deadline):
+                    return events
+                continue
+
+            if deadline is None:
+                remaining = None
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return events
+
+            readers = [fd for fd, mask in self._fds.items() if mask & (POLLIN | POLLPRI)]
+            writers = [fd for fd, mask in self._fds.items() if mask & POLLOUT]
+            select(readers, writers, [], remaining)
@@ -0,0 +1,16 @@
+"""Greenified :mod:`selectors` module
+
+The selectors use the green :func:`~guv.green.select.select`, :class:`~guv.green.select.poll` and
+:class:`~guv.green.select.epoll`, so :class:`DefaultSelector` (:class:`EpollSelector` on Linux)
+keeps its registrations across calls to :meth:`~selectors.BaseSelector.select`, and each call only
+waits on the hub for the file descriptor of its epoll object.
+"""
+from .. import patcher
+from . import select
+
+patcher.inject('selectors', globals(), ('select', select))
+
+__patched__ = ['DefaultSelector', 'SelectSelector', 'PollSelector', 'EpollSelector']
+
+# unlike the builtin select.select(), a Python function would be bound as a method
+SelectSelector._select = staticmethod(select.select)
@@ -21,20 +21,35 @@ SOCK_STREAM = socket_orig.SOCK_STREAM
 _GLOBAL_DEFAULT_TIMEOUT = socket_orig._GLOBAL_DEFAULT_TIMEOUT
 error = socket_orig.error
 
-if os.environ.get('GUV_NO_GREENDNS') is None:
-    try:
-        from ..support import greendns
+#: DNS resolver: 'greendns' (default; requires dnspython), 'libuv' (guv.support.uvdns, which uses
+#: libuv, or the thread pool with hubs other than pyuv_cffi) or 'blocking' (the functions of the
+#: socket module)
+dns_resolver = os.environ.get('GUV_DNS', 'blocking' if os.environ.get('GUV_NO_GREENDNS') else
+                              'greendns')
+greendns = None
 
-        gethostbyname = greendns.gethostbyname
-        getaddrinfo = greendns.getaddrinfo
-        gethostbyname_ex = greendns.gethostbyname_ex
-        getnameinfo = greendns.getnameinfo
-        __patched__ = __patched__ + ['gethostbyname_ex', 'getnameinfo']
+if dns_resolver == 'greendns':
+    try:
+        from ..support import greendns as resolver
 
+        greendns = resolver
         log.debug('Patcher: using greendns module for non-blocking DNS querying')
-    except ImportError as ex:
-        greendns = None
-        log.warn('Patcher: dnspython3 not found, falling back to blocking DNS querying'.format(ex))
+    except ImportError:
+        dns_resolver = 'libuv'
+        log.warning('Patcher: dnspython3 not found, falling back to uvdns (libuv or thread pool) '
+                    'DNS querying')
+
+if dns_resolver == 'libuv':
+    from ..support import uvdns as resolver
+
+    log.debug('Patcher: using uvdns module for non-blocking DNS querying')
+
+if dns_resolver != 'blocking':
+    gethostbyname = resolver.gethostbyname
+    getaddrinfo = resolver.getaddrinfo
+    gethostbyname_ex = resolver.gethostbyname_ex
+    getnameinfo = resolver.getnameinfo
+    __patched__ = __patched__ + ['gethostbyname_ex', 'getnameinfo']
 
 
 def create_connection(address, timeout=_GLOBAL_DEFAULT_TIMEOUT, source_address=None):
@@ -1,14 +1,35 @@
+"""Greenified :mod:`subprocess`
+
+:class:`Popen` wraps the pipes to the child process in cooperative file objects (see
+:mod:`guv.fileobject`), waits for the child process without polling (see
+:func:`guv.green.os.waitpid`), and serves the pipes from greenlets in :meth:`Popen.communicate` and
+:meth:`Popen.iter_lines`:
+
+- Each pipe is served by its own greenlet, which waits on the hub only when the pipe isn't ready.
+  The hubs keep their watcher for a file descriptor between waits, so this doesn't require setting
+  up and tearing down watchers for every chunk.
+- Pipes are read in chunks of :data:`PIPE_CHUNK_SIZE` into a reusable buffer, and input is written
+  without copying it.
+"""
+import codecs
 import errno
+import io
 import time
 from types import FunctionType
 
-from .. import patcher, sleep
+from .. import hubs, patcher
+from ..fileobject import fdopen
+from ..green import os as green_os
 from ..green import select
-from ..fileobject import FileObject
+from ..greenthread import spawn
+from ..timeout import Timeout
 
 patcher.inject('subprocess', globals(), ('select', select))
 import subprocess as subprocess_orig
 
+#: size of the chunks read from pipes by :meth:`Popen.communicate` and :meth:`Popen.iter_lines`
+PIPE_CHUNK_SIZE = 256 * 1024
+
 if getattr(subprocess_orig, 'TimeoutExpired', None) is None:
     # python < 3.3 needs this defined
     class TimeoutExpired(Exception):
@@ -23,60 +44,247 @@ if getattr(subprocess_orig, 'TimeoutExpired', None) is None:
             return 'Command "{}" timed out after {} seconds'.format(self.cmd, self.timeout)
 
 
+def _translate_newlines(data, f):
+    """Decode the output read from a pipe in text mode, with universal newlines
+    """
+    data = data.decode(f.encoding, f.errors)
+    return data.replace('\r\n', '\n').replace('\r', '\n')
+
+
 class Popen(subprocess_orig.Popen):
     """Greenified :class:`subprocess.Popen`
     """
 
-    def __init__(self, args, bufsize=0, *argss, **kwds):
-        if subprocess_orig.mswindows:
+    def __init__(self, args, bufsize=-1, *argss, **kwds):
+        if getattr(subprocess_orig, '_mswindows', getattr(subprocess_orig, 'mswindows', False)):
             raise Exception('Greenified Popen not supported on Windows')
 
         self.args = args
+
+        #: greenlets serving the pipes, once communication has started
+        self._pipe_greenlets = None
+
+        #: output read from stdout and stderr: {name: bytearray}
+        self._pipe_output = {}
+
+        #: raw file objects of the pipes: {name: guv.fileobject.FileObjectPosix}
+        self._raw_pipes = {}
+
         super().__init__(args, 0, *argss, **kwds)
 
         for attr in 'stdin', 'stdout', 'stderr':
             pipe = getattr(self, attr)
-            if pipe is not None and not type(pipe) == FileObject:
-                wrapped_pipe = FileObject(pipe, pipe.mode, bufsize)
-                setattr(self, attr, wrapped_pipe)
-
-    def wait(self, timeout=None, check_interval=0.01):
-        # Instead of a blocking OS call, this version of wait() uses logic
-        # borrowed from the guv 0.2 processes.Process.wait() method.
-        if timeout is not None:
-            endtime = time.time() + timeout
+            if pipe is not None:
+                setattr(self, attr, self._green_pipe(attr, pipe, bufsize))
+
+    def _green_pipe(self, name, pipe, bufsize):
+        """Replace a pipe opened by :class:`subprocess.Popen` with a cooperative file object
+        """
+        text = isinstance(pipe, io.TextIOBase)
+        if text:
+            encoding, errors = pipe.encoding, pipe.errors
+            pipe = pipe.detach()
+
+        # the pipe is new, but its file descriptor may have been recycled
+        hubs.get_hub().notify_opened(pipe.fileno())
+
+        if text and bufsize == 0:
+            bufsize = -1
+        green_pipe = fdopen(pipe, pipe.mode, bufsize)
+        self._raw_pipes[name] = getattr(green_pipe, 'raw', green_pipe)
+
+        if text:
+            # like subprocess.Popen
+            green_pipe = io.TextIOWrapper(green_pipe, encoding, errors,
+                                          write_through=name == 'stdin',
+                                          line_buffering=bufsize == 1)
+        return green_pipe
+
+    def wait(self, timeout=None, check_interval=None):
+        # The hub wakes up this greenlet when it receives SIGCHLD for the child process (see
+        # guv.green.os.waitpid()). `check_interval` is no longer used.
+        if self.returncode is not None:
+            return self.returncode
+
+        with Timeout(timeout, TimeoutExpired(self.args, timeout)):
+            while self.returncode is None:
+                try:
+                    pid, status = green_os.waitpid(self.pid, 0)
+                except ChildProcessError:
+                    # the child process has already been reaped (such as by poll() in another
+                    # greenlet), or SIGCHLD is ignored and its status is lost
+                    if self.returncode is None:
+                        self.returncode = -1
+                else:
+                    if pid == self.pid:
+                        self._handle_exitstatus(status)
+
+        return self.returncode
+
+    def communicate(self, input=None, timeout=None):
+        """Send `input` to stdin, read stdout and stderr until EOF, and wait for the process to exit
+
+        The pipes are served by greenlets. If the timeout expires, they keep serving the pipes in
+        the background; call :meth:`communicate` again (without `input`) to resume waiting.
+
+        :param input: data to send to stdin (str in text mode, bytes otherwise), which is closed
+            afterwards
+        :param float timeout: maximum time to wait in seconds
+        :return: (stdout, stderr); None for each stream which isn't a pipe
+        :raise TimeoutExpired: if the timeout expires
+        """
+        if self._pipe_greenlets is None:
+            self._serve_pipes(input, read_stdout=True)
+        elif input:
+            raise ValueError('Cannot send input after starting communication')
+
+        with Timeout(timeout, TimeoutExpired(self.args, timeout)):
+            for g in self._pipe_greenlets:
+                g.wait()
+            self.wait()
+
+        return self._output('stdout'), self._output('stderr')
+
+    def iter_lines(self, input=None):
+        """Iterate over the lines written to stdout by the process, as they are written
+
+        Lines include the line terminator, except possibly the last one. In text mode, lines are
+        decoded with universal newlines.
+
+        The other pipes are served in the background while iterating: `input` is sent to stdin,
+        and stderr is read. Call :meth:`communicate` afterwards to get the output of stderr and
+        wait for the process to exit. stdout is closed when iteration stops.
+
+        Usage::
+
+            p = subprocess.Popen(['tail', '-f', 'access.log'], stdout=subprocess.PIPE)
+            for line in p.iter_lines():
+                ...
+
+        :param input: data to send to stdin (str in text mode, bytes otherwise), which is closed
+            afterwards
+        :return: iterator of lines (str in text mode, bytes otherwise)
+        """
+        if self.stdout is None:
+            raise ValueError('stdout is not a pipe')
+        if self._pipe_greenlets is not None:
+            raise ValueError('Cannot iterate over lines after starting communication')
+
+        self._serve_pipes(input, read_stdout=False)
+        return self._iter_lines()
+
+    def _iter_lines(self):
+        if isinstance(self.stdout, io.TextIOBase):
+            decoder = codecs.getincrementaldecoder(self.stdout.encoding)(self.stdout.errors)
+            decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+            newline = '\n'
+            pending = ''
+        else:
+            decoder = None
+            newline = b'\n'
+            pending = b''
+
+        try:
+            for chunk in self._iter_chunks('stdout'):
+                if decoder is not None:
+                    data = pending + decoder.decode(chunk)
+                else:
+                    data = pending + chunk
+
+                # keep the last line until it's complete, and split the others in C
+                end = data.rfind(newline) + 1
+                pending = data[end:]
+                if end:
+                    if decoder is not None:
+                        yield from io.StringIO(data[:end], newline='\n')
+                    else:
+                        yield from io.BytesIO(data[:end])
+
+            if decoder is not None:
+                pending += decoder.decode(b'', True)
+            if pending:
+                yield pending
+        finally:
+            self.stdout.close()
+
+    def _serve_pipes(self, input, read_stdout):
+        """Spawn the greenlets serving the pipes
+        """
+        self._pipe_greenlets = []
+        if self.stdin:
+            if input and isinstance(self.stdin, io.TextIOBase):
+                input = input.encode(self.stdin.encoding, self.stdin.errors)
+            self._pipe_greenlets.append(spawn(self._write_stdin, input))
+
+        for name in 'stdout', 'stderr':
+            if getattr(self, name) is not None:
+                self._pipe_output[name] = bytearray()
+                if name == 'stderr' or read_stdout:
+                    self._pipe_greenlets.append(spawn(self._read_pipe, name))
+
+    def _write_stdin(self, input):
         try:
-            while True:
-                status = self.poll()
-                if status is not None:
-                    return status
-                if timeout is not None and time.time() > endtime:
-                    raise TimeoutExpired(self.args, timeout)
-                sleep(check_interval)
-        except OSError as e:
-            if e.errno == errno.ECHILD:
-                # no child process, this happens if the child process
-                # already died and has been cleaned up
-                return -1
-            else:
-                raise
-
-        # don't want to rewrite the original _communicate() method, we
-        # just want a version that uses guv.green.select.select()
-        # instead of select.select().
-        _communicate = FunctionType(subprocess_orig.Popen._communicate.__code__, globals())
+            # data written by the caller is sent first
+            self.stdin.flush()
+            if input:
+                view = memoryview(input).cast('B')
+                write = self._raw_pipes['stdin'].write
+                while view:
+                    view = view[write(view):]
+        except BrokenPipeError:
+            # the process doesn't read its input
+            pass
+
         try:
-            _communicate_with_select = FunctionType(
-                subprocess_orig.Popen._communicate_with_select.__code__, globals())
-            _communicate_with_poll = FunctionType(
-                subprocess_orig.Popen._communicate_with_poll.__code__, globals())
-        except AttributeError:
+            self.stdin.close()
+        except BrokenPipeError:
             pass
 
-    __init__.__doc__ = super().__init__.__doc__
-    wait.__doc__ = super().wait.__doc__
+    def _read_pipe(self, name):
+        output = self._pipe_output[name]
+        for chunk in self._iter_chunks(name):
+            output += chunk
+        getattr(self, name).close()
+
+    def _iter_chunks(self, name):
+        """Read a pipe until EOF
+
+        Each chunk is a view of a reusable buffer, which is only valid until the next chunk is read.
+        """
+        readinto = self._raw_pipes[name].readinto
+        buf = bytearray(PIPE_CHUNK_SIZE)
+        view = memoryview(buf)
+        while True:
+            n = readinto(buf)
+            if not n:
+                return
+            yield view[:n]
+
+    def _output(self, name):
+        output = self._pipe_output.get(name)
+        if output is None:
+            return None
+
+        if isinstance(getattr(self, name), io.TextIOBase):
+            return _translate_newlines(output, getattr(self, name))
+        return bytes(output)
+
+    __init__.__doc__ = subprocess_orig.Popen.__init__.__doc__
+    wait.__doc__ = subprocess_orig.Popen.wait.__doc__
+
+
+def _green_function(func):
+    """Copy a function of :mod:`subprocess` so that it references the patched :class:`Popen`
+    rather than :class:`subprocess.Popen`
+    """
+    green_func = FunctionType(func.__code__, globals(), func.__name__, func.__defaults__)
+    green_func.__kwdefaults__ = func.__kwdefaults__
+    green_func.__doc__ = func.__doc__
+    return green_func
+
 
-# Borrow `subprocess.call()` and `check_call()`, but patch them so they reference
-# the patched `Popen` class rather than `subprocess.Popen`
-call = FunctionType(subprocess_orig.call.__code__, globals())
-check_call = FunctionType(subprocess_orig.check_call.__code__, globals())
+call = _green_function(subprocess_orig.call)
+check_call = _green_function(subprocess_orig.check_call)
+check_output = _green_function(subprocess_orig.check_output)
+if hasattr(subprocess_orig, 'run'):
+    run = _green_function(subprocess_orig.run)
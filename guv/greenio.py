@@ -6,7 +6,7 @@ import errno
 from errno import EWOULDBLOCK, EBADF
 
 from . import patcher
-from .hubs import trampoline
+from .hubs import trampoline, notify_opened, notify_close, get_hub
 from .exceptions import IOClosed, SOCKET_BLOCKING, SOCKET_CLOSED, CONNECT_ERR, CONNECT_SUCCESS
 from .const import READ, WRITE
 
@@ -42,6 +42,9 @@ class socket(_socket.socket):
         super().setblocking(False)
         self.timeout = _socket.getdefaulttimeout()
 
+        # the OS may have recycled the file descriptor of a socket which was closed silently
+        notify_opened(self.fileno())
+
     def _trampoline(self, fd, evtype, timeout=None, timeout_exc=None):
         """
         We need to trampoline via the event hub. We catch any signal back from the hub indicating
@@ -58,6 +61,20 @@ class socket(_socket.socket):
             self._closed = True
             raise
 
+    def _complete(self, name, *args):
+        """Perform a blocking socket operation with the hub's completion-style API
+
+        See :attr:`guv.hubs.abc.AbstractHub.completion_io`.
+        """
+        if self._closed and self._io_refs <= 0:
+            raise IOClosed()
+        try:
+            return getattr(get_hub(), name)(self.fileno(), *args, timeout=self.gettimeout(),
+                                            timeout_exc=s_timeout('timed out'))
+        except IOClosed:
+            self._closed = True
+            raise
+
     @property
     def type(self):
         return _socket.socket.type.__get__(self) & ~O_NONBLOCK
@@ -79,6 +96,16 @@ class socket(_socket.socket):
                 return client_sock, addr
 
             # else: EWOULDBLOCK
+            if get_hub().completion_io:
+                try:
+                    fd = self._complete('accept')
+                except s_error as e:
+                    if e.args[0] != EWOULDBLOCK:
+                        raise
+                else:
+                    client_sock = socket(self.family, self.type, self.proto, fileno=fd)
+                    return client_sock, client_sock.getpeername()
+
             self._trampoline(self.fileno(), READ, timeout=self.gettimeout(),
                              timeout_exc=s_timeout('timed out'))
 
@@ -90,6 +117,7 @@ class socket(_socket.socket):
     def close(self):
         self._closed = True
         if self._io_refs <= 0:
+            notify_close(self.fileno())
             self._real_close()
 
     @property
@@ -196,6 +224,13 @@ class socket(_socket.socket):
             except s_error as ex:
                 if ex.args[0] != EWOULDBLOCK or self.timeout == 0.0:
                     raise
+            if get_hub().completion_io:
+                try:
+                    return self._complete('recv_into', *args)
+                except s_error as ex:
+                    # some kernels do not wait on non-blocking sockets; fall back to waiting here
+                    if ex.args[0] != EWOULDBLOCK:
+                        raise
             self._trampoline(self.fileno(), READ, timeout=self.gettimeout(),
                              timeout_exc=s_timeout("timed out"))
 
@@ -206,6 +241,13 @@ class socket(_socket.socket):
             if e.args[0] != EWOULDBLOCK:
                 raise
 
+            if get_hub().completion_io:
+                try:
+                    return self._complete('send', data, flags)
+                except s_error as e2:
+                    if e2.args[0] != EWOULDBLOCK:
+                        raise
+
             self._trampoline(self.fileno(), WRITE, timeout=self.gettimeout(),
                              timeout_exc=s_timeout("timed out"))
 
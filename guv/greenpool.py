@@ -106,6 +106,8 @@ class GreenPool:
         else:
             self.sem.acquire()
             g = greenthread.spawn_n(self._spawn_n_impl, function, args, kwargs, True)
+            if greenthread._function_recorders:
+                g.function = function
             if not self.coroutines_running:
                 self.no_coros_running = event.Event()
             self.coroutines_running.add(g)
@@ -7,6 +7,10 @@ from .support import reraise
 
 __all__ = ['sleep', 'spawn', 'spawn_n', 'kill', 'spawn_after', 'GreenThread']
 
+#: number of started :class:`guv.util.accounting.CPUAccounting` objects; while there are any, the
+#: greenlets created by :func:`spawn_n` are given the function they run as `function` attribute
+_function_recorders = 0
+
 
 def sleep(seconds=0):
     """Yield control to the hub until at least `seconds` have elapsed
@@ -16,11 +20,16 @@ def sleep(seconds=0):
     hub = hubs.get_hub()
     current = greenlet.getcurrent()
     assert hub is not current, 'do not call blocking functions from the hub'
+    profiler = hub.wait_profiler
+    if profiler is not None:
+        start = profiler.wait_started()
     timer = hub.schedule_call_global(seconds, current.switch)
     try:
         hub.switch()
     finally:
         timer.cancel()
+        if profiler is not None:
+            profiler.wait_ended('sleep', start)
 
 
 def spawn_n(func, *args, **kwargs):
@@ -42,6 +51,8 @@ def spawn_n(func, *args, **kwargs):
     """
     hub = hubs.get_hub()
     g = greenlet.greenlet(func, parent=hub)
+    if _function_recorders:
+        g.function = func
     hub.schedule_call_now(g.switch, *args, **kwargs)
     return g
 
@@ -100,6 +111,10 @@ class GreenThread(greenlet.greenlet):
         :type parent: greenlet.greenlet
         """
         greenlet.greenlet.__init__(self, self.main, parent)
+
+        #: function run by the GreenThread, once it has started
+        self.function = None
+
         self._exit_event = event.Event()
         self._resolving_links = False
 
@@ -147,6 +162,7 @@ class GreenThread(greenlet.greenlet):
             return False
 
     def main(self, function, *args, **kwargs):
+        self.function = function
         try:
             result = function(*args, **kwargs)
         except:
@@ -1,11 +1,18 @@
 from abc import ABCMeta, abstractmethod
+from collections import deque
+import functools
 import greenlet
+import os
+import posix  # os.waitpid() may be monkey-patched
+import signal
 import sys
+import time
 import traceback
 from greenlet import GreenletExit
 
 from ..const import READ, WRITE
 from ..exceptions import SYSTEM_ERROR
+from .metrics import HubMetrics
 
 NOT_ERROR = (GreenletExit, SystemExit)
 
@@ -40,13 +47,75 @@ class AbstractListener(metaclass=ABCMeta):
     __str__ = __repr__
 
 
+class ChildWatcher:
+    """Callbacks for the exit of a child process, registered with :meth:`AbstractHub.watch_child`
+    """
+    __slots__ = ['pid', 'options', 'cb', 'tb']
+
+    def __init__(self, pid, options, cb, tb):
+        self.pid = pid
+        self.options = options
+        self.cb = cb
+        self.tb = tb
+
+    def __repr__(self):
+        return '{0}({1.pid}, {1.options})'.format(type(self).__name__, self)
+
+
 class AbstractHub(greenlet.greenlet, metaclass=ABCMeta):
+    #: True if the hub implements the completion-style socket operations `recv_into(fd, buf,
+    #: nbytes, flags, timeout, timeout_exc)`, `send(fd, data, flags, timeout, timeout_exc)` and
+    #: `accept(fd, timeout, timeout_exc)`, which suspend the calling greenlet until the operation
+    #: has been performed
+    completion_io = False
+
     def __init__(self):
         super().__init__()
         self.listeners = {READ: {}, WRITE: {}}
         self.Listener = AbstractListener
         self.stopping = False
 
+        #: ready queue of callbacks scheduled with :meth:`schedule_call_now`: deque of (cb, args)
+        self.callbacks = deque()
+
+        #: maximum number of scheduled callbacks to run per loop iteration, or None for no limit;
+        #: the remaining callbacks are run after the loop has polled for I/O
+        self.callback_budget = 1000
+
+        #: maximum time (in seconds) to spend running scheduled callbacks per loop iteration, or
+        #: None for no limit
+        self.callback_time_budget = None
+
+        #: number of times a callback was deferred to a later loop iteration because the budget
+        #: was exhausted
+        self.callbacks_deferred = 0
+
+        #: callbacks scheduled from other threads with :meth:`schedule_call_threadsafe`
+        self._threadsafe_callbacks = deque()
+
+        #: True while the hub has been woken up, but has not run `_fire_threadsafe_callbacks()` yet
+        self._threadsafe_wakeup = False
+
+        #: number of callbacks from other threads the loop must keep running for
+        self._threadsafe_refs = 0
+
+        #: watchers of child processes: {pid: [ChildWatcher]}
+        self.child_watchers = {}
+
+        #: None until the hub has tried to receive SIGCHLD, then whether it succeeded
+        self._sigchld_started = None
+        self._sigchld_previous = None
+
+        #: event loop health metrics
+        self.metrics = HubMetrics(self)
+
+        #: :class:`guv.util.waits.WaitProfiler` which greenlets record their waits with, or None
+        self.wait_profiler = None
+
+        #: :class:`guv.util.watchdog.Watchdog` started by
+        #: :func:`guv.util.debug.hub_blocking_detection`, which is stopped when the hub is closed
+        self.watchdog = None
+
         self._debug_exceptions = True
 
     @abstractmethod
@@ -60,7 +129,35 @@ class AbstractHub(greenlet.greenlet, metaclass=ABCMeta):
         """
         pass
 
+    def close(self):
+        """Stop the runloop and release the resources of the hub, such as its file descriptors
+
+        This is meant for hubs of threads which are about to exit. Greenlets still waiting on the
+        hub are abandoned, and the hub must not be used afterwards.
+
+        If the runloop is suspended (while greenlets run), it is resumed so that it returns to the
+        parent of the hub, which must therefore be the calling greenlet (normally the main greenlet
+        of the thread).
+        """
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+
+        if self:
+            if greenlet.getcurrent() is not self.parent:
+                raise RuntimeError('The hub must be closed from its parent greenlet')
+
+            self.abort()
+            self._wakeup()
+            self.switch()
+
+        self._close()
+
     @abstractmethod
+    def _close(self):
+        """Release the resources of the hub once its runloop has returned
+        """
+
     def schedule_call_now(self, cb, *args, **kwargs):
         """Schedule a callable to be called on the next event loop iteration
 
@@ -70,7 +167,210 @@ class AbstractHub(greenlet.greenlet, metaclass=ABCMeta):
         :param args: positional arguments to pass to the callback
         :param kwargs: keyword arguments to pass to the callback
         """
-        pass
+        if kwargs:
+            cb = functools.partial(cb, *args, **kwargs)
+            args = ()
+
+        self.callbacks.append((cb, args))
+
+    def schedule_call_threadsafe(self, cb, *args, **kwargs):
+        """Schedule a callable to be called on the next event loop iteration from any thread
+
+        This is the only method of the hub which is safe to call from threads other than the
+        hub's thread. The hub is woken up if it is waiting for I/O. Callbacks scheduled in quick
+        succession are batched, so that the hub is woken up once for all of them.
+
+        Note: the loop does not keep running just because callbacks may be scheduled from other
+        threads. See :meth:`ref_threadsafe`.
+
+        :param Callable cb: callback to call in the hub's thread
+        :param args: positional arguments to pass to the callback
+        :param kwargs: keyword arguments to pass to the callback
+        """
+        if kwargs:
+            cb = functools.partial(cb, *args, **kwargs)
+            args = ()
+
+        self._threadsafe_callbacks.append((cb, args))
+        if not self._threadsafe_wakeup:
+            self._threadsafe_wakeup = True
+            self._wakeup()
+
+    def ref_threadsafe(self):
+        """Keep the loop running until a matching call to :meth:`unref_threadsafe`
+
+        This must be called (from the hub's thread) by greenlets which wait for a callback
+        scheduled with :meth:`schedule_call_threadsafe`, since the loop would otherwise exit if
+        there is nothing else to do.
+        """
+        self._threadsafe_refs += 1
+
+    def unref_threadsafe(self):
+        """Undo a call to :meth:`ref_threadsafe`
+        """
+        self._threadsafe_refs -= 1
+
+    def _wakeup(self):
+        """Wake up the hub's loop from another thread
+
+        The hub must call :meth:`_fire_threadsafe_callbacks` in its own thread when woken up.
+        """
+        raise NotImplementedError('{} does not support calls from other threads'
+                                  .format(type(self).__name__))
+
+    def _fire_threadsafe_callbacks(self):
+        """Move callbacks scheduled from other threads to the ready queue
+        """
+        # reset the flag first: callbacks scheduled after this point will wake up the hub again
+        self._threadsafe_wakeup = False
+
+        threadsafe_callbacks = self._threadsafe_callbacks
+        callbacks = self.callbacks
+        while threadsafe_callbacks:
+            callbacks.append(threadsafe_callbacks.popleft())
+
+    def _run_callbacks(self):
+        """Run callbacks scheduled with :meth:`schedule_call_now`
+
+        Callbacks are run in the order they were scheduled, until the budget for this loop
+        iteration (:attr:`callback_budget` and :attr:`callback_time_budget`) is exhausted. Callbacks
+        scheduled while doing so are left for the next loop iteration, so that I/O is polled for
+        between callbacks which keep rescheduling themselves (or others).
+        """
+        callbacks = self.callbacks
+        popleft = callbacks.popleft
+        ready = n = len(callbacks)
+        if self.callback_budget is not None and n > self.callback_budget:
+            n = self.callback_budget
+
+        if self.callback_time_budget is None:
+            for _ in range(n):
+                cb, args = popleft()
+                try:
+                    cb(*args)
+                except:
+                    self._squelch_exception(sys.exc_info())
+        else:
+            deadline = time.perf_counter() + self.callback_time_budget
+            for i in range(n):
+                cb, args = popleft()
+                try:
+                    cb(*args)
+                except:
+                    self._squelch_exception(sys.exc_info())
+
+                if time.perf_counter() >= deadline:
+                    n = i + 1
+                    break
+
+        # callbacks which were ready, but have not been run
+        self.callbacks_deferred += ready - n
+        self.metrics.callbacks_run += n
+
+    def watch_child(self, pid, options, cb, tb):
+        """Call `cb(pid, status)` when a child process exits
+
+        `pid` and `options` have the same meaning as for :func:`os.waitpid` (without
+        ``os.WNOHANG``). When the hub receives SIGCHLD, it calls `os.waitpid(pid, options |
+        os.WNOHANG)` for each pid being watched, so only child processes which are being watched are
+        reaped. Each watcher is called at most once, after it has been removed. If `os.waitpid`
+        fails (for example, because the child process has already been reaped), `tb(exc)` is called
+        instead.
+
+        The callbacks are only called on SIGCHLD, so the caller must check whether the child process
+        has already exited after registering the watcher.
+
+        :param int pid: process ID (or process group, as for :func:`os.waitpid`)
+        :param int options: options for :func:`os.waitpid`
+        :param cb: callback to call with (pid, status) of the child process
+        :param tb: throwback used to signal an error
+        :return: watcher, or None if the hub can't receive SIGCHLD (for example, if the hub doesn't
+                 run in the main thread of a process)
+        :rtype: ChildWatcher
+        """
+        if self._sigchld_started is None:
+            self._sigchld_started = self._start_sigchld()
+
+        if not self._sigchld_started:
+            return None
+
+        watcher = ChildWatcher(pid, options, cb, tb)
+        if not self.child_watchers:
+            self._ref_sigchld(True)
+
+        self.child_watchers.setdefault(pid, []).append(watcher)
+        return watcher
+
+    def unwatch_child(self, watcher):
+        """Remove a watcher registered with :meth:`watch_child`
+
+        Nothing is done if the watcher has already been removed.
+
+        :type watcher: ChildWatcher
+        """
+        watchers = self.child_watchers.get(watcher.pid)
+        if watchers is None or watcher not in watchers:
+            return
+
+        watchers.remove(watcher)
+        if not watchers:
+            del self.child_watchers[watcher.pid]
+            if not self.child_watchers:
+                self._ref_sigchld(False)
+
+    def _start_sigchld(self):
+        """Start receiving SIGCHLD, and call :meth:`_reap_children` in the hub's thread
+
+        This installs a Python signal handler, which wakes up the loop with
+        :meth:`schedule_call_threadsafe`. A previously installed handler is still called.
+
+        :return: True if successful
+        """
+        try:
+            self._sigchld_previous = signal.signal(signal.SIGCHLD, self._sigchld_handler)
+        except (ValueError, NotImplementedError):
+            # not the main thread
+            return False
+
+        signal.siginterrupt(signal.SIGCHLD, False)
+        return True
+
+    def _sigchld_handler(self, signum, frame):
+        self.schedule_call_threadsafe(self._reap_children)
+
+        previous = self._sigchld_previous
+        if callable(previous):
+            previous(signum, frame)
+
+    def _ref_sigchld(self, ref):
+        """Keep the loop running while child processes are watched (or stop doing so)
+        """
+        if ref:
+            self.ref_threadsafe()
+        else:
+            self.unref_threadsafe()
+
+    def _reap_children(self):
+        """Reap the watched child processes which have exited, and call their watchers
+
+        Watchers of specific pids are served before watchers of any child (or process group).
+        """
+        for pid in sorted(self.child_watchers, key=lambda pid: pid <= 0):
+            watchers = self.child_watchers.get(pid)
+            while watchers:
+                watcher = watchers[0]
+                try:
+                    rpid, status = posix.waitpid(pid, watcher.options | os.WNOHANG)
+                except OSError as e:
+                    self.unwatch_child(watcher)
+                    self.schedule_call_now(watcher.tb, e)
+                    continue
+
+                if not rpid:
+                    break
+
+                self.unwatch_child(watcher)
+                self.schedule_call_now(watcher.cb, rpid, status)
 
     @abstractmethod
     def schedule_call_global(self, seconds, cb, *args, **kwargs):
@@ -91,7 +391,8 @@ class AbstractHub(greenlet.greenlet, metaclass=ABCMeta):
         """Signal the hub to watch the given file descriptor for an I/O event
 
         When the file descriptor is ready for the specified I/O event type, `cb` is called with
-        the specified `cb_args`.
+        the specified `cb_args`. There can be one READ and one WRITE listener for a file
+        descriptor at the same time.
 
         :param int evtype: either the constant READ or WRITE
         :param int fd: file number of the file of interest
@@ -119,8 +420,14 @@ class AbstractHub(greenlet.greenlet, metaclass=ABCMeta):
         """Switch to the hub greenlet
         """
         assert greenlet.getcurrent() is not self, 'Cannot switch to the hub from the hub'
+        self.metrics.switches += 1
         return super().switch()
 
+    def count_poll_handles(self):
+        """Get the number of file descriptors the hub polls for I/O
+        """
+        return len(self.listeners[READ].keys() | self.listeners[WRITE].keys())
+
     def notify_opened(self, fd):
         """Mark the specified file descriptor as recently opened
 
@@ -132,14 +439,30 @@ class AbstractHub(greenlet.greenlet, metaclass=ABCMeta):
         :param int fd: file descriptor
         :return: True if found else false
         """
-        found = False
+        return self._remove_fd_listeners(fd)
+
+    def notify_close(self, fd):
+        """Mark the specified file descriptor as about to be closed
+
+        Any listeners for this file descriptor are removed, and the hub releases any resources it
+        holds for it. This must be called *before* the file descriptor is actually closed.
 
-        # remove any existing listeners for this file descriptor
+        :param int fd: file descriptor
+        :return: True if found else false
+        """
+        return self._remove_fd_listeners(fd)
+
+    def _remove_fd_listeners(self, fd):
+        """Remove the listeners for a file descriptor
+
+        :param int fd: file descriptor
+        :return: True if there were any, else False
+        """
+        found = False
         for bucket in self.listeners.values():
             if fd in bucket:
                 found = True
-                listener = bucket[fd]
-                self.remove(listener)
+                self.remove(bucket[fd])
 
         return found
 
@@ -165,8 +488,10 @@ class AbstractHub(greenlet.greenlet, metaclass=ABCMeta):
         :param listener: listener to remove
         :type listener: self.Listener
         """
-        self.listeners[listener.evtype][listener.fd] = None
-        del self.listeners[listener.evtype][listener.fd]
+        bucket = self.listeners[listener.evtype]
+        if bucket.get(listener.fd) is listener:
+            # the listener may have been replaced after it was removed by `notify_opened()`
+            del bucket[listener.fd]
 
     def _squelch_exception(self, exc_info):
         if self._debug_exceptions and not issubclass(exc_info[0], NOT_ERROR):
@@ -0,0 +1,337 @@
+"""Loop implementation using :func:`select.epoll`
+
+This is a pure-Python hub for Linux which requires neither libuv nor cffi. It is selected
+automatically if pyuv_cffi is not available, or explicitly by setting the environment variable
+``GUV_HUB=epoll``.
+
+Notes:
+
+- File descriptors are registered with the epoll object the first time a greenlet waits on them,
+  in level-triggered one-shot mode, so a greenlet waiting on a file descriptor which is already
+  ready is woken up immediately, as with the other hubs. The registration is kept until the hub is
+  notified that the file descriptor is closed (or recycled), and is re-armed for the events which
+  are waited for whenever a listener is added, which costs a single :meth:`select.epoll.modify`
+  call. The file descriptor is registered again if it was closed and reused without notifying the
+  hub, since the kernel removes closed file descriptors from the epoll set.
+- Timers are kept in a heap and cancelled lazily, as in the pyuv_cffi hub.
+- Callbacks scheduled with :meth:`Hub.schedule_call_now` are run once per loop iteration, up to
+  the hub's callback budget. Remaining callbacks, and callbacks scheduled by these callbacks, are
+  run on the next loop iteration, after polling for I/O without blocking.
+- Callbacks scheduled from other threads with :meth:`Hub.schedule_call_threadsafe` wake up the hub
+  by writing to a pipe.
+- Child processes watched with :meth:`Hub.watch_child` are reaped when SIGCHLD is received. The
+  Python signal handler wakes up the hub like :meth:`Hub.schedule_call_threadsafe`, so this is only
+  supported if the hub runs in the main thread.
+- :meth:`Hub.run` returns when there are no listeners, timers or callbacks remaining, and no
+  greenlets wait for callbacks from other threads.
+"""
+import errno
+import fcntl
+import logging
+import heapq
+import os
+import select
+import sys
+import time
+
+import greenlet
+
+from . import abc
+from .timer import HubTimer
+from .. import patcher
+from ..const import READ, WRITE
+from ..exceptions import IOClosed
+
+log = logging.getLogger('guv')
+
+EPOLLIN = select.EPOLLIN
+EPOLLOUT = select.EPOLLOUT
+EPOLLERR = select.EPOLLERR
+EPOLLHUP = select.EPOLLHUP
+EPOLLONESHOT = select.EPOLLONESHOT
+EPOLLRDHUP = getattr(select, 'EPOLLRDHUP', 0x2000)
+
+#: events registered for listeners waiting for READ and WRITE
+EPOLL_EVENTS = {READ: EPOLLIN | EPOLLRDHUP, WRITE: EPOLLOUT}
+
+#: events which wake up listeners waiting for READ
+READ_MASK = EPOLLIN | EPOLLRDHUP | EPOLLERR | EPOLLHUP
+
+#: events which wake up listeners waiting for WRITE
+WRITE_MASK = EPOLLOUT | EPOLLERR | EPOLLHUP
+
+# select.epoll is replaced with the green epoll object if the select module is monkey-patched
+_epoll = patcher.original('select').epoll
+
+
+class FdListener(abc.AbstractListener):
+    def __init__(self, evtype, fd, cb, tb, cb_args=()):
+        """
+        :param cb: callback to call when the file descriptor is ready for `evtype`
+        :param tb: throwback used to signal (into the greenlet) that the file was closed
+        :param tuple cb_args: callback positional arguments
+        """
+        super().__init__(evtype, fd)
+        self.cb = cb
+        self.tb = tb
+        self.cb_args = cb_args
+
+
+class Hub(abc.AbstractHub):
+    def __init__(self):
+        super().__init__()
+        self.Listener = FdListener
+        self.stopping = False
+        self.running = False
+
+        #: heap of pending (and lazily cancelled) timers, ordered by expiry time
+        #: :type: list[HubTimer]
+        self.timers = []
+        self._timers_cancelled = 0
+
+        self.poll = _epoll()
+
+        #: file descriptors currently registered with `self.poll`, and the events they are armed for
+        #: (0 once an event was reported): {fd: events}
+        self.registered = {}
+
+        # pipe to be woken up by `schedule_call_threadsafe()`
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        for fd in (self._wakeup_r, self._wakeup_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+        self.poll.register(self._wakeup_r, EPOLLIN)
+
+    def run(self):
+        assert self is greenlet.getcurrent()
+
+        if self.stopping:
+            return
+
+        if self.running:
+            raise RuntimeError("The hub's runloop is already running")
+
+        log.debug('Start runloop')
+        try:
+            self.running = True
+            self.stopping = False
+            self.metrics.loop_started()
+            while not self.stopping:
+                if self.timers:
+                    self._fire_timers()
+
+                if self.callbacks:
+                    self._run_callbacks()
+
+                if self.callbacks:
+                    timeout = 0
+                elif self.timers:
+                    timeout = max(self.timers[0].absolute_time - time.monotonic(), 0)
+                elif self.listeners[READ] or self.listeners[WRITE] or self._threadsafe_refs:
+                    timeout = -1
+                else:
+                    # nothing left which could switch back to any greenlet
+                    break
+
+                self._poll(timeout)
+        finally:
+            self.running = False
+            self.stopping = False
+
+    def abort(self):
+        log.debug('Abort loop')
+        if self.running:
+            self.stopping = True
+
+    def count_poll_handles(self):
+        # the wakeup pipe isn't counted
+        return len(self.registered)
+
+    def _close(self):
+        self.poll.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    def _fire_timers(self):
+        """Fire expired timers
+
+        Timers scheduled by the callbacks are not fired until the next loop iteration, even if they
+        have already expired.
+        """
+        now = time.monotonic()
+        record_timer = self.metrics.record_timer
+        while self.timers and self.timers[0].absolute_time <= now:
+            # note: `self.timers` may be replaced by a callback cancelling timers
+            t = heapq.heappop(self.timers)
+            if t.called:
+                self._timers_cancelled -= 1
+                continue
+
+            record_timer(now - t.absolute_time)
+            try:
+                t()
+            except:
+                self._squelch_exception(sys.exc_info())
+
+    def _poll(self, timeout):
+        self.metrics.poll_start = time.perf_counter()
+        try:
+            events = self.poll.poll(timeout)
+        except (IOError, OSError) as e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        finally:
+            self.metrics.record_poll(time.perf_counter())
+
+        listeners = self.listeners
+        registered = self.registered
+        for fd, event in events:
+            if fd == self._wakeup_r:
+                self._fire_wakeup()
+                continue
+
+            # the file descriptor is disarmed until it is re-armed by `add()` or below
+            registered[fd] = 0
+
+            if event & READ_MASK:
+                listener = listeners[READ].get(fd)
+                if listener is not None:
+                    self._fire_listener(listener)
+
+            if event & WRITE_MASK:
+                listener = listeners[WRITE].get(fd)
+                if listener is not None:
+                    self._fire_listener(listener)
+
+            # listeners which weren't woken up (or weren't removed by their callback) still wait
+            if registered.get(fd) == 0 and (fd in listeners[READ] or fd in listeners[WRITE]):
+                self._arm(fd)
+
+    def _fire_listener(self, listener):
+        try:
+            listener.cb(*listener.cb_args)
+        except:
+            self._squelch_exception(sys.exc_info())
+
+            try:
+                self.remove(listener)
+            except Exception as e:
+                sys.stderr.write('Exception while removing listener: {}\n'.format(e))
+                sys.stderr.flush()
+
+    def _fire_unpollable(self, listener):
+        if self.listeners[listener.evtype].get(listener.fd) is listener:
+            self._fire_listener(listener)
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            # the pipe is full, so the hub will be woken up anyway
+            pass
+
+    def _fire_wakeup(self):
+        try:
+            while os.read(self._wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        self._fire_threadsafe_callbacks()
+
+    def schedule_call_global(self, seconds, cb, *args, **kwargs):
+        t = HubTimer(self, seconds, cb, *args, **kwargs)
+        heapq.heappush(self.timers, t)
+        return t
+
+    def _timer_cancelled(self):
+        """Account for a timer in `self.timers` which was cancelled
+
+        Cancelled timers remain in the heap until they reach the top. The heap is compacted if
+        most of it consists of cancelled timers.
+        """
+        self._timers_cancelled += 1
+        timers = self.timers
+        if self._timers_cancelled == len(timers):
+            del timers[:]
+            self._timers_cancelled = 0
+        elif self._timers_cancelled > 64 and self._timers_cancelled > len(timers) // 2:
+            self.timers = [t for t in timers if not t.called]
+            heapq.heapify(self.timers)
+            self._timers_cancelled = 0
+
+    def add(self, evtype, fd, cb, tb, cb_args=()):
+        listener = FdListener(evtype, fd, cb, tb, cb_args)
+        self._add_listener(listener)
+
+        # the file descriptor is always re-armed: the registration may be stale if it was closed
+        # and reused without notifying the hub
+        try:
+            self._arm(fd)
+        except (IOError, OSError) as e:
+            if e.args[0] != errno.EPERM:
+                self._remove_listener(listener)
+                raise
+
+            # regular files can't be polled, but are always ready
+            self.schedule_call_now(self._fire_unpollable, listener)
+
+        return listener
+
+    def _arm(self, fd):
+        """Register or re-arm a file descriptor for the events its listeners wait for
+        """
+        events = 0
+        for evtype, bucket in self.listeners.items():
+            if fd in bucket:
+                events |= EPOLL_EVENTS[evtype]
+
+        if fd in self.registered:
+            try:
+                self.poll.modify(fd, events | EPOLLONESHOT)
+            except (IOError, OSError) as e:
+                if e.args[0] != errno.ENOENT:
+                    raise
+
+                # the file descriptor was closed and reused without notifying the hub
+                self.poll.register(fd, events | EPOLLONESHOT)
+        else:
+            self.poll.register(fd, events | EPOLLONESHOT)
+
+        self.registered[fd] = events
+
+    def remove(self, listener):
+        """Remove listener
+
+        The file descriptor stays registered with the epoll object for the next wait.
+
+        :param listener: listener to remove
+        :type listener: self.Listener
+        """
+        self._remove_listener(listener)
+
+    def notify_opened(self, fd):
+        found = super().notify_opened(fd)
+        self._unregister(fd)
+        return found
+
+    def notify_close(self, fd):
+        waiting = [bucket[fd] for bucket in self.listeners.values() if fd in bucket]
+        found = super().notify_close(fd)
+        self._unregister(fd)
+
+        # the waiting greenlets would otherwise never be woken up
+        for listener in waiting:
+            self.schedule_call_now(listener.tb, IOClosed(errno.EBADF, 'File descriptor was closed'))
+
+        return found
+
+    def _unregister(self, fd):
+        if fd in self.registered:
+            del self.registered[fd]
+            try:
+                self.poll.unregister(fd)
+            except (IOError, OSError, ValueError):
+                # already closed, and therefore removed from the epoll set by the kernel
+                pass
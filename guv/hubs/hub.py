@@ -28,17 +28,36 @@ def notify_opened(fd):
     hub.notify_opened(fd)
 
 
+def notify_close(fd):
+    """Mark the specified file descriptor as about to be closed
+
+    This lets the hub release any resources (such as a persistent poll handle) associated with the
+    file descriptor before it is closed and possibly recycled by the OS. Nothing is done if no hub
+    has been created for the current thread.
+
+    :param int fd: file descriptor
+    """
+    hub = getattr(_threadlocal, 'hub', None)
+    if hub is not None:
+        hub.notify_close(fd)
+
+
 def get_default_hub():
     """Get default hub implementation
     """
-    names = [hub_name] if hub_name else ['pyuv_cffi', 'pyuv', 'epoll']
+    names = ['pyuv_cffi', 'pyuv', 'epoll']
+    if hub_name:
+        # fall back to the default hubs if the requested hub is not available
+        names.insert(0, hub_name)
 
     for name in names:
         try:
             module = importlib.import_module('guv.hubs.{}'.format(name))
             log.debug('Hub: use {}'.format(name))
             return module
-        except ImportError:
+        except ImportError as e:
+            if name == hub_name:
+                log.warning('Hub: {} not available ({}), using default hub'.format(name, e))
             # try the next possible hub
             pass
 
@@ -0,0 +1,181 @@
+"""Event loop health metrics
+
+Every hub keeps a :class:`HubMetrics` object as :attr:`hub.metrics`, which is updated as the loop
+runs. Recording costs a few arithmetic operations per loop iteration and per timer, so the metrics
+are always enabled.
+
+Usage::
+
+    from guv.hubs import get_hub
+
+    snapshot = get_hub().metrics.snapshot()
+    print(snapshot['loop_lag']['max'], snapshot['poll_ratio'])
+
+The metrics are:
+
+- loop lag: how late timers fire, compared to the time they were scheduled for. A loop which is
+  kept busy (by greenlets which don't yield, or too many callbacks) fires timers late.
+- poll time and busy time: time spent waiting for I/O in the poll phase of the loop, and time
+  spent everywhere else (running timers, callbacks and greenlets) between two polls. The longest
+  busy stretch is the longest time for which the loop couldn't respond to I/O.
+- counters: loop iterations, callbacks run and deferred, and switches to the hub (each time a
+  greenlet waits, it switches to the hub and is later switched back to).
+- gauges: ready callbacks, pending timers, listeners, poll handles and watched child processes.
+"""
+import bisect
+import time
+
+from ..const import READ, WRITE
+
+__all__ = ['HubMetrics', 'Histogram', 'LAG_BUCKETS']
+
+#: upper bounds (in seconds) of the buckets of the loop lag histogram; lags above the last bound
+#: are counted in an extra bucket
+LAG_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    """Histogram of durations, with fixed buckets
+    """
+
+    def __init__(self, bounds=LAG_BUCKETS):
+        """
+        :param tuple bounds: sorted upper bounds of the buckets (in seconds)
+        """
+        self.bounds = bounds
+
+        #: number of values in each bucket; the last bucket counts values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        """Get the histogram as a dict
+
+        :return: {'count', 'mean', 'max', 'buckets': [(upper bound or None, count)]}
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': list(zip(self.bounds + (None,), self.counts)),
+        }
+
+
+class HubMetrics:
+    """Health metrics of a hub's event loop
+    """
+
+    def __init__(self, hub):
+        """
+        :param hub: hub whose loop is measured
+        """
+        self.hub = hub
+        self.started = time.monotonic()
+
+        #: how late timers fire (in seconds)
+        self.loop_lag = Histogram()
+
+        #: number of loop iterations (polls for I/O)
+        self.iterations = 0
+
+        #: total time spent polling for I/O, and busy between polls (in seconds)
+        self.poll_time = 0.0
+        self.busy_time = 0.0
+
+        #: longest time spent busy between two polls (in seconds)
+        self.max_busy_time = 0.0
+
+        #: number of switches to the hub from other greenlets
+        self.switches = 0
+
+        #: number of callbacks run by the hub
+        self.callbacks_run = 0
+
+        #: :func:`time.perf_counter` value when the loop started polling for I/O, or None if it
+        #: isn't polling (set by the hub)
+        self.poll_start = None
+
+        #: :func:`time.perf_counter` value when the loop last finished polling for I/O (or started
+        #: running), or None if it has never run: the loop has been busy since then, unless it's
+        #: polling again
+        self.poll_end = None
+
+        # (time, switches) of the last snapshot
+        self._last_snapshot = (self.started, 0)
+
+    def loop_started(self):
+        """Called by the hub when its loop starts running
+
+        The time between runs of the loop isn't busy time.
+        """
+        self.poll_start = None
+        self.poll_end = time.perf_counter()
+
+    def record_timer(self, lag):
+        """Called by the hub when a timer fires
+
+        :param float lag: time elapsed since the timer expired (in seconds)
+        """
+        self.loop_lag.record(lag)
+
+    def record_poll(self, end):
+        """Called by the hub after polling for I/O
+
+        The hub sets :attr:`poll_start` before polling.
+
+        :param float end: :func:`time.perf_counter` value after polling
+        """
+        start = self.poll_start
+        self.poll_start = None
+        self.iterations += 1
+        self.poll_time += end - start
+        if self.poll_end is not None:
+            busy = start - self.poll_end
+            self.busy_time += busy
+            if busy > self.max_busy_time:
+                self.max_busy_time = busy
+        self.poll_end = end
+
+    def snapshot(self):
+        """Get the current metrics as a dict
+
+        `switches_per_second` is measured since the previous snapshot (or since the hub was
+        created).
+
+        :rtype: dict
+        """
+        hub = self.hub
+        now = time.monotonic()
+        last_time, last_switches = self._last_snapshot
+        self._last_snapshot = (now, self.switches)
+        measured = self.poll_time + self.busy_time
+
+        return {
+            'uptime': now - self.started,
+            'iterations': self.iterations,
+            'poll_time': self.poll_time,
+            'busy_time': self.busy_time,
+            'max_busy_time': self.max_busy_time,
+            'poll_ratio': self.poll_time / measured if measured else 1.0,
+            'loop_lag': self.loop_lag.snapshot(),
+            'switches': self.switches,
+            'switches_per_second': ((self.switches - last_switches) / (now - last_time)
+                                    if now > last_time else 0.0),
+            'callbacks_run': self.callbacks_run,
+            'callbacks_deferred': hub.callbacks_deferred,
+            'ready': len(hub.callbacks),
+            'timers': len(hub.timers) - hub._timers_cancelled,
+            'listeners': len(hub.listeners[READ]) + len(hub.listeners[WRITE]),
+            'poll_handles': hub.count_poll_handles(),
+            'child_watchers': sum(map(len, hub.child_watchers.values())),
+        }
+
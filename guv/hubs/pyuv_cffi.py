@@ -8,6 +8,8 @@ Notes:
 - The loop is free to exit (:meth:`Loop.run` is free to return) when there are no non-internal
   handles/callbacks remaining - that is, when there are no more Poll/Timer handles and no more
   callbacks scheduled.
+- Each hub has its own loop, so that hubs can run in several threads at once. The hub of the main
+  thread watches for SIGINT with a Signal handle.
 - The loop has four internal handles at all times: Signal (to watch for SIGINT), Prepare (to run
   scheduled callbacks), Idle (to ensure a zero-timeout poll when callbacks are scheduled),  and
   Check (to unref the Prepare handle if there are no remaining scheduled callbacks). The Signal and
@@ -16,40 +18,58 @@ Notes:
   handle is therefore the only remaining handle which has any control over whether or not the loop
   exits when no other handles are active. Therefore, the Prepare handle must only be unreferenced
   when there are no callbacks scheduled and *must* be referenced at all other times.
+- Timers scheduled with :meth:`Hub.schedule_call_global` do not have their own handles. They are
+  kept in a heap, and a single Timer handle is armed for the earliest one. Cancelled timers are
+  removed from the heap lazily. The Timer handle is stopped when no timers remain, so it only keeps
+  the loop alive while timers are pending.
+- Scheduled callbacks are run by the Prepare handle, up to the hub's callback budget
+  (:attr:`Hub.callback_budget`) per loop iteration, so that I/O is polled for between batches of
+  callbacks.
+- An Async handle wakes up the loop for callbacks scheduled from other threads with
+  :meth:`Hub.schedule_call_threadsafe`. It is only referenced while greenlets wait for such
+  callbacks.
+- Poll handles are kept per file descriptor and re-armed for every wait. They are stopped when no
+  greenlets wait on the file descriptor, and closed when the file descriptor is closed.
+- Child processes watched with :meth:`Hub.watch_child` are reaped when a Signal handle receives
+  SIGCHLD. The handle is created the first time a child process is watched, and only referenced
+  while child processes are watched.
 """
 import signal
 import logging
 import greenlet
+import heapq
+import math
 import sys
+import time
+from errno import EBADF
 
 from guv.hubs.abc import AbstractListener
 import pyuv_cffi
 from . import abc
+from .timer import HubTimer
+from ..const import READ, WRITE
+from ..exceptions import IOClosed
+from .. import patcher
+
+_threading = patcher.original('threading')
 
 log = logging.getLogger('guv')
 
 
 class UvFdListener(AbstractListener):
-    def __init__(self, evtype, fd, handle):
+    def __init__(self, evtype, fd, handle, cb, tb, cb_args=()):
         """
         :param handle: pyuv_cffi Handle object
         :type handle: pyuv_cffi.Handle
+        :param cb: callback to call when the file descriptor is ready for `evtype`
+        :param tb: throwback used to signal (into the greenlet) that the file was closed
+        :param tuple cb_args: callback positional arguments
         """
         super().__init__(evtype, fd)
         self.handle = handle
-
-
-class Timer(abc.AbstractTimer):
-    def __init__(self, timer_handle):
-        """
-        :type timer_handle: pyuv.Timer
-        """
-        self.timer_handle = timer_handle
-
-    def cancel(self):
-        if not self.timer_handle.closed:
-            self.timer_handle.stop()
-            self.timer_handle.close()
+        self.cb = cb
+        self.tb = tb
+        self.cb_args = cb_args
 
 
 class Hub(abc.AbstractHub):
@@ -58,14 +78,30 @@ class Hub(abc.AbstractHub):
         self.Listener = UvFdListener
         self.stopping = False
         self.running = False
-        self.callbacks = []
 
+        #: persistent poll handles, one per file descriptor: {fd: pyuv_cffi.Poll}
+        self.pollers = {}
+
+        #: file descriptors whose poll handle may no longer have any listeners; these are stopped
+        #: lazily, right before the loop polls for I/O
+        self._idle_fds = set()
+
+        #: heap of pending (and lazily cancelled) timers, ordered by expiry time
+        #: :type: list[HubTimer]
+        self.timers = []
+        self._timers_cancelled = 0
+
+        #: the hub's own loop; libuv loops must only be run by a single thread
         #: :type: pyuv.Loop
-        self.loop = pyuv_cffi.Loop.default_loop()
+        self.loop = pyuv_cffi.Loop()
+
+        # a single timer handle, always armed for the earliest timer in `self.timers`
+        self.timer_h = pyuv_cffi.Timer(self.loop)
 
-        # create a signal handle to listen for SIGINT
+        # create a signal handle to listen for SIGINT, which Python only handles in the main thread
         self.sig_h = pyuv_cffi.Signal(self.loop)
-        self.sig_h.start(self.signal_received, signal.SIGINT)
+        if _threading.current_thread() is _threading.main_thread():
+            self.sig_h.start(self.signal_received, signal.SIGINT)
         self.sig_h.ref = False  # don't keep loop alive just for this handle
 
         # create a uv_idle handle to allow non-I/O callbacks to get called quickly
@@ -80,15 +116,38 @@ class Hub(abc.AbstractHub):
         self.check_h.start(self._check_cb)
         self.check_h.ref = False
 
+        # create an async handle to be woken up by `schedule_call_threadsafe()`; it is only
+        # referenced while greenlets wait for calls from other threads (see `ref_threadsafe()`)
+        self.async_h = pyuv_cffi.Async(self.loop, self._async_cb)
+        self.async_h.ref = False
+
     def _idle_cb(self, idle_h):
         idle_h.stop()
 
+    def _async_cb(self, async_h):
+        self._fire_threadsafe_callbacks()
+
+    def _wakeup(self):
+        self.async_h.send()
+
+    def ref_threadsafe(self):
+        super().ref_threadsafe()
+        self.async_h.ref = True
+
+    def unref_threadsafe(self):
+        super().unref_threadsafe()
+        self.async_h.ref = self._threadsafe_refs > 0
+
     def _check_cb(self, check_h):
         """
         The Prepare handle's only purpose is to run scheduled callbacks. If there are no
         remaining scheduled callbacks, then it must be unreferenced so it does not keep the loop
         alive after all handles and callbacks have been completed.
+
+        The Check handle is called right after the loop has polled for I/O, and the Prepare handle
+        right before, so the time in between is the time spent polling.
         """
+        self.metrics.record_poll(time.perf_counter())
         self.prepare_h.ref = bool(self.callbacks)
 
     def run(self):
@@ -104,37 +163,48 @@ class Hub(abc.AbstractHub):
         try:
             self.running = True
             self.stopping = False
+            self.metrics.loop_started()
             self.loop.run(pyuv_cffi.UV_RUN_DEFAULT)
         finally:
             self.running = False
             self.stopping = False
 
     def abort(self):
-        print()
         log.debug('Abort loop')
         if self.running:
             self.stopping = True
 
         self.loop.stop()
 
+    def count_poll_handles(self):
+        return len(self.pollers)
+
+    def _close(self):
+        for handle in self.loop.handles:
+            handle.close()
+        self.pollers.clear()
+
+        # call the close callbacks, so that the loop can be closed
+        self.loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        self.loop.close()
+
     def _fire_callbacks(self, prepare_h):
         """Fire immediate callbacks
 
         This is called by `self.prepare_h` and calls callbacks scheduled by methods such as
-        :meth:`schedule_call_now()` or `gyield()`.
+        :meth:`schedule_call_now()` or `gyield()`, within the budget of the loop iteration.
         """
-        callbacks = self.callbacks
-        self.callbacks = []
-        for cb, args, kwargs in callbacks:
-            try:
-                cb(*args, **kwargs)
-            except:
-                self._squelch_exception(sys.exc_info())
+        self._run_callbacks()
 
-        # Check if more callbacks have been scheduled by the callbacks that were just executed.
-        # Since these may be non-I/O callbacks (such as calls to `gyield()` or
-        # `schedule_call_now()`, start a uv_idle_t handle so that libuv can do a zero-timeout poll
-        # and quickly start another loop iteration.
+        # stop poll handles which nobody has started waiting on again since their last listener
+        # was removed
+        if self._idle_fds:
+            self._stop_idle_pollers()
+
+        # Check if callbacks remain (deferred because the budget was exhausted, or scheduled by the
+        # callbacks that were just executed). Since these may be non-I/O callbacks (such as calls
+        # to `gyield()` or `schedule_call_now()`, start a uv_idle_t handle so that libuv can do a
+        # zero-timeout poll and quickly start another loop iteration.
         if self.callbacks:
             self.idle_h.start(self._idle_cb)
 
@@ -142,41 +212,158 @@ class Hub(abc.AbstractHub):
         # exit safely.
         prepare_h.ref = bool(self.callbacks)
 
-    def schedule_call_now(self, cb, *args, **kwargs):
-        self.callbacks.append((cb, args, kwargs))
+        # the loop polls for I/O next
+        self.metrics.poll_start = time.perf_counter()
 
     def schedule_call_global(self, seconds, cb, *args, **kwargs):
-        def timer_callback(timer_h):
+        t = HubTimer(self, seconds, cb, *args, **kwargs)
+        heapq.heappush(self.timers, t)
+        if self.timers[0] is t:
+            # the new timer expires first
+            self.timer_h.start(self._fire_timers, seconds, 0)
+
+        return t
+
+    def _fire_timers(self, timer_h):
+        """Fire expired timers
+
+        This is called by `self.timer_h`, which is then re-armed for the earliest remaining timer.
+        Timers scheduled by the callbacks are not fired until the next loop iteration, even if they
+        have already expired.
+        """
+        now = time.monotonic()
+        record_timer = self.metrics.record_timer
+        while self.timers and self.timers[0].absolute_time <= now:
+            # note: `self.timers` may be replaced by a callback cancelling timers
+            t = heapq.heappop(self.timers)
+            if t.called:
+                self._timers_cancelled -= 1
+                continue
+
+            record_timer(now - t.absolute_time)
             try:
-                cb(*args, **kwargs)
+                t()
             except:
                 self._squelch_exception(sys.exc_info())
 
-            # required for cleanup
-            if not timer_h.closed:
-                timer_h.stop()
-                timer_h.close()
-
-        timer_handle = pyuv_cffi.Timer(self.loop)
-        timer_handle.start(timer_callback, seconds, 0)
+        self._arm_timer_h()
 
-        return Timer(timer_handle)
+    def _arm_timer_h(self):
+        """Arm `self.timer_h` for the earliest pending timer, or stop it if there are none
+        """
+        timers = self.timers
+        while timers and timers[0].called:
+            heapq.heappop(timers)
+            self._timers_cancelled -= 1
+
+        if timers:
+            seconds = max(timers[0].absolute_time - time.monotonic(), 0)
+            # round up to the millisecond resolution of libuv timers to avoid waking up early
+            self.timer_h.start(self._fire_timers, math.ceil(seconds * 1000) / 1000, 0)
+        else:
+            self.timer_h.stop()
+
+    def _timer_cancelled(self):
+        """Account for a timer in `self.timers` which was cancelled
+
+        Cancelled timers remain in the heap until they reach the top. The heap is compacted if
+        most of it consists of cancelled timers, and the timer handle is stopped if all of them are
+        cancelled, so that it does not keep the loop alive.
+        """
+        self._timers_cancelled += 1
+        timers = self.timers
+        if self._timers_cancelled == len(timers):
+            del timers[:]
+            self._timers_cancelled = 0
+            self.timer_h.stop()
+        elif self._timers_cancelled > 64 and self._timers_cancelled > len(timers) // 2:
+            self.timers = [t for t in timers if not t.called]
+            heapq.heapify(self.timers)
+            self._timers_cancelled = 0
 
     def add(self, evtype, fd, cb, tb, cb_args=()):
-        poll_h = pyuv_cffi.Poll(self.loop, fd)
-        listener = UvFdListener(evtype, fd, poll_h)
+        poll_h = self.pollers.get(fd)
+        if poll_h is None:
+            poll_h = self.pollers[fd] = pyuv_cffi.Poll(self.loop, fd)
+
+        listener = UvFdListener(evtype, fd, poll_h, cb, tb, cb_args)
+        self._add_listener(listener)
+
+        # (re)arm the persistent poll handle with the combined interest for this fd
+        # note that UV_READABLE and UV_WRITABLE correspond to const.READ and const.WRITE
+        self._idle_fds.discard(fd)
+        poll_h.start(self._interest(fd), self._poll_cb)
+
+        return listener
+
+    def remove(self, listener):
+        """Remove listener
+
+        The poll handle for the listener's file descriptor is not closed; it is kept for the next
+        wait on the same file descriptor. If no other listeners remain, the poll handle is stopped
+        just before the loop next polls for I/O, unless it is re-armed first.
 
-        def poll_cb(poll_h, events, errno):
-            """Read callback for pyuv
+        :param listener: listener to remove
+        :type listener: self.Listener
+        """
+        if listener.handle is None:
+            # already removed
+            return
 
-            pyuv requires a callback with this signature
+        super()._remove_listener(listener)
+        listener.handle = None
+
+        fd = listener.fd
+        poll_h = self.pollers.get(fd)
+        if poll_h is None:
+            return
+
+        interest = self._interest(fd)
+        if interest:
+            poll_h.start(interest, self._poll_cb)
+        else:
+            self._idle_fds.add(fd)
+
+    def notify_opened(self, fd):
+        found = super().notify_opened(fd)
+        self._close_poller(fd)
+        return found
+
+    def notify_close(self, fd):
+        waiting = [bucket[fd] for bucket in self.listeners.values() if fd in bucket]
+        found = super().notify_close(fd)
+        self._close_poller(fd)
+
+        # the waiting greenlets would otherwise never be woken up
+        for listener in waiting:
+            self.schedule_call_now(listener.tb, IOClosed(EBADF, 'File descriptor was closed'))
+
+        return found
+
+    def _poll_cb(self, poll_h, status, events):
+        """Dispatch a poll event to the listeners waiting on the file descriptor
+
+        pyuv requires a callback with this signature. If `status` indicates an error, all
+        listeners are woken up so they can retry the I/O operation and observe the error.
+
+        :type poll_h: pyuv.Poll
+        :type status: int
+        :type events: int
+        """
+        fd = poll_h.fd
+        if status < 0:
+            events = READ | WRITE
+
+        for evtype in (READ, WRITE):
+            if not events & evtype:
+                continue
+
+            listener = self.listeners[evtype].get(fd)
+            if listener is None:
+                continue
 
-            :type poll_h: pyuv.Poll
-            :type events: int
-            :type errno: int
-            """
             try:
-                cb(*cb_args)
+                listener.cb(*listener.cb_args)
             except:
                 self._squelch_exception(sys.exc_info())
 
@@ -186,30 +373,53 @@ class Hub(abc.AbstractHub):
                     sys.stderr.write('Exception while removing listener: {}\n'.format(e))
                     sys.stderr.flush()
 
-        self._add_listener(listener)
-
-        # start the pyuv Poll object
-        # note that UV_READABLE and UV_WRITABLE correspond to const.READ and const.WRITE
-        poll_h.start(evtype, poll_cb)
-
-        # self.debug()
-        return listener
-
-    def remove(self, listener):
-        """Remove listener
+    def _interest(self, fd):
+        """Get the combined event mask of all listeners for the file descriptor
 
-        :param listener: listener to remove
-        :type listener: self.Listener
+        :rtype: int
         """
-        super()._remove_listener(listener)
-        # log.debug('call w.handle.stop(), fd: {}'.format(listener.handle.fileno()))
+        interest = 0
+        if fd in self.listeners[READ]:
+            interest |= READ
+        if fd in self.listeners[WRITE]:
+            interest |= WRITE
+        return interest
+
+    def _stop_idle_pollers(self):
+        idle_fds = self._idle_fds
+        self._idle_fds = set()
+        for fd in idle_fds:
+            poll_h = self.pollers.get(fd)
+            if poll_h is not None and not self._interest(fd):
+                poll_h.stop()
+
+    def _close_poller(self, fd):
+        """Stop and close the persistent poll handle for the file descriptor, if any
+
+        This must be done before the file descriptor is closed, since libuv must not poll a closed
+        (and possibly recycled) file descriptor.
+        """
+        self._idle_fds.discard(fd)
+        poll_h = self.pollers.pop(fd, None)
+        if poll_h is not None:
+            # initiate correct cleanup sequence (these three statements are critical)
+            poll_h.ref = False
+            poll_h.stop()
+            poll_h.close()
+
+    def _start_sigchld(self):
+        """Start receiving SIGCHLD with a Signal handle, which works in any thread
+        """
+        self.sigchld_h = pyuv_cffi.Signal(self.loop)
+        self.sigchld_h.start(self._sigchld_cb, signal.SIGCHLD)
+        self.sigchld_h.ref = False
+        return True
 
-        # initiate correct cleanup sequence (these three statements are critical)
-        listener.handle.ref = False
-        listener.handle.stop()
-        listener.handle.close()
-        listener.handle = None
-        # self.debug()
+    def _sigchld_cb(self, sig_handle, signo):
+        self._reap_children()
+
+    def _ref_sigchld(self, ref):
+        self.sigchld_h.ref = ref
 
     def signal_received(self, sig_handle, signo):
         """Signal handler for pyuv.Signal
@@ -223,5 +433,6 @@ class Hub(abc.AbstractHub):
         """
         if signo == signal.SIGINT:
             sig_handle.stop()
+            print()
             self.abort()
             self.parent.throw(KeyboardInterrupt)
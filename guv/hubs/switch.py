@@ -1,6 +1,7 @@
 import greenlet
 
 from .hub import get_hub
+from ..const import READ
 from ..timeout import Timeout
 
 __all__ = ['gyield', 'trampoline']
@@ -44,6 +45,10 @@ def trampoline(fd, evtype, timeout=None, timeout_exc=Timeout):
     - must not be called from the hub greenlet (can be called from any other greenlet)
     - `evtype` must be either :attr:`~guv.const.READ` or :attr:`~guv.const.WRITE` (not possible to
       watch for  both  simultaneously)
+    - at most one greenlet may wait for each `evtype` on a file descriptor at a time. A reader and
+      a writer greenlet may wait on the same file descriptor concurrently (as with full-duplex
+      protocols); the hub watches for both events with a single watcher and wakes up each greenlet
+      when its event occurs
 
     :param int fd: file descriptor
     :param int evtype: either the constant :attr:`~guv.const.READ` or :attr:`~guv.const.WRITE`
@@ -57,10 +62,16 @@ def trampoline(fd, evtype, timeout=None, timeout_exc=Timeout):
     assert hub is not current, 'do not call blocking functions from the mainloop'
     assert isinstance(fd, int)
 
+    profiler = hub.wait_profiler
+    if profiler is not None:
+        start = profiler.wait_started()
+
     timer = None
     if timeout is not None:
         def _timeout(exc):
             # timeout has passed
+            if profiler is not None:
+                profiler.timeout_expired(current)
             current.throw(exc)
 
         timer = hub.schedule_call_global(timeout, _timeout, timeout_exc)
@@ -78,3 +89,5 @@ def trampoline(fd, evtype, timeout=None, timeout_exc=Timeout):
     finally:
         if timer is not None:
             timer.cancel()
+        if profiler is not None:
+            profiler.wait_ended('read' if evtype == READ else 'write', start, fd)
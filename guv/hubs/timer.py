@@ -106,3 +106,23 @@ class LocalTimer(Timer):
     def cancel(self):
         self.greenlet = None
         super().cancel()
+
+
+class HubTimer(Timer):
+    """Timer scheduled on a hub's timer heap
+
+    Cancelled timers are not removed from the heap right away; the hub is notified so it can clean
+    up lazily.
+    """
+
+    def __init__(self, hub, seconds, cb, *args, **kwargs):
+        """
+        :param hub: hub owning the timer heap this timer is scheduled on
+        """
+        self.hub = hub
+        super().__init__(seconds, cb, *args, **kwargs)
+
+    def cancel(self):
+        if not self.called:
+            self.called = True
+            self.hub._timer_cancelled()
@@ -0,0 +1,715 @@
+"""Loop implementation using Linux io_uring (experimental)
+
+This hub talks to the kernel directly through the `io_uring_setup(2)` and `io_uring_enter(2)`
+system calls (via cffi in ABI mode), so neither liburing nor a C compiler is required. It is only
+used when explicitly selected by setting the environment variable ``GUV_HUB=uring``. If the kernel
+does not support io_uring (or the features required by this hub), importing this module raises
+:exc:`ImportError` and the default hub is used instead.
+
+Notes:
+
+- Submission queue entries prepared during a loop iteration are submitted in one batch, by the same
+  `io_uring_enter()` call which waits for completions.
+- Waiting for a file descriptor to become ready (:func:`~guv.hubs.switch.trampoline`) is done with
+  one-shot ``IORING_OP_POLL_ADD`` operations, so all green modules work unchanged.
+- In addition, the hub offers completion-style operations (:meth:`Hub.recv_into`,
+  :meth:`Hub.send`, :meth:`Hub.accept`) which are used by :class:`guv.greenio.socket` when a socket
+  operation would block. The kernel performs the operation as soon as the socket is ready, which
+  saves the system call for retrying it. Timeouts are implemented with linked
+  ``IORING_OP_LINK_TIMEOUT`` operations.
+- Callbacks scheduled from other threads with :meth:`Hub.schedule_call_threadsafe` wake up the hub
+  by writing to a pipe, which the hub polls for with a one-shot ``IORING_OP_POLL_ADD``.
+- Timers are kept in a heap and cancelled lazily, as in the other hubs. The time until the earliest
+  timer is passed to `io_uring_enter()` as the wait timeout.
+- Child processes watched with :meth:`Hub.watch_child` are reaped when SIGCHLD is received. The
+  Python signal handler wakes up the hub like :meth:`Hub.schedule_call_threadsafe`, so this is only
+  supported if the hub runs in the main thread.
+"""
+import errno
+import fcntl
+import heapq
+import itertools
+import logging
+import mmap
+import os
+import sys
+import time
+
+import cffi
+import greenlet
+
+from . import abc
+from .timer import HubTimer
+from ..const import READ, WRITE
+from ..exceptions import IOClosed
+
+log = logging.getLogger('guv')
+
+if not sys.platform.startswith('linux'):
+    raise ImportError('io_uring is only available on Linux')
+
+ffi = cffi.FFI()
+ffi.cdef('''
+struct io_uring_sqe {
+    uint8_t opcode;
+    uint8_t flags;
+    uint16_t ioprio;
+    int32_t fd;
+    uint64_t off;
+    uint64_t addr;
+    uint32_t len;
+    uint32_t op_flags;
+    uint64_t user_data;
+    uint16_t buf_index;
+    uint16_t personality;
+    int32_t splice_fd_in;
+    uint64_t pad2[2];
+};
+
+struct io_uring_cqe {
+    uint64_t user_data;
+    int32_t res;
+    uint32_t flags;
+};
+
+struct io_sqring_offsets {
+    uint32_t head;
+    uint32_t tail;
+    uint32_t ring_mask;
+    uint32_t ring_entries;
+    uint32_t flags;
+    uint32_t dropped;
+    uint32_t array;
+    uint32_t resv1;
+    uint64_t resv2;
+};
+
+struct io_cqring_offsets {
+    uint32_t head;
+    uint32_t tail;
+    uint32_t ring_mask;
+    uint32_t ring_entries;
+    uint32_t overflow;
+    uint32_t cqes;
+    uint32_t flags;
+    uint32_t resv1;
+    uint64_t resv2;
+};
+
+struct io_uring_params {
+    uint32_t sq_entries;
+    uint32_t cq_entries;
+    uint32_t flags;
+    uint32_t sq_thread_cpu;
+    uint32_t sq_thread_idle;
+    uint32_t features;
+    uint32_t wq_fd;
+    uint32_t resv[3];
+    struct io_sqring_offsets sq_off;
+    struct io_cqring_offsets cq_off;
+};
+
+struct kernel_timespec {
+    int64_t tv_sec;
+    int64_t tv_nsec;
+};
+
+struct io_uring_getevents_arg {
+    uint64_t sigmask;
+    uint32_t sigmask_sz;
+    uint32_t pad;
+    uint64_t ts;
+};
+
+long syscall(long number, ...);
+''')
+libc = ffi.dlopen(None)
+
+SYS_io_uring_setup = 425
+SYS_io_uring_enter = 426
+
+IORING_OFF_SQ_RING = 0
+IORING_OFF_SQES = 0x10000000
+
+IORING_FEAT_SINGLE_MMAP = 1 << 0
+IORING_FEAT_NODROP = 1 << 1
+IORING_FEAT_EXT_ARG = 1 << 8
+
+IORING_ENTER_GETEVENTS = 1 << 0
+IORING_ENTER_EXT_ARG = 1 << 3
+
+IOSQE_IO_LINK = 1 << 2
+
+IORING_OP_NOP = 0
+IORING_OP_POLL_ADD = 6
+IORING_OP_POLL_REMOVE = 7
+IORING_OP_ACCEPT = 13
+IORING_OP_ASYNC_CANCEL = 14
+IORING_OP_LINK_TIMEOUT = 15
+IORING_OP_SEND = 26
+IORING_OP_RECV = 27
+
+POLLIN = 0x001
+POLLOUT = 0x004
+
+SOCK_CLOEXEC = 0o2000000
+
+#: submission queue size
+QUEUE_DEPTH = 4096
+
+#: user_data of the poll operation on the wakeup pipe (see `Hub._wakeup`)
+WAKEUP_USER_DATA = 2 ** 64 - 1
+
+_sigset_size = 8
+
+
+class Ring:
+    """Minimal io_uring instance: a submission queue and a completion queue shared with the kernel
+    """
+
+    def __init__(self, entries=QUEUE_DEPTH):
+        """
+        :param int entries: number of submission queue entries
+        :raise OSError: if io_uring is not available or lacks required features
+        """
+        params = ffi.new('struct io_uring_params *')
+        fd = libc.syscall(ffi.cast('long', SYS_io_uring_setup), ffi.cast('unsigned', entries),
+                          params)
+        if fd < 0:
+            err = ffi.errno
+            raise OSError(err, os.strerror(err))
+
+        required = IORING_FEAT_SINGLE_MMAP | IORING_FEAT_NODROP | IORING_FEAT_EXT_ARG
+        if params.features & required != required:
+            os.close(fd)
+            raise OSError(errno.ENOSYS, 'io_uring lacks required features (Linux >= 5.11)')
+
+        self.fd = fd
+        sq_off = params.sq_off
+        cq_off = params.cq_off
+        sq_size = sq_off.array + params.sq_entries * ffi.sizeof('uint32_t')
+        cq_size = cq_off.cqes + params.cq_entries * ffi.sizeof('struct io_uring_cqe')
+
+        # with IORING_FEAT_SINGLE_MMAP, both rings are in the same mapping
+        self._ring_mm = mmap.mmap(fd, max(sq_size, cq_size), mmap.MAP_SHARED,
+                                  mmap.PROT_READ | mmap.PROT_WRITE, offset=IORING_OFF_SQ_RING)
+        self._sqes_mm = mmap.mmap(fd, params.sq_entries * ffi.sizeof('struct io_uring_sqe'),
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE,
+                                  offset=IORING_OFF_SQES)
+
+        ring = ffi.from_buffer(self._ring_mm)
+        self._sq_head = ffi.cast('uint32_t *', ring + sq_off.head)
+        self._sq_tail = ffi.cast('uint32_t *', ring + sq_off.tail)
+        self._sq_array = ffi.cast('uint32_t *', ring + sq_off.array)
+        self._sq_mask = ffi.cast('uint32_t *', ring + sq_off.ring_mask)[0]
+        self._sq_entries = params.sq_entries
+        self._sqes = ffi.cast('struct io_uring_sqe *', ffi.from_buffer(self._sqes_mm))
+
+        self._cq_head = ffi.cast('uint32_t *', ring + cq_off.head)
+        self._cq_tail = ffi.cast('uint32_t *', ring + cq_off.tail)
+        self._cq_mask = ffi.cast('uint32_t *', ring + cq_off.ring_mask)[0]
+        self._cqes = ffi.cast('struct io_uring_cqe *', ring + cq_off.cqes)
+
+        self._tail = self._sq_tail[0]
+        #: number of prepared entries which have not been submitted yet
+        self.to_submit = 0
+
+        #: completions reaped to make room for submissions, which are returned by the next
+        #: :meth:`reap`
+        self.backlog = []
+
+        self._wait_arg = ffi.new('struct io_uring_getevents_arg *')
+        self._wait_ts = ffi.new('struct kernel_timespec *')
+        self._wait_arg.ts = ffi.cast('uint64_t', self._wait_ts)
+
+    def close(self):
+        self._ring_mm.close()
+        self._sqes_mm.close()
+        os.close(self.fd)
+
+    def prep(self, opcode, fd, addr=0, length=0, off=0, op_flags=0, user_data=0, flags=0):
+        """Prepare a submission queue entry
+
+        If the submission queue is full, the prepared entries are submitted first.
+
+        :param int opcode: IORING_OP_*
+        :param int addr: address, as an integer (see :meth:`address`)
+        :return: the prepared entry
+        """
+        if self._tail - self._sq_head[0] >= self._sq_entries:
+            self._make_room()
+
+        idx = self._tail & self._sq_mask
+        sqe = self._sqes[idx]
+        sqe.opcode = opcode
+        sqe.flags = flags
+        sqe.ioprio = 0
+        sqe.fd = fd
+        sqe.off = off
+        sqe.addr = addr
+        sqe.len = length
+        sqe.op_flags = op_flags
+        sqe.user_data = user_data
+        sqe.buf_index = 0
+        sqe.personality = 0
+        sqe.splice_fd_in = 0
+        self._sq_array[idx] = idx
+
+        self._tail = (self._tail + 1) & 0xffffffff
+        self._sq_tail[0] = self._tail
+        self.to_submit += 1
+        return sqe
+
+    def _make_room(self):
+        """Submit the prepared entries to make room in the full submission queue
+
+        If the kernel doesn't accept more entries until completions are reaped (EBUSY/EAGAIN), the
+        completion queue is reaped into :attr:`backlog`, and the entries are submitted again.
+
+        :raise OSError: if no entry could be submitted and there was no completion to reap
+        """
+        while self._tail - self._sq_head[0] >= self._sq_entries:
+            try:
+                self.to_submit -= self._enter(self.to_submit, 0, 0, ffi.NULL, _sigset_size)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                if e.errno not in (errno.EBUSY, errno.EAGAIN):
+                    raise
+
+                completions = self._reap()
+                if not completions:
+                    raise
+                self.backlog.extend(completions)
+
+    def _enter(self, to_submit, min_complete, flags, arg, arg_size):
+        """Call io_uring_enter()
+
+        :return: number of entries submitted
+        :raise OSError: if the call failed
+        """
+        ret = libc.syscall(ffi.cast('long', SYS_io_uring_enter), ffi.cast('int', self.fd),
+                           ffi.cast('unsigned', to_submit), ffi.cast('unsigned', min_complete),
+                           ffi.cast('unsigned', flags), ffi.cast('void *', arg),
+                           ffi.cast('size_t', arg_size))
+        if ret < 0:
+            err = ffi.errno
+            raise OSError(err, os.strerror(err))
+        return ret
+
+    @staticmethod
+    def address(cdata):
+        """Get the address of a cdata object as an integer
+        """
+        return int(ffi.cast('uintptr_t', cdata))
+
+    def enter(self, wait=False, timeout=None):
+        """Submit prepared entries and optionally wait for at least one completion
+
+        :param bool wait: wait for a completion
+        :param float timeout: maximum time to wait in seconds; None to wait indefinitely
+        """
+        to_submit = self.to_submit
+        if not (wait or to_submit):
+            return
+
+        flags = 0
+        min_complete = 0
+        arg = ffi.NULL
+        arg_size = _sigset_size
+        if wait:
+            flags |= IORING_ENTER_GETEVENTS
+            min_complete = 1
+            if timeout is not None:
+                sec = int(timeout)
+                self._wait_ts.tv_sec = sec
+                self._wait_ts.tv_nsec = int((timeout - sec) * 1e9)
+                flags |= IORING_ENTER_EXT_ARG
+                arg = self._wait_arg
+                arg_size = ffi.sizeof('struct io_uring_getevents_arg')
+
+        try:
+            self.to_submit -= self._enter(to_submit, min_complete, flags, arg, arg_size)
+        except OSError as e:
+            if e.errno not in (errno.EINTR, errno.ETIME, errno.EBUSY, errno.EAGAIN):
+                raise
+            # EBUSY/EAGAIN: the completion queue must be reaped before submitting more
+
+    def reap(self):
+        """Get all available completions
+
+        :return: list of (user_data, res) tuples
+        :rtype: list[tuple[int, int]]
+        """
+        completions = self._reap()
+        if self.backlog:
+            completions = self.backlog + completions
+            self.backlog = []
+        return completions
+
+    def _reap(self):
+        """Get the completions in the completion queue, without the backlog
+        """
+        head = self._cq_head[0]
+        tail = self._cq_tail[0]
+        completions = []
+        mask = self._cq_mask
+        cqes = self._cqes
+        while head != tail:
+            cqe = cqes[head & mask]
+            completions.append((cqe.user_data, cqe.res))
+            head = (head + 1) & 0xffffffff
+
+        self._cq_head[0] = head
+        return completions
+
+
+try:
+    Ring(1).close()
+except OSError as e:
+    raise ImportError('io_uring is not available: {}'.format(e))
+
+
+class UringListener(abc.AbstractListener):
+    def __init__(self, evtype, fd, cb, tb, cb_args=()):
+        """
+        :param cb: callback to call when the file descriptor is ready for `evtype`
+        :param tb: throwback used to signal (into the greenlet) that the file was closed
+        :param tuple cb_args: callback positional arguments
+        """
+        super().__init__(evtype, fd)
+        self.cb = cb
+        self.tb = tb
+        self.cb_args = cb_args
+        #: user_data of the poll operation in flight, if any
+        self.user_data = None
+
+
+class Operation:
+    """Completion-style operation in flight, waited on by a greenlet
+    """
+    __slots__ = ['greenlet', 'fd', 'keepalive', 'closed']
+
+    def __init__(self, g, fd, keepalive):
+        """
+        :param g: greenlet to switch to with the result
+        :param int fd: file descriptor
+        :param keepalive: objects (buffers) which must stay alive until the operation completes
+        """
+        self.greenlet = g
+        self.fd = fd
+        self.keepalive = keepalive
+        self.closed = False
+
+
+class Hub(abc.AbstractHub):
+    completion_io = True
+
+    def __init__(self):
+        super().__init__()
+        self.Listener = UringListener
+        self.stopping = False
+        self.running = False
+
+        #: heap of pending (and lazily cancelled) timers, ordered by expiry time
+        #: :type: list[HubTimer]
+        self.timers = []
+        self._timers_cancelled = 0
+
+        self.ring = Ring()
+
+        #: operations in flight: {user_data: UringListener or Operation}
+        self.pending = {}
+
+        #: user_data of completion-style operations in flight, by file descriptor
+        self._fd_ops = {}
+
+        # user_data 0 is used for operations whose completion is ignored
+        self._user_data = itertools.count(1)
+
+        # pipe to be woken up by `schedule_call_threadsafe()`
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        for fd in (self._wakeup_r, self._wakeup_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.FD_CLOEXEC)
+        self._arm_wakeup()
+
+    def run(self):
+        assert self is greenlet.getcurrent()
+
+        if self.stopping:
+            return
+
+        if self.running:
+            raise RuntimeError("The hub's runloop is already running")
+
+        log.debug('Start runloop')
+        try:
+            self.running = True
+            self.stopping = False
+            self.metrics.loop_started()
+            while not self.stopping:
+                if self.timers:
+                    self._fire_timers()
+
+                if self.callbacks:
+                    self._run_callbacks()
+
+                self.metrics.poll_start = time.perf_counter()
+                if self.callbacks or self.ring.backlog:
+                    self.ring.enter()
+                elif self.timers:
+                    timeout = max(self.timers[0].absolute_time - time.monotonic(), 0)
+                    self.ring.enter(True, timeout)
+                elif self.pending or self._threadsafe_refs:
+                    self.ring.enter(True)
+                else:
+                    # nothing left which could switch back to any greenlet
+                    break
+                self.metrics.record_poll(time.perf_counter())
+
+                self._fire_completions()
+        finally:
+            self.running = False
+            self.stopping = False
+
+    def abort(self):
+        log.debug('Abort loop')
+        if self.running:
+            self.stopping = True
+
+    def _close(self):
+        self.ring.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    def _fire_timers(self):
+        """Fire expired timers
+
+        Timers scheduled by the callbacks are not fired until the next loop iteration, even if they
+        have already expired.
+        """
+        now = time.monotonic()
+        record_timer = self.metrics.record_timer
+        while self.timers and self.timers[0].absolute_time <= now:
+            # note: `self.timers` may be replaced by a callback cancelling timers
+            t = heapq.heappop(self.timers)
+            if t.called:
+                self._timers_cancelled -= 1
+                continue
+
+            record_timer(now - t.absolute_time)
+            try:
+                t()
+            except:
+                self._squelch_exception(sys.exc_info())
+
+    def _fire_completions(self):
+        pending = self.pending
+        for user_data, res in self.ring.reap():
+            if user_data == WAKEUP_USER_DATA:
+                self._fire_wakeup()
+                continue
+
+            op = pending.pop(user_data, None)
+            if op is None:
+                continue
+
+            if isinstance(op, UringListener):
+                op.user_data = None
+                if self.listeners[op.evtype].get(op.fd) is op:
+                    self._fire_listener(op)
+                continue
+
+            fd_ops = self._fd_ops.get(op.fd)
+            if fd_ops is not None:
+                fd_ops.discard(user_data)
+                if not fd_ops:
+                    del self._fd_ops[op.fd]
+
+            g = op.greenlet
+            if g is None:
+                # the waiting greenlet has gone away
+                continue
+
+            try:
+                if op.closed:
+                    g.throw(IOClosed(errno.EBADF, 'File descriptor was closed'))
+                else:
+                    g.switch(res)
+            except:
+                self._squelch_exception(sys.exc_info())
+
+    def _fire_listener(self, listener):
+        try:
+            listener.cb(*listener.cb_args)
+        except:
+            self._squelch_exception(sys.exc_info())
+
+            try:
+                self.remove(listener)
+            except Exception as e:
+                sys.stderr.write('Exception while removing listener: {}\n'.format(e))
+                sys.stderr.flush()
+
+    def _arm_wakeup(self):
+        self.ring.prep(IORING_OP_POLL_ADD, self._wakeup_r, op_flags=POLLIN,
+                       user_data=WAKEUP_USER_DATA)
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            # the pipe is full, so the hub will be woken up anyway
+            pass
+
+    def _fire_wakeup(self):
+        try:
+            while os.read(self._wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        self._arm_wakeup()
+        self._fire_threadsafe_callbacks()
+
+    def schedule_call_global(self, seconds, cb, *args, **kwargs):
+        t = HubTimer(self, seconds, cb, *args, **kwargs)
+        heapq.heappush(self.timers, t)
+        return t
+
+    def _timer_cancelled(self):
+        """Account for a timer in `self.timers` which was cancelled
+
+        Cancelled timers remain in the heap until they reach the top. The heap is compacted if
+        most of it consists of cancelled timers.
+        """
+        self._timers_cancelled += 1
+        timers = self.timers
+        if self._timers_cancelled == len(timers):
+            del timers[:]
+            self._timers_cancelled = 0
+        elif self._timers_cancelled > 64 and self._timers_cancelled > len(timers) // 2:
+            self.timers = [t for t in timers if not t.called]
+            heapq.heapify(self.timers)
+            self._timers_cancelled = 0
+
+    def add(self, evtype, fd, cb, tb, cb_args=()):
+        listener = UringListener(evtype, fd, cb, tb, cb_args)
+        self._add_listener(listener)
+
+        user_data = next(self._user_data)
+        listener.user_data = user_data
+        self.pending[user_data] = listener
+        self.ring.prep(IORING_OP_POLL_ADD, fd, op_flags=POLLIN if evtype == READ else POLLOUT,
+                       user_data=user_data)
+        return listener
+
+    def remove(self, listener):
+        """Remove listener
+
+        If the poll operation of the listener is still in flight, it is cancelled.
+
+        :param listener: listener to remove
+        :type listener: self.Listener
+        """
+        self._remove_listener(listener)
+
+        user_data = listener.user_data
+        if user_data is not None:
+            listener.user_data = None
+            self.pending.pop(user_data, None)
+            self.ring.prep(IORING_OP_POLL_REMOVE, -1, addr=user_data)
+
+    def notify_close(self, fd):
+        waiting = [bucket[fd] for bucket in self.listeners.values() if fd in bucket]
+        found = super().notify_close(fd)
+
+        # the waiting greenlets would otherwise never be woken up
+        for listener in waiting:
+            self.schedule_call_now(listener.tb, IOClosed(errno.EBADF, 'File descriptor was closed'))
+
+        # operations in flight hold a reference to the file and would never complete
+        for user_data in self._fd_ops.get(fd, ()):
+            self.pending[user_data].closed = True
+            self.ring.prep(IORING_OP_ASYNC_CANCEL, -1, addr=user_data)
+
+        return found
+
+    def _submit(self, opcode, fd, addr, length, op_flags, keepalive, timeout, timeout_exc):
+        """Submit a completion-style operation and wait for its result
+
+        :return: result of the operation
+        :rtype: int
+        :raise OSError: if the operation failed
+        """
+        current = greenlet.getcurrent()
+        assert self is not current, 'do not call blocking functions from the mainloop'
+
+        user_data = next(self._user_data)
+        op = self.pending[user_data] = Operation(current, fd, keepalive)
+        self._fd_ops.setdefault(fd, set()).add(user_data)
+
+        if timeout is None:
+            self.ring.prep(opcode, fd, addr, length, op_flags=op_flags, user_data=user_data)
+        else:
+            ts = ffi.new('struct kernel_timespec *')
+            sec = int(timeout)
+            ts.tv_sec = sec
+            ts.tv_nsec = int((timeout - sec) * 1e9)
+            op.keepalive = (keepalive, ts)
+            self.ring.prep(opcode, fd, addr, length, op_flags=op_flags, user_data=user_data,
+                           flags=IOSQE_IO_LINK)
+            self.ring.prep(IORING_OP_LINK_TIMEOUT, -1, Ring.address(ts), 1)
+
+        try:
+            res = self.switch()
+        except:
+            # the greenlet was killed; the kernel may still use the buffer until the operation
+            # completes, which is why `op` (and its buffers) stays in `self.pending`
+            op.greenlet = None
+            if user_data in self.pending:
+                self.ring.prep(IORING_OP_ASYNC_CANCEL, -1, addr=user_data)
+            raise
+
+        if res < 0:
+            if res == -errno.ECANCELED and timeout is not None:
+                raise timeout_exc
+            raise OSError(-res, os.strerror(-res))
+
+        return res
+
+    def recv_into(self, fd, buf, nbytes=0, flags=0, timeout=None, timeout_exc=None):
+        """Receive up to `nbytes` bytes from a socket into a writable buffer
+
+        The calling greenlet is suspended until data is received.
+
+        :return: number of bytes received
+        :rtype: int
+        """
+        cbuf = ffi.from_buffer(buf)
+        nbytes = nbytes or len(cbuf)
+        return self._submit(IORING_OP_RECV, fd, Ring.address(cbuf), nbytes, flags, cbuf, timeout,
+                            timeout_exc)
+
+    def send(self, fd, data, flags=0, timeout=None, timeout_exc=None):
+        """Send data on a socket
+
+        The calling greenlet is suspended until at least some of the data is sent.
+
+        :return: number of bytes sent
+        :rtype: int
+        """
+        cbuf = ffi.from_buffer(data)
+        return self._submit(IORING_OP_SEND, fd, Ring.address(cbuf), len(cbuf), flags, cbuf,
+                            timeout, timeout_exc)
+
+    def accept(self, fd, timeout=None, timeout_exc=None):
+        """Accept a connection on a listening socket
+
+        The calling greenlet is suspended until a connection is accepted.
+
+        :return: file descriptor of the accepted socket
+        :rtype: int
+        """
+        return self._submit(IORING_OP_ACCEPT, fd, 0, 0, SOCK_CLOEXEC, None, timeout, timeout_exc)
@@ -212,6 +212,7 @@ def monkey_patch(**modules):
 
     - Patching :mod:`socket` will also patch :mod:`ssl`
     - Patching :mod:`threading` will also patch :mod:`_thread` and :mod:`queue`
+    - Patching :mod:`select` will also patch :mod:`selectors`
 
     It's safe to call monkey_patch multiple times.
 
@@ -222,7 +223,8 @@ def monkey_patch(**modules):
     :keyword bool time: time module: patches sleep()
     :keyword bool os: os module: patches open(), read(), write(), wait(), waitpid()
     :keyword bool socket: socket module: patches socket, create_connection()
-    :keyword bool select: select module: patches select()
+    :keyword bool select: select module: patches select(), poll(), epoll(); and the selectors
+        module
     :keyword bool threading: threading module: patches local, Lock(), stack_size(), current_thread()
     :keyword bool psycopg2: psycopg2 module: register a wait callback to yield
     :keyword bool cassandra: cassandra module: set connection class to GuvConnection
@@ -337,7 +339,12 @@ def _green_os_modules():
 def _green_select_modules():
     from guv.green import select
 
-    return [('select', select)]
+    try:
+        from guv.green import selectors
+
+        return [('select', select), ('selectors', selectors)]
+    except ImportError:
+        return [('select', select)]
 
 
 def _green_socket_modules():
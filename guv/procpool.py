@@ -0,0 +1,386 @@
+"""Process pool for CPU-bound work
+
+CPU-bound work (such as validating large documents or resizing images) blocks the hub and every
+greenlet with it, and can't be sped up with threads because of the GIL. :class:`ProcessPool` runs
+such work in worker processes, and suspends only the calling greenlet until the result is available.
+
+Notes:
+
+- Workers are forked when the pool is created and communicate with the parent process over pipes.
+  The pipes are non-blocking in the parent process and watched by the hub, so waiting for a
+  worker only suspends the calling greenlet.
+- Tasks are pickled, so functions must be importable by name (module-level functions), and
+  arguments and return values must be picklable.
+- Tasks submitted to a worker while it is busy (or in quick succession, such as by :meth:`map`) are
+  sent to the worker in one pipe write. Results are sent back as soon as each task completes, so
+  the result of a quick task isn't held back by a slow task sent in the same batch; results which
+  arrive together are received in one pipe read.
+- Tasks are assigned to the worker with the fewest outstanding tasks.
+
+Usage::
+
+    from guv.procpool import ProcessPool
+
+    pool = ProcessPool(4)
+    thumbnail = pool.execute(make_thumbnail, image_data)
+    for result in pool.imap_unordered(validate, documents):
+        ...
+    pool.close()
+"""
+import multiprocessing
+import os
+import pickle
+import signal
+import struct
+import sys
+
+from . import event, greenthread, queue, hubs
+from .fileobject import set_nonblocking
+from .green import os as green_os
+
+__all__ = ['ProcessPool', 'WorkerDied']
+
+#: frame header: length of the pickled payload
+_header = struct.Struct('!I')
+
+
+class WorkerDied(Exception):
+    """Raised for tasks which were assigned to a worker process which exited unexpectedly
+    """
+
+
+def _write_all(write, fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[write(fd, view):]
+
+
+def _worker_main(task_r, result_w):
+    """Main loop of a worker process
+
+    Read batches of tasks from `task_r`, run them, and write the result of each task to `result_w`
+    as soon as it completes. This runs in the child process, with blocking file descriptors and
+    without using the hub.
+    """
+    task_file = os.fdopen(task_r, 'rb', buffering=65536)
+
+    def read_frame():
+        header = task_file.read(_header.size)
+        if len(header) < _header.size:
+            return None
+        payload = task_file.read(_header.unpack(header)[0])
+        return pickle.loads(payload)
+
+    def write_results(results):
+        payload = pickle.dumps(results, pickle.HIGHEST_PROTOCOL)
+        _write_all(os.write, result_w, _header.pack(len(payload)) + payload)
+
+    while True:
+        tasks = read_frame()
+        if tasks is None:
+            # the parent process closed the pipe
+            return
+
+        for task_id, fn, args, kwargs in tasks:
+            try:
+                result = (task_id, True, fn(*args, **kwargs))
+                pickle.dumps(result[2], pickle.HIGHEST_PROTOCOL)
+            except BaseException as e:
+                result = (task_id, False, _picklable_exception(e))
+
+            # the next task may take long, so the result isn't held back to be sent with others
+            write_results([result])
+
+
+def _picklable_exception(e):
+    try:
+        pickle.dumps(e, pickle.HIGHEST_PROTOCOL)
+        return e
+    except Exception:
+        return RuntimeError('{}: {}'.format(type(e).__name__, e))
+
+
+class _Worker:
+    def __init__(self, pool):
+        task_r, task_w = os.pipe()
+        result_r, result_w = os.pipe()
+
+        pid = os.fork()
+        if pid == 0:
+            # child process
+            status = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                os.close(task_w)
+                os.close(result_r)
+                for worker in pool.workers:
+                    os.close(worker.task_w)
+                    os.close(worker.result_r)
+
+                _worker_main(task_r, result_w)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+
+        os.close(task_r)
+        os.close(result_w)
+        for fd in (task_w, result_r):
+            set_nonblocking(fd)
+            # the file descriptor may have been recycled from one closed without notifying the hub
+            hubs.notify_opened(fd)
+
+        self.pid = pid
+        self.task_w = task_w
+        self.result_r = result_r
+
+        #: tasks submitted, but not sent to the worker yet: list of (task_id, fn, args, kwargs)
+        self.outbox = []
+
+        #: task IDs sent to the worker, whose results haven't been received yet
+        self.outstanding = set()
+
+        #: False after the worker process exited (or its pipe broke)
+        self.alive = True
+
+        self.writer = None
+        self.reader = greenthread.spawn(pool._read_results, self)
+
+    @property
+    def load(self):
+        return len(self.outbox) + len(self.outstanding)
+
+
+class ProcessPool:
+    """Pool of worker processes for CPU-bound work
+    """
+
+    def __init__(self, size=None):
+        """
+        :param int size: number of worker processes (default: number of CPUs)
+        """
+        size = size or multiprocessing.cpu_count()
+        self.size = size
+
+        #: waiters for the results of tasks: {task_id: Event or Queue}
+        self._waiters = {}
+        self._task_ids = iter(range(1, sys.maxsize))
+        self.closed = False
+
+        # statistics
+        self.submitted = 0
+        self.completed = 0
+        self.batches_sent = 0
+
+        self.workers = []
+        for _ in range(size):
+            self.workers.append(_Worker(self))
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit a task to the pool
+
+        :return: event which is sent the result (or the exception raised) by the task
+        :rtype: guv.event.Event
+        """
+        result = event.Event()
+        self._submit(fn, args, kwargs, result)
+        return result
+
+    def execute(self, fn, *args, **kwargs):
+        """Call `fn(*args, **kwargs)` in a worker process and wait for the result
+
+        :return: return value of `fn`
+        :raise: the exception raised by `fn`
+        """
+        return self.submit(fn, *args, **kwargs).wait()
+
+    def imap_unordered(self, fn, iterable):
+        """Call `fn` for each item of `iterable` in the worker processes
+
+        All tasks are submitted at once, and results are yielded in the order they are received.
+
+        :return: iterator of return values
+        :raise: the first exception raised by `fn`
+        """
+        results = queue.Queue()
+        n = 0
+        for item in iterable:
+            self._submit(fn, (item,), {}, results)
+            n += 1
+
+        for _ in range(n):
+            ok, value = results.get()
+            if not ok:
+                raise value
+            yield value
+
+    def map(self, fn, iterable):
+        """Call `fn` for each item of `iterable` in the worker processes
+
+        :return: list of return values, in the order of `iterable`
+        :raise: the first exception raised by `fn`
+        """
+        events = [self.submit(fn, item) for item in iterable]
+        return [e.wait() for e in events]
+
+    def close(self):
+        """Stop the worker processes
+
+        Tasks which have already been submitted are completed first.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        for worker in self.workers:
+            if worker.writer is not None:
+                worker.writer.wait()
+
+            hubs.notify_close(worker.task_w)
+            os.close(worker.task_w)
+
+        for worker in self.workers:
+            worker.reader.wait()
+            green_os.waitpid(worker.pid, 0)
+
+    def terminate(self):
+        """Kill the worker processes
+
+        Tasks which haven't completed yet fail with :exc:`WorkerDied`.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        for worker in self.workers:
+            if worker.alive:
+                try:
+                    os.kill(worker.pid, signal.SIGTERM)
+                except OSError:
+                    pass
+
+        for worker in self.workers:
+            worker.reader.wait()
+            if worker.writer is not None:
+                worker.writer.wait()
+
+            green_os.waitpid(worker.pid, 0)
+            hubs.notify_close(worker.task_w)
+            os.close(worker.task_w)
+
+    def stats(self):
+        """Return statistics of the pool
+
+        - size: number of worker processes
+        - submitted: number of tasks submitted
+        - completed: number of tasks completed
+        - outstanding: number of tasks submitted, but not completed yet
+        - batches_sent: number of pipe writes used to send tasks to the workers
+
+        :rtype: dict
+        """
+        return {
+            'size': self.size,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'outstanding': self.submitted - self.completed,
+            'batches_sent': self.batches_sent,
+        }
+
+    def _submit(self, fn, args, kwargs, waiter):
+        if self.closed:
+            raise RuntimeError('The process pool is closed')
+
+        workers = [w for w in self.workers if w.alive]
+        if not workers:
+            raise WorkerDied('all worker processes exited')
+
+        task_id = next(self._task_ids)
+        self._waiters[task_id] = waiter
+        self.submitted += 1
+
+        worker = min(workers, key=lambda w: w.load)
+        worker.outbox.append((task_id, fn, args, kwargs))
+        if worker.writer is None:
+            # send the tasks submitted until the writer runs in one batch
+            worker.writer = greenthread.spawn(self._write_tasks, worker)
+
+    def _write_tasks(self, worker):
+        """Send the tasks in the worker's outbox to the worker
+        """
+        try:
+            while worker.outbox:
+                tasks = worker.outbox
+                worker.outbox = []
+                try:
+                    payload = pickle.dumps(tasks, pickle.HIGHEST_PROTOCOL)
+                except Exception as e:
+                    # send the error to the waiters of the tasks
+                    for task in tasks:
+                        self._deliver(task[0], False, e)
+                    continue
+
+                worker.outstanding.update(task[0] for task in tasks)
+                self.batches_sent += 1
+                try:
+                    _write_all(green_os.write, worker.task_w, _header.pack(len(payload)) + payload)
+                except OSError:
+                    # the worker process exited
+                    self._fail_worker(worker)
+                    return
+        finally:
+            worker.writer = None
+
+    def _read_results(self, worker):
+        """Receive results from the worker until it exits
+        """
+        fd = worker.result_r
+        buf = bytearray()
+        try:
+            while True:
+                data = green_os.read(fd, 65536)
+                if not data:
+                    break
+
+                buf += data
+                while len(buf) >= _header.size:
+                    size = _header.unpack_from(buf)[0]
+                    if len(buf) < _header.size + size:
+                        break
+
+                    results = pickle.loads(bytes(buf[_header.size:_header.size + size]))
+                    del buf[:_header.size + size]
+                    for task_id, ok, value in results:
+                        worker.outstanding.discard(task_id)
+                        self._deliver(task_id, ok, value)
+        finally:
+            hubs.notify_close(fd)
+            os.close(fd)
+            self._fail_worker(worker)
+
+    def _fail_worker(self, worker):
+        """Mark the worker as dead and fail the tasks which will never complete
+        """
+        worker.alive = False
+        task_ids = list(worker.outstanding) + [task[0] for task in worker.outbox]
+        worker.outstanding.clear()
+        worker.outbox = []
+        if task_ids:
+            exc = WorkerDied('worker process {} exited'.format(worker.pid))
+            for task_id in task_ids:
+                self._deliver(task_id, False, exc)
+
+    def _deliver(self, task_id, ok, value):
+        waiter = self._waiters.pop(task_id, None)
+        if waiter is None:
+            return
+
+        self.completed += 1
+        if isinstance(waiter, queue.Queue):
+            waiter.put((ok, value))
+        elif ok:
+            waiter.send(value)
+        else:
+            waiter.send_exception(value)
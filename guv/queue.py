@@ -224,6 +224,9 @@ class LightQueue(object):
                     return
             raise Full
         elif block:
+            profiler = get_hub().wait_profiler
+            if profiler is not None:
+                start = profiler.wait_started()
             waiter = ItemWaiter(item)
             self.putters.add(waiter)
             timeout = Timeout(timeout, Full)
@@ -237,6 +240,8 @@ class LightQueue(object):
             finally:
                 timeout.cancel()
                 self.putters.discard(waiter)
+                if profiler is not None:
+                    profiler.wait_ended('queue put', start)
         else:
             raise Full
 
@@ -273,6 +278,9 @@ class LightQueue(object):
                         return self._get()
             raise Empty
         elif block:
+            profiler = get_hub().wait_profiler
+            if profiler is not None:
+                start = profiler.wait_started()
             waiter = Waiter()
             timeout = Timeout(timeout, Empty)
             try:
@@ -283,6 +291,8 @@ class LightQueue(object):
             finally:
                 self.getters.discard(waiter)
                 timeout.cancel()
+                if profiler is not None:
+                    profiler.wait_ended('queue get', start)
         else:
             raise Empty
 
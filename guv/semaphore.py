@@ -94,13 +94,17 @@ class Semaphore:
             timeout = None
 
         if self.counter <= 0:
+            hub = hubs.get_hub()
+            profiler = hub.wait_profiler
+            if profiler is not None:
+                start = profiler.wait_started()
             self._waiters.add(greenlet.getcurrent())
             try:
                 if timeout is not None:
                     ok = False
                     with Timeout(timeout, False):
                         while self.counter <= 0:
-                            hubs.get_hub().switch()
+                            hub.switch()
                         ok = True
                     if not ok:
                         return False
@@ -112,9 +116,11 @@ class Semaphore:
                         #              'waiters: {}'
                         #              .format(id(self), self, self._waiters))
                         #     return
-                        hubs.get_hub().switch()
+                        hub.switch()
             finally:
                 self._waiters.discard(greenlet.getcurrent())
+                if profiler is not None:
+                    profiler.wait_ended('lock', start)
         self.counter -= 1
         return True
 
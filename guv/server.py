@@ -1,12 +1,16 @@
+import os
 import sys
 import logging
 from abc import ABCMeta, abstractmethod
 
-from . import greenpool, patcher, greenthread
+import greenlet
+
+from . import event, greenpool, patcher, greenthread
 from .green import socket, ssl
 from .hubs import get_hub
 
 original_socket = patcher.original('socket')
+original_threading = patcher.original('threading')
 
 log = logging.getLogger('guv')
 
@@ -17,11 +21,163 @@ def serve(sock, handle, concurrency=1000):
     server.start()
 
 
-def listen(addr, family=socket.AF_INET, backlog=511):
+def serve_threads(sock, handle, threads=None, concurrency=1000, backlog=511):
+    """Serve connections from several OS threads, each running its own hub
+
+    The calling greenlet serves connections on `sock`, and `threads - 1` threads are started, each
+    with its own listening socket bound to the same address with `SO_REUSEPORT` (so `sock` must have
+    been created with ``listen(addr, reuse_port=True)``). The kernel distributes incoming
+    connections between the listening sockets, and each connection is handled in the thread which
+    accepted it, by a greenlet of that thread's hub.
+
+    Only one thread runs Python code at a time, so this only helps handlers which spend most of
+    their time in C extensions that release the GIL (compression, hashing, image processing...).
+    Handlers must not share green objects (sockets, events, queues, locks...) between threads:
+    these belong to the hub of the thread which created them.
+
+    When the calling greenlet stops serving (such as when :exc:`StopServe` or
+    :exc:`KeyboardInterrupt` is raised), the other threads stop accepting connections, wait for
+    their handlers to return, and exit.
+
+    Usage::
+
+        sock = guv.listen(('0.0.0.0', 8000), reuse_port=True)
+        guv.serve_threads(sock, handle, threads=4)
+
+    :param sock: listening socket
+    :param handle: client handler: Callable(sock, addr)
+    :param int threads: number of threads serving connections, including the calling thread
+        (default: the number of CPUs)
+    :param int concurrency: maximum number of concurrent handlers per thread
+    :param int backlog: maximum number of pending connections of the listening sockets of the
+        other threads
+    """
+    if not sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT):
+        raise ValueError('The listening socket must be created with reuse_port=True')
+
+    if threads is None:
+        threads = os.cpu_count() or 1
+
+    workers = [ServerThread(sock.getsockname(), sock.family, handle, concurrency, backlog)
+               for _ in range(threads - 1)]
+    try:
+        for worker in workers:
+            worker.start()
+        serve(sock, handle, concurrency)
+    finally:
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join()
+
+
+class ServerThread:
+    """OS thread serving connections with its own hub, on its own listening socket bound with
+    `SO_REUSEPORT` (see :func:`serve_threads`)
+
+    :meth:`start`, :meth:`stop` and :meth:`join` must be called from the same thread.
+    """
+
+    def __init__(self, addr, family, handle, concurrency=1000, backlog=511):
+        """
+        :param addr: address to listen on
+        :param handle: client handler: Callable(sock, addr)
+        :param int concurrency: maximum number of concurrent handlers
+        :param int backlog: maximum number of pending connections
+        """
+        self.addr = addr
+        self.family = family
+        self.handle = handle
+        self.concurrency = concurrency
+        self.backlog = backlog
+
+        #: hub of the thread which started this thread, and is notified when it exits
+        self.parent_hub = get_hub()
+        self.stopped = event.Event()
+
+        #: hub of the thread, and the greenlet accepting connections, once it has started
+        self.hub = None
+        self.greenlet = None
+        self._stopping = False
+        self._serving = False
+
+        self.thread = original_threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        # keep the parent's hub running until the thread has exited
+        self.parent_hub.ref_threadsafe()
+        self.thread.start()
+
+    def stop(self):
+        """Stop accepting connections
+
+        Handlers which are running are left to return before the thread exits.
+        """
+        self._stopping = True
+        if self.hub is not None:
+            self.hub.schedule_call_threadsafe(self._stop_serving)
+
+    def join(self):
+        """Wait for the thread to exit, suspending only the calling greenlet
+        """
+        if self.thread.ident is not None:
+            self.stopped.wait()
+
+            # the thread is about to exit, so this doesn't block
+            self.thread.join()
+
+    def _run(self):
+        self.hub = get_hub()
+        self.greenlet = greenlet.getcurrent()
+        try:
+            # `stop()` may have been called before the hub was known
+            if not self._stopping:
+                self._serve()
+        except Exception:
+            log.exception('{}: error'.format(self))
+        finally:
+            self.hub.close()
+            self.parent_hub.schedule_call_threadsafe(self._exited)
+
+    def _serve(self):
+        sock = listen(self.addr, self.family, self.backlog, reuse_port=True)
+        pool = greenpool.GreenPool(self.concurrency)
+        try:
+            self._serving = True
+            Server(sock, self.handle, pool, 'spawn_n').start()
+        finally:
+            self._serving = False
+            sock.close()
+        pool.waitall()
+
+    def _stop_serving(self):
+        # called by the thread's hub
+        if self._serving:
+            self.greenlet.throw(StopServe())
+
+    def _exited(self):
+        # called by the parent's hub
+        self.parent_hub.unref_threadsafe()
+        self.stopped.send()
+
+
+def listen(addr, family=socket.AF_INET, backlog=511, reuse_port=False):
+    """Convenience function for opening listening sockets
+
+    :param addr: address to listen on
+    :param family: socket family
+    :param int backlog: maximum number of pending connections
+    :param bool reuse_port: set `SO_REUSEPORT`, so that other sockets (in other threads or
+        processes) can listen on the same address, with incoming connections distributed between
+        them by the kernel (see :func:`serve_threads`)
+    :return: the listening green socket object
+    """
     server_sock = socket.socket(family, socket.SOCK_STREAM)
 
     if sys.platform[:3] != 'win':
         server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
 
     server_sock.bind(addr)
     server_sock.listen(backlog)
@@ -104,7 +104,10 @@ class GuvConnection(Connection):
         while True:
             try:
                 next_msg = self._write_queue.get()
-                # trampoline with WRITE here causes a core dump (why???) issue #13
+                # trampoline with WRITE here used to cause a core dump (issue #13): the hub
+                # created a second poll handle for the socket while `handle_read()` was waiting on
+                # it, which libuv does not support. The hub now watches both events with a single
+                # poll handle, but `sendall()` waits for the socket to be writable anyway.
                 # log.debug('Trampoline with fd: {}, WRITE'.format(self._socket.fileno()))
                 # trampoline(self._socket.fileno(), WRITE)
             except Exception as e:
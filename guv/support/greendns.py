@@ -1,21 +1,49 @@
+import importlib
 import struct
 import sys
+from collections import OrderedDict, deque
 
-from .. import patcher
+from .. import greenthread, patcher, queue
+from ..event import Event
 from ..green import _socket3
 from ..green import time
 from ..green import select
 
 dns = patcher.import_patched('dns', socket=_socket3, time=time, select=select)
-for pkg in ('dns.query', 'dns.exception', 'dns.inet', 'dns.message',
-            'dns.rdatatype', 'dns.resolver', 'dns.reversename'):
+for pkg in ('dns.query', 'dns.exception', 'dns.flags', 'dns.inet', 'dns.message', 'dns.rcode',
+            'dns.rdataclass', 'dns.rdatatype', 'dns.resolver', 'dns.reversename'):
     setattr(dns, pkg.split('.')[1],
             patcher.import_patched(pkg, socket=_socket3, time=time, select=select))
 
 socket = _socket3
 
+# the modules which aren't patched, such as dns.name, raise exceptions derived from the original
+# dns.exception module
+_DNS_ERRORS = (dns.exception.DNSException, importlib.import_module('dns.exception').DNSException)
+
 DNS_QUERY_TIMEOUT = 10.0
 
+#: maximum number of names whose answers are cached by :func:`resolve`
+DNS_CACHE_SIZE = 4096
+
+#: time (in seconds) for which names which don't exist (or have no address) are cached
+DNS_NEGATIVE_TTL = 30.0
+
+#: time (in seconds) for which failed lookups (such as timeouts) are cached
+DNS_FAILURE_TTL = 2.0
+
+#: maximum number of UDP sockets used by :func:`resolve_many`
+DNS_BULK_SOCKETS = 4
+
+#: maximum number of outstanding queries per socket of :func:`resolve_many`
+DNS_BULK_WINDOW = 128
+
+#: number of times a query of :func:`resolve_many` is retried after a timeout (or server failure)
+DNS_BULK_RETRIES = 2
+
+_ERROR_TIMEOUT = (socket.EAI_AGAIN, 'Lookup timed out')
+_ERROR_NODATA = (socket.EAI_NODATA, 'No address associated with hostname')
+
 
 def is_ipv4_addr(addr: str):
     """is_ipv4_addr returns true if host is a valid IPv4 address in
@@ -85,11 +113,17 @@ class ResolverProxy:
     def clear(self):
         self._resolver = None
 
-    def query(self, *args, **kwargs):
+    def get_resolver(self):
+        """Return the :class:`dns.resolver.Resolver` which makes the queries
+        """
         if self._resolver is None:
             self._resolver = dns.resolver.Resolver(filename=self._filename)
             self._resolver.cache = dns.resolver.Cache()
 
+        return self._resolver
+
+    def query(self, *args, **kwargs):
+        self.get_resolver()
         query = args[0]
 
         if query is None:
@@ -106,30 +140,388 @@ class ResolverProxy:
             return self._resolver.query(*args, **kwargs)
 
 
+class DNSCache:
+    """Bounded cache of the answers (and errors) of :func:`resolve`
+
+    Answers are cached until the TTL of their records expires. Names which don't exist are cached
+    for :data:`DNS_NEGATIVE_TTL` seconds, and failed lookups for :data:`DNS_FAILURE_TTL` seconds, so
+    that a burst of lookups for a name whose nameserver is unreachable doesn't wait for a timeout
+    each. The least recently used names are evicted when the cache is full.
+
+    Answers from /etc/hosts are not cached, since they don't require a query.
+    """
+
+    def __init__(self, maxsize=DNS_CACHE_SIZE):
+        """
+        :param int maxsize: maximum number of names in the cache
+        """
+        self.maxsize = maxsize
+
+        #: {name: (expiration, rrset, error)}
+        self._entries = OrderedDict()
+
+        #: {name: Event} for names being queried, which is sent (rrset, error)
+        self._pending = {}
+
+        # statistics
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name):
+        """Return the cached (rrset, error) of `name`, or None if it isn't cached (or expired)
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+
+        expiration, rrset, error = entry
+        if time.time() >= expiration:
+            del self._entries[name]
+            return None
+
+        self._entries.move_to_end(name)
+        return rrset, error
+
+    def put(self, name, rrset, error, expiration):
+        """Cache the answer (or error) of `name` until `expiration` (a :func:`time.time` value)
+        """
+        if expiration <= time.time() or self.maxsize <= 0:
+            return
+
+        self._entries[name] = (expiration, rrset, error)
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """Return statistics of the cache
+
+        - size: number of cached names
+        - hits: number of lookups answered from the cache (including errors)
+        - negative_hits: number of hits which were errors
+        - misses: number of lookups which required a query
+        - coalesced: number of lookups which waited for the query of a concurrent lookup of the
+          same name, instead of making their own
+
+        :rtype: dict
+        """
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+        }
+
+
 resolver = ResolverProxy(dev=True)
+cache = DNSCache()
+
+
+def _query(name):
+    """Query the addresses of `name`
+
+    :return: (rrset, error, expiration)
+    """
+    try:
+        rrset = resolver.query(name)
+    except dns.exception.Timeout:
+        return None, _ERROR_TIMEOUT, time.time() + DNS_FAILURE_TTL
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return None, _ERROR_NODATA, time.time() + DNS_NEGATIVE_TTL
+    except dns.exception.DNSException:
+        return None, _ERROR_NODATA, time.time() + DNS_FAILURE_TTL
+
+    return rrset, None, rrset.expiration
 
 
 def resolve(name):
-    error = None
-    rrset = None
+    """Return the IPv4 address records of `name`
+
+    Answers are cached (see :class:`DNSCache`), and concurrent lookups of the same name wait for a
+    single query.
+
+    :raise socket.gaierror: if the lookup failed
+    """
+    key = name.lower() if isinstance(name, str) else name
+    entry = cache.get(key)
+    if entry is not None:
+        cache.hits += 1
+        rrset, error = entry
+        if error:
+            cache.negative_hits += 1
+    else:
+        pending = cache._pending.get(key)
+        if pending is not None:
+            cache.coalesced += 1
+            rrset, error = pending.wait()
+        else:
+            cache.misses += 1
+            pending = cache._pending[key] = Event()
+            try:
+                rrset, error, expiration = _query(name)
+            except BaseException as e:
+                # the waiters would otherwise never be woken up
+                if not isinstance(e, Exception):
+                    e = socket.gaierror(socket.EAI_AGAIN, 'Lookup interrupted')
+                pending.send_exception(e)
+                raise
+            else:
+                cache.put(key, rrset, error, expiration)
+                pending.send((rrset, error))
+            finally:
+                del cache._pending[key]
+
+    if error:
+        raise socket.gaierror(*error)
+    return rrset
+
+
+class _BulkQuery:
+    """Query of :func:`resolve_many` waiting for its response
+    """
+    __slots__ = ['name', 'message', 'wire', 'attempt', 'where', 'deadline']
+
+    def __init__(self, name, message):
+        self.name = name
+        self.message = message
+        self.wire = message.to_wire()
+        self.attempt = 0
+        self.where = None
+        self.deadline = 0
+
+
+class _BulkResolver:
+    """Queries of :func:`resolve_many`, multiplexed over a few UDP sockets
 
-    if rrset is None or time.time() > rrset.expiration:
+    Each socket is served by one greenlet, which keeps up to :data:`DNS_BULK_WINDOW` queries
+    outstanding and waits for their responses (or the earliest timeout) with a single receive.
+    """
+
+    def __init__(self, names, results):
+        """
+        :param deque names: names to query, which are taken by the socket greenlets
+        :param queue.Queue results: queue which is put (name, rrset, error, expiration)
+        """
+        r = resolver.get_resolver()
+        self.names = names
+        self.results = results
+        self.port = r.port
+        self.timeout = r.timeout
+
+        # all sockets are of the address family of the first nameserver
+        self.af = dns.inet.af_for_address(r.nameservers[0]) if r.nameservers else None
+        self.nameservers = [ns for ns in r.nameservers if dns.inet.af_for_address(ns) == self.af]
+
+        #: greenlets serving the sockets, and making queries over TCP
+        self.greenlets = []
+
+        #: number of greenlets serving sockets which haven't exited
+        self.serving = 0
+
+    def start(self, n_sockets):
+        if not self.nameservers:
+            while self.names:
+                self.results.put((self.names.popleft(), None, _ERROR_NODATA,
+                                  time.time() + DNS_FAILURE_TTL))
+            return
+
+        for _ in range(n_sockets):
+            self.serving += 1
+            self.greenlets.append(greenthread.spawn(self._serve_socket))
+
+    def kill(self):
+        for g in self.greenlets:
+            g.kill()
+
+    def _serve_socket(self):
+        sock = socket.socket(self.af, socket.SOCK_DGRAM)
+        outstanding = {}  # {query ID: _BulkQuery}
         try:
-            rrset = resolver.query(name)
-        except dns.exception.Timeout:
-            error = (socket.EAI_AGAIN, 'Lookup timed out')
+            while self.names or outstanding:
+                while self.names and len(outstanding) < DNS_BULK_WINDOW:
+                    name = self.names.popleft()
+                    try:
+                        message = dns.message.make_query(name, dns.rdatatype.A)
+                        while message.id in outstanding:
+                            message = dns.message.make_query(name, dns.rdatatype.A)
+                    except _DNS_ERRORS:
+                        # an invalid name, such as one with a label which is too long
+                        self.results.put((name, None, _ERROR_NODATA,
+                                          time.time() + DNS_FAILURE_TTL))
+                        continue
+
+                    query = _BulkQuery(name, message)
+                    outstanding[message.id] = query
+                    self._send(sock, query)
+
+                deadline = min(query.deadline for query in outstanding.values())
+                sock.settimeout(max(deadline - time.time(), 0.001))
+                try:
+                    wire, from_address = sock.recvfrom(65535)
+                except socket.timeout:
+                    self._expire(sock, outstanding)
+                    continue
+
+                self._receive(sock, outstanding, wire, from_address)
+        except Exception:
+            # the caller waits for a result for each name: fail the queries of this socket, and the
+            # remaining names if no other socket takes them
+            names = [query.name for query in outstanding.values()]
+            if self.serving == 1:
+                names.extend(self.names)
+                self.names.clear()
+
+            expiration = time.time() + DNS_FAILURE_TTL
+            for name in names:
+                self.results.put((name, None, _ERROR_NODATA, expiration))
+            raise
+        finally:
+            self.serving -= 1
+            sock.close()
+
+    def _send(self, sock, query):
+        query.where = self.nameservers[query.attempt % len(self.nameservers)]
+        query.deadline = time.time() + self.timeout
+        try:
+            sock.sendto(query.wire, (query.where, self.port))
+        except OSError:
+            # such as an unreachable network; the query times out
+            pass
+
+    def _expire(self, sock, outstanding):
+        now = time.time()
+        for query_id, query in list(outstanding.items()):
+            if query.deadline > now:
+                continue
+
+            if query.attempt < DNS_BULK_RETRIES:
+                query.attempt += 1
+                self._send(sock, query)
+            else:
+                del outstanding[query_id]
+                self.results.put((query.name, None, _ERROR_TIMEOUT, now + DNS_FAILURE_TTL))
+
+    def _receive(self, sock, outstanding, wire, from_address):
+        try:
+            response = dns.message.from_wire(wire)
         except dns.exception.DNSException:
-            error = (socket.EAI_NODATA, 'No address associated with hostname')
+            return
+
+        query = outstanding.get(response.id)
+        if (query is None or from_address[:2] != (query.where, self.port) or
+                not query.message.is_response(response)):
+            # a late response to a query which was already answered, or from an unexpected source
+            return
+
+        del outstanding[response.id]
+        if response.flags & dns.flags.TC:
+            self.greenlets.append(greenthread.spawn(self._query_tcp, query))
+            return
+
+        if (response.rcode() in (dns.rcode.SERVFAIL, dns.rcode.REFUSED) and
+                query.attempt < DNS_BULK_RETRIES):
+            # try the next nameserver
+            query.attempt += 1
+            outstanding[response.id] = query
+            self._send(sock, query)
+            return
+
+        self.results.put((query.name,) + _parse_response(query.message, response))
+
+    def _query_tcp(self, query):
+        """Repeat a query whose UDP response was truncated over TCP
+        """
+        try:
+            response = tcp(query.message, query.where, self.timeout, self.port)
+        except (dns.exception.DNSException, OSError, EOFError):
+            result = (None, _ERROR_TIMEOUT, time.time() + DNS_FAILURE_TTL)
         else:
-            pass
-            # responses.insert(name, rrset)
+            result = _parse_response(query.message, response)
 
-    if error:
-        if rrset is None:
-            raise socket.gaierror(error)
+        self.results.put((query.name,) + result)
+
+
+def _parse_response(message, response):
+    """Return (rrset, error, expiration) for the response to a query of IPv4 addresses
+    """
+    rcode = response.rcode()
+    if rcode == dns.rcode.NXDOMAIN:
+        return None, _ERROR_NODATA, time.time() + DNS_NEGATIVE_TTL
+    if rcode != dns.rcode.NOERROR:
+        return None, _ERROR_NODATA, time.time() + DNS_FAILURE_TTL
+
+    try:
+        rrset = dns.resolver.Answer(message.question[0].name, dns.rdatatype.A,
+                                    dns.rdataclass.IN, response)
+    except dns.exception.DNSException:
+        return None, _ERROR_NODATA, time.time() + DNS_NEGATIVE_TTL
+
+    return rrset, None, rrset.expiration
+
+
+def resolve_many(names):
+    """Resolve the IPv4 addresses of many names at once
+
+    Rather than a socket (and a greenlet) per name, queries are sent over at most
+    :data:`DNS_BULK_SOCKETS` UDP sockets, with up to :data:`DNS_BULK_WINDOW` queries outstanding per
+    socket, and responses are matched to queries by their ID. Queries which time out are retried up
+    to :data:`DNS_BULK_RETRIES` times with the next nameserver, and queries whose response is
+    truncated are repeated over TCP.
+
+    Names are looked up in the cache and /etc/hosts first, like by :func:`resolve`, and answers are
+    cached. Names are queried as absolute names: the search domains of resolv.conf are not applied.
+
+    :param names: iterable of names
+    :return: iterator of (name, rrset) in the order the answers arrive (each distinct name is
+             yielded once), where rrset is a :exc:`socket.gaierror` if the lookup failed
+    """
+    ready = []
+    todo = deque()
+    seen = set()
+    for name in names:
+        key = name.lower()
+        if key in seen:
+            continue
+
+        seen.add(key)
+        entry = cache.get(key)
+        if entry is not None:
+            cache.hits += 1
+            rrset, error = entry
+            if error:
+                cache.negative_hits += 1
+                rrset = socket.gaierror(*error)
+            ready.append((name, rrset))
+        elif resolver._hosts.get(name):
+            ready.append((name, resolver.query(name)))
         else:
-            sys.stderr.write('DNS error: %r %r\n' % (name, error))
-    return rrset
+            todo.append(name)
+
+    n = len(todo)
+    cache.misses += n
+
+    results = queue.Queue()
+    bulk = _BulkResolver(todo, results)
+    bulk.start(min(DNS_BULK_SOCKETS, (n + DNS_BULK_WINDOW - 1) // DNS_BULK_WINDOW))
+    try:
+        for result in ready:
+            yield result
+
+        for _ in range(n):
+            name, rrset, error, expiration = results.get()
+            cache.put(name.lower(), rrset, error, expiration)
+            yield name, rrset if error is None else socket.gaierror(*error)
+    finally:
+        bulk.kill()
 
 
 def getaliases(host):
@@ -265,7 +657,7 @@ def _net_read(sock, count, expiration):
     A Timeout exception will be raised if the operation is not completed
     by the expiration time.
     """
-    s = ''
+    s = b''
     while count > 0:
         try:
             n = sock.recv(count)
@@ -273,7 +665,8 @@ def _net_read(sock, count, expiration):
             # Q: Do we also need to catch coro.CoroutineSocketWake and pass?
             if expiration - time.time() <= 0.0:
                 raise dns.exception.Timeout
-        if n == '':
+            continue
+        if n == b'':
             raise EOFError
         count = count - len(n)
         s = s + n
@@ -444,6 +837,7 @@ def tcp(q, where, timeout=DNS_QUERY_TIMEOUT, port=53, af=None, source=None, sour
 
 def reset():
     resolver.clear()
+    cache.clear()
 
 # Install our coro-friendly replacements for the tcp and udp query methods.
 dns.query.tcp = tcp
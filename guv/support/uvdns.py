@@ -0,0 +1,162 @@
+"""Non-blocking DNS resolution with libuv
+
+This module provides cooperative replacements for the name resolution functions of the socket
+module, like :mod:`guv.support.greendns`, but without dnspython: lookups are made with the system
+resolver (`getaddrinfo()`), so nsswitch.conf, /etc/hosts, search domains etc. are honoured exactly
+as for blocking lookups.
+
+- With the pyuv_cffi hub, lookups are submitted to the libuv loop (`uv_getaddrinfo()` and
+  `uv_getnameinfo()`) and run in libuv's thread pool (4 threads by default; set the environment
+  variable ``UV_THREADPOOL_SIZE`` to change it).
+- With other hubs, lookups run in the :mod:`guv.tpool` thread pool.
+
+Numeric addresses are translated directly, without a round trip to the thread pool.
+
+This resolver is used by :mod:`guv.green.socket` if dnspython isn't installed, or if the
+environment variable ``GUV_DNS`` is set to ``libuv``.
+"""
+import greenlet
+
+from .. import patcher, tpool
+from ..hubs import get_hub
+
+try:
+    import pyuv_cffi
+except ImportError:
+    # libuv is not available; lookups run in the thread pool
+    pyuv_cffi = None
+
+__all__ = ['getaddrinfo', 'gethostbyname', 'gethostbyname_ex', 'getnameinfo']
+
+socket_orig = patcher.original('socket')
+
+
+class _Request:
+    """Lookup submitted to the libuv loop of the hub
+    """
+    __slots__ = ['hub', 'greenlet', 'request']
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.greenlet = None
+        self.request = None
+
+    def _callback(self, request):
+        self.request = request
+        g = self.greenlet
+        if g is not None:
+            self.greenlet = None
+            g.switch()
+
+    def wait(self):
+        """Wait for the lookup to complete
+
+        :return: result of the lookup
+        :raise socket.gaierror: if the lookup failed
+        """
+        if self.request is None:
+            current = greenlet.getcurrent()
+            assert self.hub is not current, 'do not call blocking functions from the mainloop'
+            self.greenlet = current
+            try:
+                while self.request is None:
+                    self.hub.switch()
+            finally:
+                self.greenlet = None
+
+        error = self.request.error
+        if error:
+            name = pyuv_cffi.error_name(error)
+            code = getattr(socket_orig, name, getattr(socket_orig, 'EAI_SYSTEM', error))
+            raise socket_orig.gaierror(code, pyuv_cffi.strerror(error))
+
+        return self.request.result
+
+
+def _lookup(name, *args):
+    """Make a lookup and wait for its result
+
+    :param str name: name of the function in pyuv_cffi and the socket module
+    :raise socket.gaierror: if the lookup failed
+    """
+    hub = get_hub()
+    loop = getattr(hub, 'loop', None)
+    if pyuv_cffi is not None and isinstance(loop, pyuv_cffi.Loop):
+        request = _Request(hub)
+        getattr(pyuv_cffi, name)(loop, *args, callback=request._callback)
+        return request.wait()
+
+    return tpool.execute(getattr(socket_orig, name), *args)
+
+
+def _is_numeric(host):
+    """Return True if `host` is a numeric IPv4 or IPv6 address (or None)
+    """
+    if host is None:
+        return True
+    if isinstance(host, bytes):
+        host = host.decode('ascii', 'replace')
+
+    for family in (socket_orig.AF_INET, socket_orig.AF_INET6):
+        try:
+            socket_orig.inet_pton(family, host)
+            return True
+        except (OSError, ValueError):
+            pass
+
+    return False
+
+
+def _intenum(value, enum_class):
+    try:
+        return enum_class(value)
+    except ValueError:
+        return value
+
+
+def getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """Replacement for :func:`socket.getaddrinfo`
+    """
+    if _is_numeric(host):
+        # no lookup required
+        return socket_orig.getaddrinfo(host, port, family, type, proto,
+                                       flags | socket_orig.AI_NUMERICHOST)
+
+    result = _lookup('getaddrinfo', host, port, family, type, proto, flags)
+    return [(_intenum(af, socket_orig.AddressFamily), _intenum(socktype, socket_orig.SocketKind),
+             proto, canonname, sockaddr)
+            for af, socktype, proto, canonname, sockaddr in result]
+
+
+def gethostbyname(hostname):
+    """Replacement for :func:`socket.gethostbyname`
+    """
+    return getaddrinfo(hostname, None, socket_orig.AF_INET)[0][4][0]
+
+
+def gethostbyname_ex(hostname):
+    """Replacement for :func:`socket.gethostbyname_ex`
+
+    Aliases are not supported; the list of aliases is always empty.
+    """
+    infos = getaddrinfo(hostname, None, socket_orig.AF_INET, socket_orig.SOCK_STREAM, 0,
+                        socket_orig.AI_CANONNAME)
+    addrs = []
+    for info in infos:
+        if info[4][0] not in addrs:
+            addrs.append(info[4][0])
+
+    return infos[0][3] or hostname, [], addrs
+
+
+def getnameinfo(sockaddr, flags):
+    """Replacement for :func:`socket.getnameinfo`
+    """
+    if not isinstance(sockaddr, tuple) or len(sockaddr) < 2:
+        raise TypeError('getnameinfo() argument 1 must be a tuple')
+
+    if sockaddr[0] is None or not _is_numeric(sockaddr[0]):
+        # like socket.getnameinfo(), which only accepts numeric addresses
+        raise socket_orig.gaierror(socket_orig.EAI_NONAME, 'Name or service not known')
+
+    return _lookup('getnameinfo', sockaddr, flags)
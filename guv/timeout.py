@@ -42,12 +42,20 @@ class Timeout(BaseException):
             self.timer = None
         elif self.exception is None or isinstance(self.exception, bool):  # timeout that raises self
             self.timer = get_hub().schedule_call_global(
-                self.seconds, greenlet.getcurrent().throw, self)
+                self.seconds, self._expire, greenlet.getcurrent(), self)
         else:  # regular timeout with user-provided exception
             self.timer = get_hub().schedule_call_global(
-                self.seconds, greenlet.getcurrent().throw, self.exception)
+                self.seconds, self._expire, greenlet.getcurrent(), self.exception)
         return self
 
+    def _expire(self, g, exception):
+        """Raise the exception in the greenlet which started the timeout
+        """
+        profiler = get_hub().wait_profiler
+        if profiler is not None:
+            profiler.timeout_expired(g)
+        g.throw(exception)
+
     @property
     def pending(self):
         """True if the timeout is scheduled to be raised
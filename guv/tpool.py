@@ -0,0 +1,258 @@
+"""Thread pool for blocking calls
+
+Some calls block the OS thread and can't be made cooperative: C libraries without access to a file
+descriptor, CPU-bound functions which release the GIL (such as :func:`hashlib.scrypt`), or blocking
+database drivers. :func:`execute` runs such calls in a pool of real OS threads (even if the
+`threading` module is monkey-patched), and suspends only the calling greenlet until the result is
+available. The hub keeps serving other greenlets in the meantime.
+
+Results are passed back to the hub with :meth:`~guv.hubs.abc.AbstractHub.schedule_call_threadsafe`,
+so results of calls which complete at about the same time are delivered with a single wakeup of the
+hub.
+
+The size of the default pool is set by the environment variable ``GUV_THREADPOOL_SIZE`` (default:
+20). Threads are started as required, up to this size.
+
+Usage::
+
+    from guv import tpool
+
+    digest = tpool.execute(hashlib.scrypt, password, salt=salt, n=2 ** 14, r=8, p=1)
+"""
+import os
+import sys
+import time
+
+import greenlet
+
+from . import patcher
+from .hubs import get_hub
+
+__all__ = ['ThreadPool', 'get_pool', 'execute', 'killall', 'stats']
+
+threading_orig = patcher.original('threading')
+queue_orig = patcher.original('queue')
+
+DEFAULT_SIZE = int(os.environ.get('GUV_THREADPOOL_SIZE', 20))
+
+
+class _Call:
+    __slots__ = ['fn', 'args', 'kwargs', 'hub', 'greenlet', 'abandoned', 'result', 'exc',
+                 'submitted', 'started', 'finished']
+
+    def __init__(self, fn, args, kwargs, hub, g):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.hub = hub
+        self.greenlet = g
+
+        #: True if the calling greenlet no longer waits for the result
+        self.abandoned = False
+
+        self.result = None
+        self.exc = None
+
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+
+
+class ThreadPool:
+    """Pool of OS threads for blocking calls
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        """
+        :param int size: maximum number of threads
+        """
+        if size < 1:
+            raise ValueError('size must be at least 1')
+
+        self.size = size
+        self.threads = []
+        self._queue = queue_orig.Queue()
+
+        # the pool may be shared by the hubs of several threads (such as with
+        # `guv.server.serve_threads()`), so the counters and threads below are modified with this
+        # lock held
+        self._lock = threading_orig.Lock()
+
+        #: number of calls submitted, but not completed yet
+        self._outstanding = 0
+
+        # statistics
+        self.completed = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+        self.max_latency = 0.0
+
+    def execute(self, fn, *args, **kwargs):
+        """Call `fn(*args, **kwargs)` in a thread of the pool
+
+        The calling greenlet is suspended until the call returns. If the greenlet is killed (or a
+        :class:`~guv.timeout.Timeout` expires) before then, the call is not started if it hasn't
+        been started yet; otherwise, it runs to completion and its result is discarded.
+
+        :return: return value of `fn`
+        :raise: the exception raised by `fn`
+        """
+        hub = get_hub()
+        current = greenlet.getcurrent()
+        assert hub is not current, 'do not call blocking functions from the mainloop'
+
+        call = _Call(fn, args, kwargs, hub, current)
+        with self._lock:
+            self._outstanding += 1
+            if self._outstanding > len(self.threads) and len(self.threads) < self.size:
+                self._start_thread()
+
+        self._queue.put(call)
+
+        hub.ref_threadsafe()
+        try:
+            hub.switch()
+        except:
+            call.abandoned = True
+            raise
+        finally:
+            hub.unref_threadsafe()
+
+        if call.exc is not None:
+            raise call.exc
+
+        return call.result
+
+    @property
+    def queue_depth(self):
+        """Number of calls waiting for a thread
+        """
+        return self._queue.qsize()
+
+    @property
+    def busy(self):
+        """Number of threads running a call
+        """
+        return max(self._outstanding - self._queue.qsize(), 0)
+
+    def stats(self):
+        """Return statistics of the thread pool
+
+        - size: maximum number of threads
+        - threads: number of threads started
+        - busy: number of threads running a call
+        - queue_depth: number of calls waiting for a thread
+        - completed: number of calls completed
+        - mean_wait_time: mean time (in seconds) calls waited for a thread
+        - mean_run_time: mean time (in seconds) calls ran for
+        - max_latency: maximum time (in seconds) from submitting a call until its result was
+          delivered
+
+        :rtype: dict
+        """
+        with self._lock:
+            completed = self.completed
+            return {
+                'size': self.size,
+                'threads': len(self.threads),
+                'busy': self.busy,
+                'queue_depth': self.queue_depth,
+                'completed': completed,
+                'mean_wait_time': self.total_wait_time / completed if completed else 0.0,
+                'mean_run_time': self.total_run_time / completed if completed else 0.0,
+                'max_latency': self.max_latency,
+            }
+
+    def killall(self):
+        """Stop all threads of the pool
+
+        Calls which have already been submitted are completed first. The pool can still be used
+        afterwards; threads are started again as required.
+        """
+        with self._lock:
+            threads = self.threads
+            self.threads = []
+        for _ in threads:
+            self._queue.put(None)
+
+        for thread in threads:
+            thread.join()
+
+    def _start_thread(self):
+        thread = threading_orig.Thread(target=self._worker, name='guv.tpool')
+        thread.daemon = True
+        thread.start()
+        self.threads.append(thread)
+
+    def _worker(self):
+        """Run calls in a thread of the pool
+        """
+        get = self._queue.get
+        while True:
+            call = get()
+            if call is None:
+                return
+
+            call.started = time.monotonic()
+            if not call.abandoned:
+                try:
+                    call.result = call.fn(*call.args, **call.kwargs)
+                except BaseException:
+                    call.exc = sys.exc_info()[1]
+
+            call.finished = time.monotonic()
+            call.hub.schedule_call_threadsafe(self._deliver, call)
+
+    def _deliver(self, call):
+        """Resume the greenlet waiting for the call (called in the hub's thread)
+        """
+        with self._lock:
+            self._outstanding -= 1
+            self.completed += 1
+            self.total_wait_time += call.started - call.submitted
+            self.total_run_time += call.finished - call.started
+            self.max_latency = max(self.max_latency, time.monotonic() - call.submitted)
+
+        if not call.abandoned:
+            call.greenlet.switch()
+
+
+_pool = None
+_pool_lock = threading_orig.Lock()
+
+
+def get_pool():
+    """Return the default thread pool
+
+    :rtype: ThreadPool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPool()
+
+    return _pool
+
+
+def execute(fn, *args, **kwargs):
+    """Call `fn(*args, **kwargs)` in a thread of the default pool
+
+    See :meth:`ThreadPool.execute`.
+    """
+    return get_pool().execute(fn, *args, **kwargs)
+
+
+def stats():
+    """Return statistics of the default thread pool
+
+    See :meth:`ThreadPool.stats`.
+    """
+    return get_pool().stats()
+
+
+def killall():
+    """Stop all threads of the default thread pool
+    """
+    if _pool is not None:
+        _pool.killall()
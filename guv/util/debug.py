@@ -10,6 +10,8 @@ import greenlet
 import traceback
 import logging
 
+from ..const import READ, WRITE
+
 __all__ = ['spew', 'unspew', 'format_hub_listeners', 'format_hub_timers',
            'hub_listener_stacks', 'hub_exceptions',
            'hub_prevent_multiple_readers', 'hub_timer_stacks',
@@ -97,10 +99,10 @@ def format_hub_listeners():
 
     hub = hubs.get_hub()
     result = ['READERS:']
-    for l in hub.get_readers():
+    for l in hub.listeners[READ].values():
         result.append(repr(l))
     result.append('WRITERS:')
-    for l in hub.get_writers():
+    for l in hub.listeners[WRITE].values():
         result.append(repr(l))
     return os.linesep.join(result)
 
@@ -114,7 +116,7 @@ def format_hub_timers():
 
     hub = hubs.get_hub()
     result = ['TIMERS:']
-    for l in hub.timers:
+    for l in sorted(t for t in hub.timers if not t.called):
         result.append(repr(l))
     return os.linesep.join(result)
 
@@ -169,25 +171,26 @@ def hub_exceptions(state=True):
 
 
 def hub_blocking_detection(state=False, resolution=1):
-    """Toggles whether Eventlet makes an effort to detect blocking
-    behavior in an application.
-
-    It does this by telling the kernel to raise a SIGALARM after a
-    short timeout, and clearing the timeout every time the hub
-    greenlet is resumed.  Therefore, any code that runs for a long
-    time without yielding to the hub will get interrupted by the
-    blocking detector (don't use it in production!).
-
-    The *resolution* argument governs how long the SIGALARM timeout
-    waits in seconds.  The implementation uses :func:`signal.setitimer`
-    and can be specified as a floating-point value.
-    The shorter the resolution, the greater the chance of false
-    positives.
+    """Toggle detection of greenlets blocking the hub of the current thread
+
+    When enabled, a :class:`~guv.util.watchdog.Watchdog` thread logs the stack of any greenlet which
+    keeps the hub busy for longer than `resolution` seconds without yielding, and how long it
+    blocked the hub. It doesn't interrupt the blocking greenlet, so it is safe to use in production.
+    The watchdog is stopped when the hub is closed.
+
+    :param bool state: enable or disable the detection
+    :param float resolution: threshold in seconds
     """
     from guv import hubs
+    from .watchdog import Watchdog
 
     assert resolution > 0
-    hubs.get_hub().debug_blocking = state
-    hubs.get_hub().debug_blocking_resolution = resolution
-    if not state:
-        hubs.get_hub().block_detect_post()
+    hub = hubs.get_hub()
+    if hub.watchdog is not None:
+        hub.watchdog.stop()
+        hub.watchdog = None
+
+    if state:
+        hub.watchdog = Watchdog(resolution)
+        hub.watchdog.start()
+
@@ -0,0 +1,275 @@
+"""Statistical sampling profiler for greenlets
+
+Unlike :mod:`guv.util.profile`, which hooks every function call, :class:`SamplingProfiler` runs an
+OS thread of its own which periodically captures the stack of the hub's thread with
+:func:`sys._current_frames`. That stack is the stack of the greenlet currently running (or of the
+hub itself, when it runs callbacks), since greenlets don't chain their frames to those of the
+greenlet which switched to them. The only work done in the hub's thread is keeping track of the
+current greenlet with a :func:`greenlet.settrace` function, and the sampling thread holds the GIL
+for a few microseconds per sample.
+
+Samples are attributed:
+
+- per function, in the collapsed stack format used by flame graph tools (:meth:`write_collapsed`),
+  and as :mod:`pstats`-compatible statistics (``pstats.Stats(profiler)``, :meth:`dump_stats`)
+- per greenlet, and per entry point: the function the greenlet was spawned with
+  (:meth:`greenlet_stats`, :meth:`entry_point_stats`)
+
+Samples taken while the hub is waiting for I/O are counted as idle (:attr:`idle_samples`), and are
+not included in the statistics.
+
+Usage::
+
+    from guv.util.sampling import SamplingProfiler
+
+    with SamplingProfiler(hz=100) as profiler:
+        ...
+
+    profiler.write_collapsed('guv.folded')  # flamegraph.pl guv.folded > guv.svg
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+
+Since samples are taken at intervals, the call counts of the :mod:`pstats` statistics are numbers of
+samples, and times are numbers of samples multiplied by the sampling interval.
+"""
+from collections import Counter
+import logging
+import marshal
+import sys
+import time
+
+import greenlet
+
+from .. import patcher
+from ..greenthread import GreenThread
+from ..hubs import get_hub
+
+__all__ = ['SamplingProfiler']
+
+_threading = patcher.original('threading')
+
+log = logging.getLogger('guv')
+
+_greenthread_main = GreenThread.main.__code__
+
+
+def _label(code):
+    """Get the label of a function in collapsed stacks
+
+    :type code: code
+    :rtype: str
+    """
+    return '{} ({}:{})'.format(code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def _func(code):
+    """Get the key of a function in :mod:`pstats` statistics
+    """
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class SamplingProfiler:
+    """Sampling profiler for the greenlets of the hub of the thread it was created in
+    """
+
+    def __init__(self, hz=100):
+        """
+        :param float hz: number of samples per second
+        """
+        self.hub = get_hub()
+        self.interval = 1 / hz
+
+        #: number of samples per stack: {(code, ...) from the root to the leaf: samples}
+        self.stacks = Counter()
+
+        #: number of samples per greenlet: {(id of the greenlet, entry point code): samples}
+        self.greenlets = Counter()
+
+        #: number of samples taken while the hub was waiting for I/O
+        self.idle_samples = 0
+
+        #: total number of samples, including idle samples
+        self.samples = 0
+
+        #: the stats attribute of profile.Profile, filled by :meth:`create_stats`
+        self.stats = {}
+
+        self._hub_run = type(self.hub).run.__code__
+        self._thread_id = _threading.get_ident()
+        self._thread = None
+        self._stopped = _threading.Event()
+
+        # greenlet running in the hub's thread, and the previous greenlet trace function
+        self._current = None
+        self._previous_trace = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Start sampling
+
+        This must be called from the hub's thread.
+        """
+        if self._thread is not None:
+            raise RuntimeError('The profiler is already started')
+
+        self._current = greenlet.getcurrent()
+        self._previous_trace = greenlet.settrace(self._trace)
+        self._stopped.clear()
+        self._thread = _threading.Thread(target=self._run, name='guv sampling profiler',
+                                         daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling
+
+        Samples are kept, and sampling can be started again. This must be called from the hub's
+        thread.
+        """
+        if self._thread is None:
+            return
+
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        greenlet.settrace(self._previous_trace)
+        self._current = self._previous_trace = None
+
+    def _trace(self, event, args):
+        if event == 'switch' or event == 'throw':
+            self._current = args[1]
+        if self._previous_trace is not None:
+            self._previous_trace(event, args)
+
+    def _run(self):
+        interval = self.interval
+        deadline = time.perf_counter()
+        while True:
+            # keep to the sampling rate, whatever the time spent sampling
+            deadline += interval
+            timeout = deadline - time.perf_counter()
+            if timeout < 0:
+                deadline -= timeout
+                timeout = 0
+            if self._stopped.wait(timeout):
+                return
+
+            try:
+                self.sample()
+            except Exception:
+                log.exception('Sampling profiler: error')
+
+    def sample(self):
+        """Take a sample of the stack of the hub's thread
+        """
+        current = self._current
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+
+        self.samples += 1
+        codes = []
+        while True:
+            codes.append(frame.f_code)
+            if frame.f_back is None:
+                break
+            frame = frame.f_back
+        codes.reverse()
+
+        if codes[0] is self._hub_run and self.hub.metrics.poll_start is not None:
+            self.idle_samples += 1
+            return
+
+        self.stacks[tuple(codes)] += 1
+        if codes[0] is _greenthread_main and len(codes) > 1:
+            entry = codes[1]
+        else:
+            entry = codes[0]
+        self.greenlets[id(current), entry] += 1
+
+    def collapsed(self):
+        """Get the samples in the collapsed stack format
+
+        :return: lines of the form "root;...;leaf count"
+        :rtype: list[str]
+        """
+        return ['{} {}'.format(';'.join(map(_label, stack)), n)
+                for stack, n in sorted(self.stacks.items(), key=lambda item: -item[1])]
+
+    def write_collapsed(self, file):
+        """Write the samples in the collapsed stack format, for flame graph tools such as
+        flamegraph.pl or speedscope
+
+        :param file: path or text file object
+        """
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                return self.write_collapsed(f)
+
+        for line in self.collapsed():
+            file.write(line + '\n')
+
+    def greenlet_stats(self):
+        """Get the number of samples per greenlet
+
+        Greenlets are identified by their address, so the samples of a greenlet which has exited
+        may be merged with those of a later greenlet allocated at the same address.
+
+        :return: list of (entry point label, samples), by decreasing number of samples
+        :rtype: list[tuple[str, int]]
+        """
+        return [(_label(entry), n) for (_, entry), n in self.greenlets.most_common()]
+
+    def entry_point_stats(self):
+        """Get the number of samples per entry point (the function greenlets were spawned with)
+
+        :return: list of (entry point label, samples), by decreasing number of samples
+        :rtype: list[tuple[str, int]]
+        """
+        entries = Counter()
+        for (_, entry), n in self.greenlets.items():
+            entries[_label(entry)] += n
+        return entries.most_common()
+
+    def create_stats(self):
+        """Convert the samples into :mod:`pstats` statistics, in :attr:`stats`
+
+        This is called by :class:`pstats.Stats`.
+        """
+        # {func: [samples, self samples, {caller: samples}]}
+        funcs = {}
+        for stack, n in self.stacks.items():
+            seen = set()
+            caller = None
+            for code in stack:
+                func = _func(code)
+                entry = funcs.get(func)
+                if entry is None:
+                    entry = funcs[func] = [0, 0, Counter()]
+
+                # recursive functions are counted once per sample
+                if func not in seen:
+                    seen.add(func)
+                    entry[0] += n
+                if caller is not None:
+                    entry[2][caller] += n
+                caller = func
+            entry[1] += n
+
+        interval = self.interval
+        self.stats = {func: (samples, samples, self_samples * interval, samples * interval,
+                             dict(callers))
+                      for func, (samples, self_samples, callers) in funcs.items()}
+
+    def dump_stats(self, file):
+        """Write :mod:`pstats` statistics, which can be loaded with ``pstats.Stats(path)``
+
+        :param str file: path
+        """
+        self.create_stats()
+        with open(file, 'wb') as f:
+            marshal.dump(self.stats, f)
@@ -0,0 +1,359 @@
+"""Off-CPU wait attribution
+
+Most of the latency of a greenlet is time spent waiting: for a socket to become readable, a timer,
+a lock, a queue. When a :class:`WaitProfiler` is started, the blocking functions of guv record each
+wait of the greenlets of its hub, with its reason:
+
+- :func:`~guv.hubs.switch.trampoline`, which all green sockets, pipes and files wait with: 'read' or
+  'write', and the file descriptor
+- :func:`~guv.greenthread.sleep`: 'sleep'
+- :meth:`Semaphore.acquire <guv.semaphore.Semaphore.acquire>`: 'lock'
+- :meth:`LightQueue.get <guv.queue.LightQueue.get>` and :meth:`LightQueue.put
+  <guv.queue.LightQueue.put>`: 'queue get' and 'queue put'
+- :meth:`Event.wait <guv.event.Event.wait>`: 'event'
+
+Each wait is attributed to its call site: the innermost frame outside of guv, which is the code
+(of the application, or of a library such as a database driver) which waited, or else the guv
+function which waited. Durations are recorded in histograms with fixed buckets per reason and call
+site (:meth:`WaitProfiler.stats`), and totals are kept per file descriptor
+(:meth:`WaitProfiler.fd_stats`). The number of entries is bounded, so memory use doesn't grow with
+the number of waits. Waits which are interrupted by the expiry of a :class:`~guv.timeout.Timeout` are
+counted as timed out.
+
+The time spent waiting is also recorded per stack, and can be written in the collapsed stack format
+to draw an off-CPU flame graph, where the width of a frame is the time spent waiting below it.
+
+Usage::
+
+    from guv.util.waits import WaitProfiler
+
+    with WaitProfiler() as profiler:
+        ...
+
+    print(profiler.format_stats(20))
+    profiler.write_collapsed('waits.folded')  # flamegraph.pl --countname=us waits.folded
+
+When no profiler is started, each instrumented function only checks
+:attr:`hub.wait_profiler <guv.hubs.abc.AbstractHub.wait_profiler>`.
+"""
+from collections import Counter
+import os
+import sys
+import time
+
+import greenlet
+
+from ..hubs import get_hub
+from ..hubs.metrics import Histogram
+from .sampling import _label
+
+__all__ = ['WaitProfiler', 'WAIT_BUCKETS']
+
+perf_counter = time.perf_counter
+
+#: upper bounds (in seconds) of the buckets of the wait histograms; waits longer than the last bound
+#: are counted in an extra bucket
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+# frames of code in this directory are not call sites
+_guv_dir = os.path.dirname(os.path.dirname(__file__)) + os.sep
+
+# key of the entries for waits which didn't fit in the bounded tables
+_OTHER = None
+
+
+def _site_label(code, lineno):
+    """Get the label of a call site
+
+    :rtype: str
+    """
+    return '{} ({}:{})'.format(code.co_name, code.co_filename, lineno)
+
+
+class WaitProfiler:
+    """Wait profiler for the greenlets of the hub of the thread it was created in
+    """
+
+    def __init__(self, stacks=True, max_entries=10000):
+        """
+        :param bool stacks: record the time spent waiting per stack, for :meth:`collapsed`; this
+            walks the whole stack of the greenlet at each wait, instead of only the frames of guv
+        :param int max_entries: maximum number of call sites, file descriptors and stacks; further
+            waits are recorded in entries for other call sites and stacks, and not recorded per
+            file descriptor
+        """
+        self.hub = get_hub()
+        self.record_stacks = stacks
+        self.max_entries = max_entries
+
+        # Code objects are identified by their id in the tables below, since hashing them hashes
+        # their constants and names every time. They are kept alive by this table: {id: code}
+        self._codes = {}
+
+        # wait durations per call site: {(reason, id of the code, line number): Histogram}; the
+        # code id is None for other sites
+        self._sites = {}
+
+        # number of timed out waits per call site: {(reason, id of the code, line number): timeouts}
+        self._timeouts = Counter()
+
+        # wait totals per file descriptor: {(reason, fd): [count, total, max]}
+        self._fds = {}
+
+        # time spent waiting per stack: {(reason, id of the code, ...): seconds}, from the root to
+        # the call site; the stack only has the reason for other stacks
+        self._stacks = {}
+
+        #: total time profiled (in seconds)
+        self.elapsed = 0.0
+
+        self._started = None
+
+        # greenlet which a Timeout has expired in, until it records the wait it interrupted
+        self._expired = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Start recording waits
+
+        This must be called from the hub's thread.
+        """
+        if self.hub.wait_profiler is self:
+            raise RuntimeError('The profiler is already started')
+        if self.hub.wait_profiler is not None:
+            raise RuntimeError('Another wait profiler is started')
+
+        self._started = perf_counter()
+        self.hub.wait_profiler = self
+
+    def stop(self):
+        """Stop recording waits
+
+        Recorded waits are kept, and recording can be started again. This must be called from the
+        hub's thread.
+        """
+        if self.hub.wait_profiler is not self:
+            return
+
+        self.hub.wait_profiler = None
+        self.elapsed += perf_counter() - self._started
+        self._started = None
+
+    def wait_started(self):
+        """Called by a greenlet before it waits
+
+        :return: start time, to pass to :meth:`wait_ended`
+        :rtype: float
+        """
+        if self._expired is greenlet.getcurrent():
+            self._expired = None
+        return perf_counter()
+
+    def timeout_expired(self, g):
+        """Called by a :class:`~guv.timeout.Timeout` which expires, before it raises its exception
+        in the greenlet
+
+        :type g: greenlet.greenlet
+        """
+        self._expired = g
+
+    def wait_ended(self, reason, start, fd=None):
+        """Called by a greenlet when it stops waiting, whether it was woken up or not
+
+        :param str reason: reason of the wait
+        :param float start: value returned by :meth:`wait_started`
+        :param int fd: file descriptor waited for, if any
+        """
+        duration = perf_counter() - start
+        timed_out = self._expired is greenlet.getcurrent()
+        if timed_out:
+            self._expired = None
+
+        # the call site is the innermost frame outside of guv, or the function which waited if the
+        # greenlet only runs guv code (such as a greenlet spawned with a method of a queue)
+        waiting = sys._getframe(1)
+        frame = waiting
+        while frame is not None and frame.f_code.co_filename.startswith(_guv_dir):
+            frame = frame.f_back
+        if frame is None:
+            frame = waiting
+
+        code = frame.f_code
+        site = (reason, id(code), frame.f_lineno)
+        histogram = self._sites.get(site)
+        if histogram is None:
+            if len(self._sites) >= self.max_entries:
+                site = (reason, _OTHER, 0)
+                histogram = self._sites.get(site)
+            else:
+                self._codes[id(code)] = code
+            if histogram is None:
+                histogram = self._sites[site] = Histogram(WAIT_BUCKETS)
+        histogram.record(duration)
+        if timed_out:
+            self._timeouts[site] += 1
+
+        if fd is not None:
+            key = (reason, fd)
+            totals = self._fds.get(key)
+            if totals is None and len(self._fds) < self.max_entries:
+                totals = self._fds[key] = [0, 0.0, 0.0]
+            if totals is not None:
+                totals[0] += 1
+                totals[1] += duration
+                if duration > totals[2]:
+                    totals[2] = duration
+
+        if not self.record_stacks:
+            return
+
+        codes = []
+        append = codes.append
+        while frame is not None:
+            append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        stack = (reason,) + tuple(map(id, codes))
+        seconds = self._stacks.get(stack)
+        if seconds is None:
+            if len(self._stacks) >= self.max_entries:
+                stack = (reason,)
+                seconds = self._stacks.get(stack, 0.0)
+            else:
+                for code in codes:
+                    self._codes[id(code)] = code
+                seconds = 0.0
+        self._stacks[stack] = seconds + duration
+
+    def _elapsed(self):
+        if self._started is None:
+            return self.elapsed
+        return self.elapsed + perf_counter() - self._started
+
+    def stats(self):
+        """Get the waits per call site
+
+        :return: list of {'reason', 'site', 'count', 'total', 'mean', 'max', 'timeouts', 'share',
+            'buckets'}, by decreasing total time; `site` is the label of the call site, `share` is
+            the fraction of the total time spent waiting, and `buckets` is a list of (upper bound
+            or None, count)
+        :rtype: list[dict]
+        """
+        total = sum(histogram.total for histogram in self._sites.values())
+        stats = []
+        for site, histogram in self._sites.items():
+            reason, code_id, lineno = site
+            snapshot = histogram.snapshot()
+            stats.append({
+                'reason': reason,
+                'site': (_site_label(self._codes[code_id], lineno) if code_id is not _OTHER
+                         else '<other>'),
+                'count': snapshot['count'],
+                'total': histogram.total,
+                'mean': snapshot['mean'],
+                'max': snapshot['max'],
+                'timeouts': self._timeouts[site],
+                'share': histogram.total / total if total else 0.0,
+                'buckets': snapshot['buckets'],
+            })
+        stats.sort(key=lambda item: -item['total'])
+        return stats
+
+    def reason_stats(self):
+        """Get the waits per reason
+
+        :return: list of {'reason', 'count', 'total', 'timeouts', 'share'}, by decreasing total time
+        :rtype: list[dict]
+        """
+        # {reason: [count, total, timeouts]}
+        reasons = {}
+        for site, histogram in self._sites.items():
+            totals = reasons.get(site[0])
+            if totals is None:
+                totals = reasons[site[0]] = [0, 0.0, 0]
+            totals[0] += histogram.count
+            totals[1] += histogram.total
+            totals[2] += self._timeouts[site]
+
+        total = sum(totals[1] for totals in reasons.values())
+        stats = [{'reason': reason, 'count': count, 'total': seconds, 'timeouts': timeouts,
+                  'share': seconds / total if total else 0.0}
+                 for reason, (count, seconds, timeouts) in reasons.items()]
+        stats.sort(key=lambda item: -item['total'])
+        return stats
+
+    def fd_stats(self):
+        """Get the waits per file descriptor
+
+        File descriptors are reused once closed, so the waits for different files may be merged.
+
+        :return: list of {'reason', 'fd', 'count', 'total', 'max'}, by decreasing total time
+        :rtype: list[dict]
+        """
+        stats = [{'reason': reason, 'fd': fd, 'count': count, 'total': total, 'max': maximum}
+                 for (reason, fd), (count, total, maximum) in self._fds.items()]
+        stats.sort(key=lambda item: -item['total'])
+        return stats
+
+    def format_stats(self, n=20):
+        """Format the waits per reason and per call site as tables
+
+        :param int n: maximum number of call sites
+        :rtype: str
+        """
+        elapsed = self._elapsed()
+        total = sum(stats['total'] for stats in self.reason_stats())
+        lines = ['Waited {:.3f}s in {:.3f}s'.format(total, elapsed), '']
+
+        header = '{:>7} {:>10} {:>8} {:>9} {:>9} {:>8}  {}'
+        reason_row = '{:6.1f}% {:10.3f} {:8d} {:9.2f} {:>9} {:8d}  {}'
+        row = '{:6.1f}% {:10.3f} {:8d} {:9.2f} {:9.2f} {:8d}  {}'
+        lines.append(header.format('share', 'total (s)', 'waits', 'mean (ms)', 'max (ms)',
+                                   'timeouts', 'reason'))
+        for stats in self.reason_stats():
+            lines.append(reason_row.format(stats['share'] * 100, stats['total'], stats['count'],
+                                           stats['total'] / stats['count'] * 1000, '',
+                                           stats['timeouts'], stats['reason']))
+
+        lines.append('')
+        lines.append(header.format('share', 'total (s)', 'waits', 'mean (ms)', 'max (ms)',
+                                   'timeouts', 'reason: call site'))
+        for stats in self.stats()[:n]:
+            lines.append(row.format(stats['share'] * 100, stats['total'], stats['count'],
+                                    stats['mean'] * 1000, stats['max'] * 1000, stats['timeouts'],
+                                    '{}: {}'.format(stats['reason'], stats['site'])))
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        """Get the time spent waiting per stack in the collapsed stack format, in microseconds
+
+        The leaf of each stack is the reason of the waits, in brackets.
+
+        :return: lines of the form "root;...;[reason] microseconds"
+        :rtype: list[str]
+        """
+        lines = []
+        for stack, seconds in sorted(self._stacks.items(), key=lambda item: -item[1]):
+            frames = [_label(self._codes[code_id]) for code_id in stack[1:]] or ['<other>']
+            frames.append('[{}]'.format(stack[0]))
+            lines.append('{} {}'.format(';'.join(frames), int(seconds * 1000000)))
+        return lines
+
+    def write_collapsed(self, file):
+        """Write the time spent waiting per stack in the collapsed stack format, for flame graph
+        tools such as flamegraph.pl or speedscope
+
+        :param file: path or text file object
+        """
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                return self.write_collapsed(f)
+
+        for line in self.collapsed():
+            file.write(line + '\n')
@@ -0,0 +1,182 @@
+"""Detection of greenlets blocking the hub
+
+A greenlet which runs for a long time without yielding blocks the hub: no other greenlet runs, no
+I/O is served, and timers fire late. :class:`Watchdog` detects this from an OS thread of its own,
+which wakes up periodically and checks how long the hub's loop has been busy since it last polled
+for I/O (see :mod:`guv.hubs.metrics`). When that exceeds the threshold, it captures the stack of the
+hub's thread, which is the stack of the greenlet blocking the hub, and reports it.
+
+No signals are used and the hub's thread is never interrupted: the watchdog only costs the periodic
+wakeups of its thread, so it can be left enabled in production. The watchdog thread needs the GIL
+to run, so a C function which blocks the hub without releasing the GIL is only detected once it
+returns.
+
+Usage::
+
+    from guv.util.watchdog import Watchdog
+
+    watchdog = Watchdog(threshold=0.1)
+    watchdog.start()
+"""
+import logging
+import sys
+import time
+import traceback
+
+from .. import patcher
+from ..hubs import get_hub
+
+__all__ = ['Watchdog', 'BlockingEvent']
+
+_threading = patcher.original('threading')
+
+log = logging.getLogger('guv')
+
+
+class BlockingEvent:
+    """The hub being blocked for longer than the threshold of a :class:`Watchdog`
+    """
+
+    def __init__(self, started, duration, stack):
+        #: :func:`time.perf_counter` value when the hub's loop last polled for I/O before being
+        #: blocked
+        self.started = started
+
+        #: how long the hub has been blocked (in seconds); once the event has ended, this is
+        #: accurate to within the watchdog's check interval
+        self.duration = duration
+
+        #: stack of the hub's thread when the blocking was detected
+        #: :type: traceback.StackSummary
+        self.stack = stack
+
+        #: True once the hub's loop has polled for I/O again
+        self.ended = False
+
+    def __repr__(self):
+        return '<{} duration={:.3f}s ended={}>'.format(type(self).__name__, self.duration,
+                                                      self.ended)
+
+    def format(self):
+        """Format the event and its stack for logging
+
+        :rtype: str
+        """
+        if self.ended:
+            msg = 'Hub was blocked for {:.3f}s'.format(self.duration)
+        else:
+            msg = 'Hub blocked for {:.3f}s'.format(self.duration)
+        return '{}, in:\n{}'.format(msg, ''.join(self.stack.format()).rstrip())
+
+
+def log_event(event):
+    """Default callback of :class:`Watchdog`: log the stack when blocking is detected, and the
+    duration when it ends
+    """
+    if event.ended:
+        log.warning('Hub was blocked for {:.3f}s'.format(event.duration))
+    else:
+        log.warning(event.format())
+
+
+class Watchdog:
+    """Watchdog thread reporting greenlets which block the hub of the thread it was created in
+    """
+
+    def __init__(self, threshold=0.1, callback=log_event, interval=None):
+        """
+        :param float threshold: report the hub when it has been busy for longer than this without
+            polling for I/O (in seconds)
+        :param callback: called in the watchdog thread with a :class:`BlockingEvent` when blocking
+            is detected, and again with the same event when it ends; it must not use the hub or
+            green objects
+        :type callback: Callable(event: BlockingEvent)
+        :param float interval: time between checks (default: a quarter of the threshold)
+        """
+        self.hub = get_hub()
+        self.threshold = threshold
+        self.callback = callback
+        self.interval = interval if interval is not None else threshold / 4
+
+        #: number of blocking events detected
+        self.detected = 0
+
+        self._thread_id = _threading.get_ident()
+        self._thread = None
+        self._stopped = _threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Start the watchdog thread
+        """
+        if self._thread is not None:
+            raise RuntimeError('The watchdog is already started')
+
+        self._stopped.clear()
+        self._thread = _threading.Thread(target=self._run, name='guv watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the watchdog thread
+        """
+        if self._thread is None:
+            return
+
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        event = None
+        while not self._stopped.wait(self.interval):
+            try:
+                event = self._check(event)
+            except Exception:
+                log.exception('Watchdog: error')
+                event = None
+
+    def _check(self, event):
+        """Check whether the hub is blocked
+
+        :param event: the current :class:`BlockingEvent`, or None
+        :return: the current :class:`BlockingEvent`, or None if the hub isn't blocked
+        """
+        metrics = self.hub.metrics
+        poll_end = metrics.poll_end
+        now = time.perf_counter()
+        blocked = (self.hub.running and metrics.poll_start is None and poll_end is not None)
+
+        if event is not None:
+            if blocked and poll_end == event.started:
+                event.duration = now - poll_end
+                return event
+
+            # the hub has polled again since the last check
+            poll_start = metrics.poll_start
+            if poll_end == event.started and poll_start is not None:
+                event.duration = poll_start - poll_end
+            event.ended = True
+            self.callback(event)
+            event = None
+
+        if blocked and now - poll_end >= self.threshold:
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                return None
+
+            # check again, since the hub may have polled while the stack was captured
+            stack = traceback.extract_stack(frame)
+            if metrics.poll_end != poll_end or metrics.poll_start is not None:
+                return None
+
+            self.detected += 1
+            event = BlockingEvent(poll_end, now - poll_end, stack)
+            self.callback(event)
+
+        return event
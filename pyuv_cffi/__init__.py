@@ -2,32 +2,37 @@
 
 Compatible with CPython 3 and pypy3
 """
+import collections
+import mmap
 import os
-import functools
-
-import cffi
-import cffi.verifier
-from cffi import VerificationError
+import socket
 
 __version__ = '0.1.0'
 version_info = tuple(map(int, __version__.split('.')))
 
-# clean up old compiled library binaries (not needed in production?)
-cffi.verifier.cleanup_tmpdir()
+try:
+    # out-of-line extension module built by setup.py (see build.py)
+    from ._pyuv_cffi import ffi, lib as libuv
+    prebuilt = True
+except ImportError:
+    # development fallback: compile the bindings when imported
+    import cffi
+    from cffi import VerificationError
 
-thisdir = os.path.dirname(os.path.realpath(__file__))
+    thisdir = os.path.dirname(os.path.realpath(__file__))
 
-# load FFI definitions and custom C code
-ffi = cffi.FFI()
-with open(os.path.join(thisdir, 'pyuv_cffi_cdef.c')) as f:
-    ffi.cdef(f.read())
+    # load FFI definitions and custom C code
+    ffi = cffi.FFI()
+    with open(os.path.join(thisdir, 'pyuv_cffi_cdef.c')) as f:
+        ffi.cdef(f.read())
 
-try:
-    with open(os.path.join(thisdir, 'pyuv_cffi.c')) as f:
-        libuv = ffi.verify(f.read(), libraries=['uv'])
-except VerificationError as e:
-    print(e)
-    exit(1)
+    try:
+        with open(os.path.join(thisdir, 'pyuv_cffi.c')) as f:
+            libuv = ffi.verify(f.read(), libraries=['uv'])
+    except VerificationError as e:
+        raise ImportError('pyuv_cffi: failed to build libuv bindings: {}'.format(e))
+
+    prebuilt = False
 
 UV_READABLE = libuv.UV_READABLE
 UV_WRITABLE = libuv.UV_WRITABLE
@@ -36,36 +41,196 @@ UV_RUN_DEFAULT = libuv.UV_RUN_DEFAULT
 UV_RUN_ONCE = libuv.UV_RUN_ONCE
 UV_RUN_NOWAIT = libuv.UV_RUN_NOWAIT
 
-alive = []
+#: Handle objects which have not been closed yet. The underlying `uv_handle_t` refers to the Handle
+#: object (see `Handle.__init__`), so it must be kept alive until libuv is done with the handle.
+alive = set()
 
+#: number of handles in `alive` by type: {Handle subclass: count}
+_alive_counts = collections.Counter()
 
-class Loop:
-    def __init__(self):
-        self.loop_h = ffi.new('uv_loop_t *')
-        libuv.uv_loop_init(self.loop_h)
 
-        self._handles = []  # temporary list of Handle objects
-        self._ffi_walk_cb = ffi.callback('void (*)(uv_handle_t *handle, void *arg)', self._walk_cb)
+#: Requests which have not completed yet. The underlying `uv_req_t` (and the buffer of a filesystem
+#: read or write request) must be kept alive until libuv calls the request's callback.
+pending_requests = set()
 
-    def _walk_cb(self, handle_p, arg):
-        """Callback passed to uv_walk()
+#: allocate buffers for reading without clearing them first
+_alloc_buffer = ffi.new_allocator(should_clear_after_alloc=False)
 
-        Note: the handle_p cdata object is appended to `self._handles`, and the list is destroyed
-        afterwards, to prevent storing a reference to the handle.
+#: Read buffers which are not in use, by size (a power of 2). Large buffers are reused, because
+#: allocating (and faulting in) a new large buffer for every read is expensive.
+_free_buffers = collections.defaultdict(list)
 
-        :param cdata handle_p: underlying handle pointer
-        :param cdata arg: user-defined argument (NULL for our purposes)
-        """
-        handle_obj = ffi.from_handle(handle_p.data)
-        self._handles.append(handle_obj)
+#: maximum number of free buffers of each size
+MAX_FREE_BUFFERS = 8
+
+#: minimum size of reused buffers; smaller buffers are cheap to allocate
+_MIN_REUSED_BUFFER_SIZE = 64 * 1024
+
+#: alignment of the data in reused buffers
+_BUFFER_ALIGNMENT = mmap.PAGESIZE
+
+
+def alive_count(handle_type=None):
+    """Return the number of handles which have not been closed yet
+
+    :param type handle_type: only count handles of this type (such as :class:`Poll`), including
+        subclasses
+    :rtype: int
+    """
+    if handle_type is None:
+        return len(alive)
+
+    return sum(count for cls, count in _alive_counts.items() if issubclass(cls, handle_type))
+
+
+def strerror(err):
+    """Return the error message for a libuv error code
+
+    :param int err: negative error code
+    :rtype: str
+    """
+    return ffi.string(libuv.uv_strerror(err)).decode()
+
+
+def error_name(err):
+    """Return the name of a libuv error code, such as 'ENOENT' or 'EAI_NONAME'
+
+    :param int err: negative error code
+    :rtype: str
+    """
+    return ffi.string(libuv.uv_err_name(err)).decode()
+
+
+# Static FFI callbacks
+#
+# Creating an FFI callback allocates executable memory for a C trampoline, which is expensive.
+# Instead of creating a callback (closure) for every handle, there is only one callback per handle
+# type. It retrieves the Handle object from `uv_handle_t.data` and calls the Python callback stored
+# in `Handle._callback`. Starting a handle therefore only stores a reference to the callback.
+
+def _static_callback(ctype):
+    """Create a static FFI callback from the decorated function
+
+    With the prebuilt extension module, the function implements the `extern "Python"` function of
+    the same name (declared in build.py). Otherwise, a callback is created with `ffi.callback()`.
+
+    :param str ctype: C type of the callback, used if the extension module is not prebuilt
+    :return: decorator which returns a cdata function pointer
+    """
+    def decorator(f):
+        if prebuilt:
+            ffi.def_extern()(f)
+            return getattr(libuv, f.__name__)
+        return ffi.callback(ctype, f)
+
+    return decorator
+
+
+@_static_callback('void (*)(uv_handle_t *, void *)')
+def _walk_cb(handle_p, arg):
+    """Callback passed to uv_walk()
+
+    :param cdata handle_p: underlying handle pointer
+    :param cdata arg: handle to the list which collects the Handle objects
+    """
+    ffi.from_handle(arg).append(ffi.from_handle(handle_p.data))
+
+
+@_static_callback('void (*)(uv_handle_t *)')
+def _close_cb(handle_p):
+    handle = ffi.from_handle(handle_p.data)
+    callback = handle._close_callback
+    handle._callback = None
+    handle._close_callback = None
+
+    try:
+        if callback:
+            callback(handle)
+    finally:
+        # now safe to free resources
+        alive.remove(handle)
+        _alive_counts[type(handle)] -= 1
+
+
+@_static_callback('void (*)(uv_idle_t *)')
+def _idle_cb(idle_p):
+    handle = ffi.from_handle(idle_p.data)
+    handle._callback(handle)
+
+
+@_static_callback('void (*)(uv_prepare_t *)')
+def _prepare_cb(prepare_p):
+    handle = ffi.from_handle(prepare_p.data)
+    handle._callback(handle)
+
+
+@_static_callback('void (*)(uv_check_t *)')
+def _check_cb(check_p):
+    handle = ffi.from_handle(check_p.data)
+    handle._callback(handle)
+
+
+@_static_callback('void (*)(uv_timer_t *)')
+def _timer_cb(timer_p):
+    handle = ffi.from_handle(timer_p.data)
+    handle._callback(handle)
+
+
+@_static_callback('void (*)(uv_signal_t *, int)')
+def _signal_cb(signal_p, signum):
+    handle = ffi.from_handle(signal_p.data)
+    handle._callback(handle, signum)
+
+
+@_static_callback('void (*)(uv_poll_t *, int, int)')
+def _poll_cb(poll_p, status, events):
+    handle = ffi.from_handle(poll_p.data)
+    handle._callback(handle, status, events)
+
+
+@_static_callback('void (*)(uv_async_t *)')
+def _async_cb(async_p):
+    handle = ffi.from_handle(async_p.data)
+    handle._callback(handle)
+
+
+@_static_callback('void (*)(uv_fs_t *)')
+def _fs_cb(req_p):
+    request = ffi.from_handle(req_p.data)
+    request._complete()
+
+
+@_static_callback('void (*)(uv_getaddrinfo_t *, int, struct addrinfo *)')
+def _getaddrinfo_cb(req_p, status, res):
+    request = ffi.from_handle(req_p.data)
+    try:
+        result = _addrinfo_list(res) if status == 0 else None
+    finally:
+        if res != ffi.NULL:
+            libuv.uv_freeaddrinfo(res)
+
+    request._finish(status, result)
+
+
+@_static_callback('void (*)(uv_getnameinfo_t *, int, const char *, const char *)')
+def _getnameinfo_cb(req_p, status, hostname, service):
+    request = ffi.from_handle(req_p.data)
+    result = None
+    if status == 0:
+        result = (ffi.string(hostname).decode(), ffi.string(service).decode())
+
+    request._finish(status, result)
+
+
+class Loop:
+    def __init__(self):
+        self.loop_h = ffi.new('uv_loop_t *')
+        libuv.uv_loop_init(self.loop_h)
 
     @classmethod
     def default_loop(cls):
         loop = Loop.__new__(cls)
         loop.loop_h = libuv.uv_default_loop()
-
-        loop._handles = []  # temporary list of handle_t pointers
-        loop._ffi_walk_cb = ffi.callback('void (*)(uv_handle_t *handle, void *arg)', loop._walk_cb)
         return loop
 
     @property
@@ -79,9 +244,8 @@ class Loop:
         :return: list of specific pyuv_cffi Handle objects (Poll, Signal, etc.)
         :rtype: list[Handle]
         """
-        libuv.uv_walk(self.loop_h, self._ffi_walk_cb, ffi.NULL)
-        handles = self._handles
-        self._handles = []  # don't keep references to handles alive in this list
+        handles = []
+        libuv.uv_walk(self.loop_h, _walk_cb, ffi.new_handle(handles))
         return handles
 
     def run(self, mode=UV_RUN_DEFAULT):
@@ -90,20 +254,15 @@ class Loop:
     def stop(self):
         libuv.uv_stop(self.loop_h)
 
+    def close(self):
+        """Release the resources of the loop
 
-def default_close_cb(uv_handle_t, handle):
-    """Remove extra reference to the Handle object when closed
-
-    This is the default handle-close callback that gets called if a callback is not supplied.
-
-    :param uv_handle_t: pointer to the underlying uv_handle_t
-    :type: uv_handle_t: cdata
-    :param handle: Handle object that owns this callback
-    :type handle: Handle
-    """
-    alive.remove(handle)  # now safe to free resources
-    handle._ffi_cb = None
-    handle._ffi_close_cb = None
+        All handles must have been closed, and the loop run until their close callbacks have been
+        called.
+        """
+        err = libuv.uv_loop_close(self.loop_h)
+        if err < 0:
+            raise Exception('uv_loop_close() failed: {}'.format(error_name(err)))
 
 
 class Handle:
@@ -113,8 +272,8 @@ class Handle:
         """
         # uv_handle_t
         self.uv_handle = libuv.cast_handle(handle)
-        self._ffi_cb = None
-        self._ffi_close_cb = None
+        self._callback = None
+        self._close_callback = None
         self._close_called = False
 
         # store a reference to `self` in the underlying `uv_handle_t.data`
@@ -122,7 +281,9 @@ class Handle:
         self.uv_handle.data = self_h
         self.__self_h = self_h  # keep the cdata object alive as long as `self` is alive
 
-        alive.append(self)  # store a reference to self in the global scope
+        # store a reference to self in the global scope
+        alive.add(self)
+        _alive_counts[type(self)] += 1
 
     def __repr__(self):
         cls = '{}.{}'.format(self.__module__, self.__class__.__name__)
@@ -168,18 +329,8 @@ class Handle:
         if self._close_called:
             return
 
-        if callback:
-            def cb_wrapper(uv_handle_t):
-                callback(self)
-
-                alive.remove(self)  # now safe to free resources
-                self._ffi_cb = None
-                self._ffi_close_cb = None
-        else:
-            cb_wrapper = functools.partial(default_close_cb, handle=self)
-
-        self._ffi_close_cb = ffi.callback('void (*)(uv_handle_t *)', cb_wrapper)
-        libuv.uv_close(self.uv_handle, self._ffi_close_cb)
+        self._close_callback = callback
+        libuv.uv_close(self.uv_handle, _close_cb)
 
         self._close_called = True
 
@@ -199,12 +350,8 @@ class Idle(Handle):
 
         :type callback: Callable(idle_handle: Idle)
         """
-
-        def cb_wrapper(idle_h):
-            callback(self)
-
-        self._ffi_cb = ffi.callback('void (*)(uv_idle_t *)', cb_wrapper)
-        libuv.uv_idle_start(self.handle, self._ffi_cb)
+        self._callback = callback
+        libuv.uv_idle_start(self.handle, _idle_cb)
 
     def stop(self):
         libuv.uv_idle_stop(self.handle)
@@ -224,12 +371,8 @@ class Prepare(Handle):
         """
         :type callback: Callable(prepare_handle: Prepare)
         """
-
-        def cb_wrapper(prepare_h):
-            callback(self)
-
-        self._ffi_cb = ffi.callback('void (*)(uv_prepare_t *)', cb_wrapper)
-        libuv.uv_prepare_start(self.handle, self._ffi_cb)
+        self._callback = callback
+        libuv.uv_prepare_start(self.handle, _prepare_cb)
 
     def stop(self):
         libuv.uv_prepare_stop(self.handle)
@@ -249,12 +392,8 @@ class Check(Handle):
         """
         :type callback: Callable(check_handle: check)
         """
-
-        def cb_wrapper(check_h):
-            callback(self)
-
-        self._ffi_cb = ffi.callback('void (*)(uv_check_t *)', cb_wrapper)
-        libuv.uv_check_start(self.handle, self._ffi_cb)
+        self._callback = callback
+        libuv.uv_check_start(self.handle, _check_cb)
 
     def stop(self):
         libuv.uv_check_stop(self.handle)
@@ -292,11 +431,8 @@ class Timer(Handle):
         timeout = int(timeout * 1000)
         repeat = int(repeat * 1000)
 
-        def cb_wrapper(timer_h):
-            callback(self)
-
-        self._ffi_cb = ffi.callback('void (*)(uv_timer_t *)', cb_wrapper)
-        libuv.uv_timer_start(self.handle, self._ffi_cb, timeout, repeat)
+        self._callback = callback
+        libuv.uv_timer_start(self.handle, _timer_cb, timeout, repeat)
 
     def stop(self):
         libuv.uv_timer_stop(self.handle)
@@ -320,13 +456,8 @@ class Signal(Handle):
         :type callback: Callable(sig_handle: Signal, sig_num: int)
         :type sig_num: int
         """
-
-        def cb_wrapper(uv_signal_t, signum):
-            callback(self, signum)
-
-        ffi_cb = ffi.callback('void (*)(uv_signal_t *, int)', cb_wrapper)
-        self._ffi_cb = ffi_cb  # keep the FFI cdata object alive as long as this instance is alive
-        libuv.uv_signal_start(self.handle, ffi_cb, sig_num)
+        self._callback = callback
+        libuv.uv_signal_start(self.handle, _signal_cb, sig_num)
 
     def stop(self):
         libuv.uv_signal_stop(self.handle)
@@ -344,28 +475,386 @@ class Poll(Handle):
         libuv.uv_poll_init(loop.loop_h, self.handle, fd)
         super().__init__(self.handle)
 
-        self._stop_called = False
+        self._events = 0
+        self._stop_called = True
 
     def start(self, events, callback):
         """Start the poll listener
 
+        The poll handle may be started again (with a different event mask) at any time while it
+        is not closed, whether or not it was stopped in between. Starting an active handle with
+        the same events and callback is a no-op.
+
         :param events: UV_READABLE | UV_WRITEABLE
         :param callback: Callable(poll_handle: Poll, status: int, events: int)
         """
+        if not self._stop_called and events == self._events and callback == self._callback:
+            return
 
-        def cb_wrapper(uv_poll_t, status, events):
-            callback(self, status, events)
-
-        self._ffi_cb = ffi.callback('void (*)(uv_poll_t *, int, int)', cb_wrapper)
-        libuv.uv_poll_start(self.handle, events, self._ffi_cb)
+        self._callback = callback
+        libuv.uv_poll_start(self.handle, events, _poll_cb)
+        self._events = events
+        self._stop_called = False
 
     def stop(self):
         if self._stop_called:
             return
 
         err = libuv.uv_poll_stop(self.handle)
-        self._ffi_cb = None
         if err < 0:
             raise Exception('uv_poll_stop() failed: {}'.format(err))
 
         self._stop_called = True
+
+
+class Async(Handle):
+    def __init__(self, loop, callback):
+        """
+        :type loop: Loop
+        :param callback: callback called in the loop's thread after :meth:`send` was called
+        :type callback: Callable(async_handle: Async)
+        """
+        self.loop = loop
+        self.handle = ffi.new('uv_async_t *')
+        libuv.uv_async_init(loop.loop_h, self.handle, _async_cb)
+        super().__init__(self.handle)
+
+        self._callback = callback
+
+    def send(self):
+        """Wake up the loop and call the callback in the loop's thread
+
+        This is the only method which is safe to call from any thread. Multiple calls before the
+        callback is called may be coalesced into one call of the callback.
+        """
+        err = libuv.uv_async_send(self.handle)
+        if err < 0:
+            raise Exception('uv_async_send() failed: {}'.format(err))
+
+
+class Request:
+    """Request, run in libuv's thread pool
+
+    When the request completes, its callback is called in the loop's thread with the request as
+    argument. :attr:`error` is 0 if the request succeeded (and :attr:`result` is its result), or a
+    negative libuv error code otherwise (see :func:`strerror` and :func:`error_name`).
+    """
+
+    def __init__(self, loop, ctype, callback):
+        """
+        :type loop: Loop
+        :param str ctype: C type of the underlying request, such as 'uv_fs_t *'
+        :type callback: Callable(request: Request)
+        """
+        self.loop = loop
+        self.req = ffi.new(ctype)
+        self._self_h = ffi.new_handle(self)
+        self.req.data = self._self_h
+        self._callback = callback
+
+        self.result = None
+        self.error = 0
+
+    def _submit(self, name, err):
+        """Keep the request alive until it completes
+
+        :param str name: name of the libuv function which was called
+        :param int err: return value of the libuv function
+        """
+        if err < 0:
+            raise Exception('{}() failed: {}'.format(name, error_name(err)))
+
+        pending_requests.add(self)
+
+    def _finish(self, error, result):
+        self.error = error
+        self.result = result
+        pending_requests.discard(self)
+
+        callback = self._callback
+        self._callback = None
+        callback(self)
+
+
+class FSRequest(Request):
+    """Filesystem request, created by the `fs_*()` functions
+
+    :attr:`error` is `-errno` if the request failed.
+    """
+
+    def __init__(self, loop, callback, convert=None, buf=None):
+        """
+        :type loop: Loop
+        :type callback: Callable(request: FSRequest)
+        :param convert: function which converts the result of a successful request
+        :type convert: Callable(request: FSRequest, result: int) or None
+        :param cdata buf: buffer used by the request
+        """
+        super().__init__(loop, 'uv_fs_t *', callback)
+        self._convert = convert
+        self._buf = buf
+
+    def _complete(self):
+        result = self.req.result
+        error = 0
+        if result < 0:
+            error = result
+            result = None
+        elif self._convert:
+            result = self._convert(self, result)
+
+        libuv.uv_fs_req_cleanup(self.req)
+        if self._convert is _read_result:
+            _release_buffer(self._buf)
+        self._buf = None
+
+        self._finish(error, result)
+
+
+def _get_buffer(length):
+    """Return a buffer of at least `length` bytes for reading
+
+    Large buffers are allocated with :data:`_BUFFER_ALIGNMENT` bytes of padding; use
+    :func:`_buffer_data` to get the page-aligned start of their data.
+    """
+    if length < _MIN_REUSED_BUFFER_SIZE:
+        return _alloc_buffer('char[]', length)
+
+    size = 1 << (length - 1).bit_length()
+    free = _free_buffers[size]
+    if free:
+        return free.pop()
+    return _alloc_buffer('char[]', size + _BUFFER_ALIGNMENT)
+
+
+def _buffer_data(buf):
+    """Return a pointer to the data of a buffer from :func:`_get_buffer`
+
+    The pointer doesn't keep the buffer alive.
+    """
+    if len(buf) < _MIN_REUSED_BUFFER_SIZE:
+        return buf
+    return buf + (-int(ffi.cast('uintptr_t', buf)) % _BUFFER_ALIGNMENT)
+
+
+def _release_buffer(buf):
+    """Return a buffer from :func:`_get_buffer` which is no longer in use
+    """
+    free = _free_buffers.get(len(buf) - _BUFFER_ALIGNMENT)
+    if free is not None and len(free) < MAX_FREE_BUFFERS:
+        free.append(buf)
+
+
+def _make_buf(buf, length):
+    bufs = ffi.new('uv_buf_t[1]')
+    bufs[0].base = buf
+    bufs[0].len = length
+    return bufs
+
+
+def _read_result(request, result):
+    return ffi.buffer(_buffer_data(request._buf), result)[:]
+
+
+def _stat_result(request, result):
+    st = request.req.statbuf
+    times = [ts.tv_sec + ts.tv_nsec * 1e-9 for ts in (st.st_atim, st.st_mtim, st.st_ctim)]
+    return os.stat_result((st.st_mode, st.st_ino, st.st_dev, st.st_nlink, st.st_uid, st.st_gid,
+                           st.st_size, st.st_atim.tv_sec, st.st_mtim.tv_sec, st.st_ctim.tv_sec,
+                           times[0], times[1], times[2]))
+
+
+def fs_open(loop, path, flags, mode, callback):
+    """Open a file; the result is the file descriptor
+
+    :type loop: Loop
+    :type path: str or bytes
+    :param int flags: flags, as for :func:`os.open`
+    :param int mode: permissions of a new file
+    :type callback: Callable(request: FSRequest)
+    :rtype: FSRequest
+    """
+    request = FSRequest(loop, callback)
+    err = libuv.uv_fs_open(loop.loop_h, request.req, os.fsencode(path), flags, mode, _fs_cb)
+    request._submit('uv_fs_open', err)
+    return request
+
+
+def fs_close(loop, fd, callback):
+    """Close a file descriptor
+
+    :type loop: Loop
+    :type fd: int
+    :type callback: Callable(request: FSRequest)
+    :rtype: FSRequest
+    """
+    request = FSRequest(loop, callback)
+    request._submit('uv_fs_close', libuv.uv_fs_close(loop.loop_h, request.req, fd, _fs_cb))
+    return request
+
+
+def fs_read(loop, fd, length, offset, callback):
+    """Read up to `length` bytes from a file; the result is the data read
+
+    :type loop: Loop
+    :type fd: int
+    :type length: int
+    :param int offset: offset in the file, or -1 to read from the current position
+    :type callback: Callable(request: FSRequest)
+    :rtype: FSRequest
+    """
+    buf = _get_buffer(length)
+    request = FSRequest(loop, callback, _read_result, buf)
+    err = libuv.uv_fs_read(loop.loop_h, request.req, fd, _make_buf(_buffer_data(buf), length), 1,
+                           offset, _fs_cb)
+    request._submit('uv_fs_read', err)
+    return request
+
+
+def fs_write(loop, fd, data, offset, callback):
+    """Write data to a file; the result is the number of bytes written
+
+    :type loop: Loop
+    :type fd: int
+    :param data: data to write (copied before this function returns)
+    :type data: bytes or bytearray or memoryview
+    :param int offset: offset in the file, or -1 to write at the current position
+    :type callback: Callable(request: FSRequest)
+    :rtype: FSRequest
+    """
+    data = bytes(data)
+    buf = ffi.new('char[]', data)
+    request = FSRequest(loop, callback, buf=buf)
+    err = libuv.uv_fs_write(loop.loop_h, request.req, fd, _make_buf(buf, len(data)), 1, offset,
+                            _fs_cb)
+    request._submit('uv_fs_write', err)
+    return request
+
+
+def fs_stat(loop, path, callback):
+    """Get the status of a file; the result is an :class:`os.stat_result`
+
+    :type loop: Loop
+    :type path: str or bytes
+    :type callback: Callable(request: FSRequest)
+    :rtype: FSRequest
+    """
+    request = FSRequest(loop, callback, _stat_result)
+    err = libuv.uv_fs_stat(loop.loop_h, request.req, os.fsencode(path), _fs_cb)
+    request._submit('uv_fs_stat', err)
+    return request
+
+
+def fs_fstat(loop, fd, callback):
+    """Get the status of a file descriptor; the result is an :class:`os.stat_result`
+
+    :type loop: Loop
+    :type fd: int
+    :type callback: Callable(request: FSRequest)
+    :rtype: FSRequest
+    """
+    request = FSRequest(loop, callback, _stat_result)
+    request._submit('uv_fs_fstat', libuv.uv_fs_fstat(loop.loop_h, request.req, fd, _fs_cb))
+    return request
+
+
+def _sockaddr_tuple(addr):
+    """Convert a `struct sockaddr *` to an address tuple, as used by the socket module
+
+    :return: (host, port) for IPv4, (host, port, flowinfo, scope_id) for IPv6, or None for other
+        address families
+    """
+    buf = ffi.new('char[64]')
+    family = addr.sa_family
+    if family == socket.AF_INET:
+        sin = ffi.cast('struct sockaddr_in *', addr)
+        libuv.uv_ip4_name(sin, buf, len(buf))
+        return ffi.string(buf).decode(), socket.ntohs(sin.sin_port)
+    elif family == socket.AF_INET6:
+        sin6 = ffi.cast('struct sockaddr_in6 *', addr)
+        libuv.uv_ip6_name(sin6, buf, len(buf))
+        return (ffi.string(buf).decode(), socket.ntohs(sin6.sin6_port),
+                socket.ntohl(sin6.sin6_flowinfo), sin6.sin6_scope_id)
+
+
+def _addrinfo_list(ai):
+    """Convert a list of `struct addrinfo` to a list as returned by :func:`socket.getaddrinfo`
+    """
+    result = []
+    while ai != ffi.NULL:
+        sockaddr = _sockaddr_tuple(ai.ai_addr)
+        if sockaddr is not None:
+            canonname = ffi.string(ai.ai_canonname).decode() if ai.ai_canonname != ffi.NULL else ''
+            result.append((ai.ai_family, ai.ai_socktype, ai.ai_protocol, canonname, sockaddr))
+        ai = ai.ai_next
+
+    return result
+
+
+def getaddrinfo(loop, host, port, family=0, socktype=0, proto=0, flags=0, callback=None):
+    """Translate a host and port into socket addresses, like :func:`socket.getaddrinfo`
+
+    The result of the request is a list of (family, socktype, proto, canonname, sockaddr) tuples,
+    as returned by :func:`socket.getaddrinfo`. On failure, :attr:`Request.error` is a libuv error
+    code such as `UV_EAI_NONAME` (:func:`error_name` returns 'EAI_NONAME').
+
+    :type loop: Loop
+    :type host: str or bytes or None
+    :type port: str or int or None
+    :type callback: Callable(request: Request)
+    :rtype: Request
+    """
+    if isinstance(host, str):
+        host = host.encode('idna')
+    if isinstance(port, int):
+        port = str(port)
+    if isinstance(port, str):
+        port = port.encode()
+
+    hints = ffi.new('struct addrinfo *')
+    hints.ai_family = family
+    hints.ai_socktype = socktype
+    hints.ai_protocol = proto
+    hints.ai_flags = flags
+
+    request = Request(loop, 'uv_getaddrinfo_t *', callback)
+    err = libuv.uv_getaddrinfo(loop.loop_h, request.req, _getaddrinfo_cb,
+                               ffi.NULL if host is None else host,
+                               ffi.NULL if port is None else port, hints)
+    request._submit('uv_getaddrinfo', err)
+    return request
+
+
+def getnameinfo(loop, sockaddr, flags, callback):
+    """Translate a socket address into a host and port, like :func:`socket.getnameinfo`
+
+    The result of the request is a (host, port) tuple of strings.
+
+    :type loop: Loop
+    :param tuple sockaddr: (host, port) or (host, port, flowinfo, scope_id), where host is a
+        numeric IPv4 or IPv6 address
+    :param int flags: NI_* flags
+    :type callback: Callable(request: Request)
+    :rtype: Request
+    :raise ValueError: if the host is not a numeric address
+    """
+    host, port = sockaddr[:2]
+    host = host.encode() if isinstance(host, str) else host
+
+    sin = ffi.new('struct sockaddr_in *')
+    sin6 = ffi.new('struct sockaddr_in6 *')
+    if libuv.uv_ip4_addr(host, port, sin) == 0:
+        addr = ffi.cast('struct sockaddr *', sin)
+    elif libuv.uv_ip6_addr(host, port, sin6) == 0:
+        if len(sockaddr) > 2:
+            sin6.sin6_flowinfo = socket.htonl(sockaddr[2])
+        if len(sockaddr) > 3:
+            sin6.sin6_scope_id = sockaddr[3]
+        addr = ffi.cast('struct sockaddr *', sin6)
+    else:
+        raise ValueError('{!r} is not a numeric IP address'.format(sockaddr[0]))
+
+    request = Request(loop, 'uv_getnameinfo_t *', callback)
+    err = libuv.uv_getnameinfo(loop.loop_h, request.req, _getnameinfo_cb, addr, flags)
+    request._submit('uv_getnameinfo', err)
+    return request
@@ -0,0 +1,44 @@
+"""Build script for the out-of-line pyuv_cffi extension module
+
+This module is used by setup.py (via `cffi_modules`) to compile `pyuv_cffi._pyuv_cffi` when guv is
+installed. To build the extension in place during development, run::
+
+    python pyuv_cffi/build.py
+
+If the extension is not built, pyuv_cffi falls back to compiling the bindings with `ffi.verify()`
+when it is imported.
+"""
+import os
+
+import cffi
+
+thisdir = os.path.dirname(os.path.realpath(__file__))
+
+#: static callbacks implemented in Python with `ffi.def_extern()`; see pyuv_cffi/__init__.py
+extern_python = '''
+extern "Python" void _walk_cb(uv_handle_t *, void *);
+extern "Python" void _close_cb(uv_handle_t *);
+extern "Python" void _idle_cb(uv_idle_t *);
+extern "Python" void _prepare_cb(uv_prepare_t *);
+extern "Python" void _check_cb(uv_check_t *);
+extern "Python" void _timer_cb(uv_timer_t *);
+extern "Python" void _signal_cb(uv_signal_t *, int);
+extern "Python" void _poll_cb(uv_poll_t *, int, int);
+extern "Python" void _async_cb(uv_async_t *);
+extern "Python" void _fs_cb(uv_fs_t *);
+extern "Python" void _getaddrinfo_cb(uv_getaddrinfo_t *, int, struct addrinfo *);
+extern "Python" void _getnameinfo_cb(uv_getnameinfo_t *, int, const char *, const char *);
+'''
+
+
+def read(filename):
+    with open(os.path.join(thisdir, filename)) as f:
+        return f.read()
+
+
+ffibuilder = cffi.FFI()
+ffibuilder.cdef(read('pyuv_cffi_cdef.c') + extern_python)
+ffibuilder.set_source('pyuv_cffi._pyuv_cffi', read('pyuv_cffi.c'), libraries=['uv'])
+
+if __name__ == '__main__':
+    ffibuilder.compile(tmpdir=os.path.dirname(thisdir), verbose=True)
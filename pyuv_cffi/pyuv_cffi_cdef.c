@@ -12,12 +12,13 @@ enum uv_poll_event {
 // handle structs and types
 struct uv_loop_s {...;};
 struct uv_handle_s {void *data; ...;};
-struct uv_idle_s {...;};
-struct uv_prepare_s {...;};
-struct uv_timer_s {...;};
-struct uv_signal_s {...;};
-struct uv_poll_s {...;};
-struct uv_check_s {...;};
+struct uv_idle_s {void *data; ...;};
+struct uv_prepare_s {void *data; ...;};
+struct uv_timer_s {void *data; ...;};
+struct uv_signal_s {void *data; ...;};
+struct uv_poll_s {void *data; ...;};
+struct uv_check_s {void *data; ...;};
+struct uv_async_s {void *data; ...;};
 
 typedef struct uv_loop_s uv_loop_t;
 typedef struct uv_handle_s uv_handle_t;
@@ -27,6 +28,72 @@ typedef struct uv_timer_s uv_timer_t;
 typedef struct uv_signal_s uv_signal_t;
 typedef struct uv_poll_s uv_poll_t;
 typedef struct uv_check_s uv_check_t;
+typedef struct uv_async_s uv_async_t;
+
+// request structs and types
+typedef int uv_file;
+
+typedef struct {
+    char *base;
+    size_t len;
+    ...;
+} uv_buf_t;
+
+typedef struct {
+    long tv_sec;
+    long tv_nsec;
+} uv_timespec_t;
+
+typedef struct {
+    uint64_t st_dev;
+    uint64_t st_mode;
+    uint64_t st_nlink;
+    uint64_t st_uid;
+    uint64_t st_gid;
+    uint64_t st_rdev;
+    uint64_t st_ino;
+    uint64_t st_size;
+    uint64_t st_blksize;
+    uint64_t st_blocks;
+    uint64_t st_flags;
+    uint64_t st_gen;
+    uv_timespec_t st_atim;
+    uv_timespec_t st_mtim;
+    uv_timespec_t st_ctim;
+    uv_timespec_t st_birthtim;
+} uv_stat_t;
+
+struct uv_fs_s {void *data; ssize_t result; uv_stat_t statbuf; ...;};
+typedef struct uv_fs_s uv_fs_t;
+
+typedef unsigned short sa_family_t;
+typedef unsigned int socklen_t;
+
+struct sockaddr {sa_family_t sa_family; ...;};
+struct sockaddr_in {sa_family_t sin_family; uint16_t sin_port; ...;};
+struct sockaddr_in6 {
+    sa_family_t sin6_family;
+    uint16_t sin6_port;
+    uint32_t sin6_flowinfo;
+    uint32_t sin6_scope_id;
+    ...;
+};
+struct addrinfo {
+    int ai_flags;
+    int ai_family;
+    int ai_socktype;
+    int ai_protocol;
+    socklen_t ai_addrlen;
+    struct sockaddr *ai_addr;
+    char *ai_canonname;
+    struct addrinfo *ai_next;
+    ...;
+};
+
+struct uv_getaddrinfo_s {void *data; ...;};
+struct uv_getnameinfo_s {void *data; ...;};
+typedef struct uv_getaddrinfo_s uv_getaddrinfo_t;
+typedef struct uv_getnameinfo_s uv_getnameinfo_t;
 
 typedef void (*uv_walk_cb)(uv_handle_t *handle, void *arg);
 typedef void (*uv_close_cb)(uv_handle_t *handle);
@@ -36,15 +103,25 @@ typedef void (*uv_poll_cb)(uv_poll_t *handle, int status, int events);
 typedef void (*uv_timer_cb)(uv_timer_t *handle);
 typedef void (*uv_signal_cb)(uv_signal_t *handle, int signum);
 typedef void (*uv_check_cb)(uv_check_t* handle);
+typedef void (*uv_async_cb)(uv_async_t* handle);
+typedef void (*uv_fs_cb)(uv_fs_t* req);
+typedef void (*uv_getaddrinfo_cb)(uv_getaddrinfo_t* req, int status, struct addrinfo* res);
+typedef void (*uv_getnameinfo_cb)(uv_getnameinfo_t* req, int status, const char* hostname,
+                                  const char* service);
 
 // loop functions
 uv_loop_t *uv_default_loop();
 int uv_loop_init(uv_loop_t* loop);
+int uv_loop_close(uv_loop_t* loop);
 int uv_loop_alive(const uv_loop_t *loop);
 int uv_run(uv_loop_t *, uv_run_mode mode);
 void uv_stop(uv_loop_t *);
 void uv_walk(uv_loop_t *loop, uv_walk_cb walk_cb, void *arg);
 
+// error functions
+const char *uv_strerror(int err);
+const char *uv_err_name(int err);
+
 // handle functions
 // uv_handle_t is the base type for all libuv handle types.
 uv_handle_t *cast_handle(void *handle);
@@ -103,3 +180,40 @@ int uv_signal_stop(uv_signal_t *handle);
 int uv_poll_init(uv_loop_t *loop, uv_poll_t *handle, int fd);
 int uv_poll_start(uv_poll_t *handle, int events, uv_poll_cb cb);
 int uv_poll_stop(uv_poll_t *handle);
+
+// async functions
+// Async handles allow the user to "wakeup" the event loop and get a callback called from another
+// thread. uv_async_send() is the only libuv function which is safe to call from another thread.
+// Calls to uv_async_send() may be coalesced: the callback is called at least once after a call.
+int uv_async_init(uv_loop_t *, uv_async_t *async, uv_async_cb async_cb);
+int uv_async_send(uv_async_t *async);
+
+// filesystem functions
+// Filesystem operations run in libuv's thread pool; the callback is called in the loop's thread when
+// the operation completes. `req->result` is the result of the operation, or a negative error code.
+// uv_fs_req_cleanup() must be called when the request is done to free memory allocated by libuv.
+void uv_fs_req_cleanup(uv_fs_t *req);
+int uv_fs_open(uv_loop_t *loop, uv_fs_t *req, const char *path, int flags, int mode, uv_fs_cb cb);
+int uv_fs_close(uv_loop_t *loop, uv_fs_t *req, uv_file file, uv_fs_cb cb);
+int uv_fs_read(uv_loop_t *loop, uv_fs_t *req, uv_file file, const uv_buf_t bufs[],
+               unsigned int nbufs, int64_t offset, uv_fs_cb cb);
+int uv_fs_write(uv_loop_t *loop, uv_fs_t *req, uv_file file, const uv_buf_t bufs[],
+                unsigned int nbufs, int64_t offset, uv_fs_cb cb);
+int uv_fs_stat(uv_loop_t *loop, uv_fs_t *req, const char *path, uv_fs_cb cb);
+int uv_fs_fstat(uv_loop_t *loop, uv_fs_t *req, uv_file file, uv_fs_cb cb);
+
+// DNS functions
+// Like filesystem operations, lookups run in libuv's thread pool (using the system resolver, so
+// nsswitch.conf and /etc/hosts are honoured). The addrinfo list passed to the uv_getaddrinfo()
+// callback must be freed with uv_freeaddrinfo().
+int uv_getaddrinfo(uv_loop_t *loop, uv_getaddrinfo_t *req, uv_getaddrinfo_cb getaddrinfo_cb,
+                   const char *node, const char *service, const struct addrinfo *hints);
+void uv_freeaddrinfo(struct addrinfo *ai);
+int uv_getnameinfo(uv_loop_t *loop, uv_getnameinfo_t *req, uv_getnameinfo_cb getnameinfo_cb,
+                   const struct sockaddr *addr, int flags);
+
+// address conversion functions
+int uv_ip4_addr(const char *ip, int port, struct sockaddr_in *addr);
+int uv_ip6_addr(const char *ip, int port, struct sockaddr_in6 *addr);
+int uv_ip4_name(const struct sockaddr_in *src, char *dst, size_t size);
+int uv_ip6_name(const struct sockaddr_in6 *src, char *dst, size_t size);
@@ -34,11 +34,13 @@ setup(
     author='V G',
     author_email='veegee@veegee.org',
     url='http://guv.readthedocs.org',
-    install_requires=['greenlet>=0.4.0', 'cffi>=0.8.0', 'dnspython3>=1.12.0'],
+    setup_requires=['cffi>=1.4.0'],
+    install_requires=['greenlet>=0.4.0', 'cffi>=1.4.0', 'dnspython3>=1.12.0'],
     zip_safe=False,
     long_description=open(path.join(path.dirname(__file__), 'README.rst')).read(),
     tests_require=['pytest>=2.6'],
     classifiers=classifiers,
     packages=find_packages(exclude=['ez_setup']),
-    package_data={'pyuv_cffi': ['*.c']}
+    package_data={'pyuv_cffi': ['*.c']},
+    cffi_modules=['pyuv_cffi/build.py:ffibuilder']
 )
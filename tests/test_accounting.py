@@ -0,0 +1,108 @@
+import gc
+import time
+
+import greenlet
+
+from guv import GreenPool, spawn, spawn_n, sleep, gyield, kill
+from guv.hubs import get_hub
+from guv.util.accounting import CPUAccounting
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def hog():
+    for _ in range(4):
+        busy(0.02)
+        sleep(0)
+
+
+def light():
+    for _ in range(4):
+        sleep(0)
+
+
+def forever():
+    sleep(100)
+
+
+class TestCPUAccounting:
+    def test_top(self):
+        with CPUAccounting() as accounting:
+            hogs = [spawn(hog) for _ in range(2)]
+            lights = [spawn(light) for _ in range(2)]
+            gyield()
+            top = accounting.top()
+            for gt in hogs + lights:
+                gt.wait()
+
+        rows = [row for row in top if row['entry'].startswith(('hog (', 'light ('))]
+        assert {row['greenlet'] for row in rows[:2]} == set(hogs)
+        assert rows[0]['cpu'] >= 0.015
+        assert rows[0]['switches'] >= 1
+        assert rows[0]['last_run'] <= time.perf_counter()
+
+        # finished greenlets are only kept per entry point
+        assert not [row for row in accounting.top() if row['greenlet'] in hogs]
+
+    def test_entry_points(self):
+        pool = GreenPool()
+        with CPUAccounting() as accounting:
+            for _ in range(2):
+                pool.spawn_n(hog)
+            pool.spawn(light)
+            spawn_n(light)
+            gt = spawn(forever)
+            pool.waitall()
+            gyield()
+            stats = {s['entry'].split(' ')[0]: s for s in accounting.entry_point_stats()}
+        gt.kill()
+
+        assert accounting.entry_point_stats()[0]['entry'].startswith('hog (')
+        assert stats['hog']['greenlets'] == 2
+        assert stats['hog']['running'] == 0
+        assert stats['hog']['cpu'] >= 0.15
+        assert stats['hog']['switches'] >= 8
+        assert stats['light']['greenlets'] == 2
+        assert stats['forever']['running'] == 1
+        assert stats['<hub>']['switches'] > 0
+
+    def test_hub_poll_time(self):
+        with CPUAccounting() as accounting:
+            sleep(0.2)
+
+        hub = get_hub()
+        row, = [row for row in accounting.top() if row['greenlet'] is hub]
+        assert row['cpu'] < 0.1
+
+    def test_stop(self):
+        accounting = CPUAccounting()
+        accounting.start()
+        accounting.stop()
+        assert greenlet.gettrace() is None
+
+        # greenlets which finish while accounting is stopped are kept in the totals
+        accounting.start()
+        g = spawn_n(forever)
+        sleep(0.01)
+        accounting.stop()
+        row, = [row for row in accounting.top() if row['greenlet'] is g]
+        assert row['entry'].startswith('forever (')
+
+        kill(g)
+        del g, row
+        gc.collect()
+        assert not [row for row in accounting.top() if row['entry'].startswith('forever (')]
+        stats, = [s for s in accounting.entry_point_stats() if s['entry'].startswith('forever (')]
+        assert stats['greenlets'] == 1
+        assert stats['running'] == 0
+
+    def test_format_top(self):
+        with CPUAccounting() as accounting:
+            spawn(hog).wait()
+        out = accounting.format_top(5)
+        assert 'CPU (s)' in out
+        assert 'hog (' in out
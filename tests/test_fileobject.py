@@ -0,0 +1,41 @@
+import os
+
+from guv import spawn, gyield
+from guv.fileobject import fdopen, FileObject
+
+
+class TestFileObject:
+    def test_pipe(self):
+        r, w = os.pipe()
+        data = os.urandom(1024 * 1024)
+
+        def write():
+            with fdopen(w, 'wb') as f:
+                f.write(data)
+
+        gt = spawn(write)
+        with fdopen(r, 'rb') as f:
+            assert f.read() == data
+        gt.wait()
+
+    def test_lines(self):
+        r, w = os.pipe()
+        reader = fdopen(r, 'r')
+        writer = fdopen(w, 'w', buffering=1)
+
+        gt = spawn(list, reader)
+        writer.write('first\n')
+        writer.write('second\n')
+        writer.close()
+        assert gt.wait() == ['first\n', 'second\n']
+        reader.close()
+
+    def test_close_wakes_reader(self):
+        r, w = os.pipe()
+        f = FileObject(r, 'rb')
+        gt = spawn(f.read, 10)
+        gyield()
+
+        f.close()
+        assert gt.wait() == b''
+        os.close(w)
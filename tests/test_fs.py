@@ -0,0 +1,149 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from guv import spawn, sleep
+from guv import fs
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('file'))
+
+
+class TestFunctions:
+    def test_pwrite_pread(self, path):
+        fd = os.open(path, os.O_CREAT | os.O_RDWR)
+        try:
+            assert fs.pwrite(fd, b'hello world', 0) == 11
+            assert fs.pread(fd, 5, 6) == b'world'
+            assert fs.fstat(fd).st_size == 11
+        finally:
+            os.close(fd)
+
+    def test_stat(self, path):
+        with open(path, 'w') as f:
+            f.write('data')
+
+        st = fs.stat(path)
+        assert st.st_size == 4
+        assert st.st_mode == os.stat(path).st_mode
+
+    def test_error(self, path):
+        with pytest.raises(FileNotFoundError):
+            fs.stat(path)
+
+    def test_error_thread_pool(self, path, monkeypatch, capsys):
+        # errors are raised to the caller only, without being printed by the hub
+        monkeypatch.setattr(fs, 'pyuv_cffi', None)
+        with pytest.raises(FileNotFoundError):
+            fs.stat(path)
+        with pytest.raises(FileNotFoundError):
+            fs.open(path, 'rb')
+
+        assert 'Traceback' not in capsys.readouterr().err
+
+    def test_without_libuv(self, path):
+        # operations run in tpool if pyuv_cffi can't be imported
+        code = '\n'.join([
+            "import sys",
+            "sys.modules['pyuv_cffi'] = None",
+            "from guv import fs",
+            "with fs.open(sys.argv[1], 'w') as f:",
+            "    f.write('data')",
+            "print(fs.stat(sys.argv[1]).st_size)",
+        ])
+        env = {k: v for k, v in os.environ.items() if k != 'GUV_HUB'}
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        result = subprocess.run([sys.executable, '-c', code, path], env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        assert b'Traceback' not in result.stderr
+        assert result.stdout.split() == [b'4']
+
+
+class TestOpen:
+    def test_binary(self, path):
+        with fs.open(path, 'wb') as f:
+            f.write(b'hello ')
+            f.write(b'world')
+
+        with fs.open(path, 'rb') as f:
+            assert f.read() == b'hello world'
+
+    def test_text(self, path):
+        with fs.open(path, 'w', encoding='utf-8') as f:
+            f.write('line 1\nline 2 é\n')
+
+        with fs.open(path, encoding='utf-8') as f:
+            assert list(f) == ['line 1\n', 'line 2 é\n']
+
+    def test_append(self, path):
+        with fs.open(path, 'wb') as f:
+            f.write(b'a')
+        with fs.open(path, 'ab') as f:
+            f.write(b'b')
+            assert f.tell() == 2
+
+        with fs.open(path, 'rb') as f:
+            assert f.read() == b'ab'
+
+    def test_seek(self, path):
+        with fs.open(path, 'w+b', buffering=0) as f:
+            f.write(b'0123456789')
+            assert f.seek(-3, os.SEEK_END) == 7
+            assert f.read(2) == b'78'
+            f.seek(2)
+            f.write(b'xx')
+            f.seek(0)
+            assert f.read() == b'01xx456789'
+
+    def test_invalid_mode(self, path):
+        with pytest.raises(ValueError):
+            fs.open(path, 'rw')
+
+    @pytest.mark.parametrize('readahead', [0, True, 5000])
+    def test_sequential_read(self, path, readahead):
+        data = os.urandom(1024 * 1024 + 123)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        chunks = []
+        with fs.open(path, 'rb', buffering=0, readahead=readahead) as f:
+            while True:
+                chunk = f.read(10000)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+
+        assert b''.join(chunks) == data
+
+    def test_readahead_seek(self, path):
+        with open(path, 'wb') as f:
+            f.write(bytes(range(256)) * 1000)
+
+        with fs.open(path, 'rb', buffering=0, readahead=True) as f:
+            assert f.read(10) == bytes(range(10))
+            f.seek(1000)
+            assert f.read(10) == bytes(range(1000 % 256, 1000 % 256 + 10))
+
+    def test_hub_not_blocked(self, path):
+        with open(path, 'wb') as f:
+            f.write(os.urandom(4 * 1024 * 1024))
+
+        ticks = []
+
+        def tick():
+            for _ in range(3):
+                ticks.append(time.monotonic())
+                sleep(0)
+
+        gt = spawn(tick)
+        with fs.open(path, 'rb') as f:
+            f.read()
+        gt.wait()
+
+        # the ticker ran while the file was read
+        assert len(ticks) == 3
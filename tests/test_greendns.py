@@ -0,0 +1,298 @@
+import socket
+import struct
+import time
+
+import pytest
+
+from guv import gyield, spawn, sleep, Timeout
+from guv.event import Event
+from guv.green import socket as green_socket
+
+greendns = pytest.importorskip('guv.support.greendns')
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rrset
+
+
+def make_answer(ttl, *addresses):
+    answer = greendns.FakeAnswer()
+    answer.expiration = time.time() + ttl
+    for address in addresses:
+        record = greendns.FakeRecord()
+        record.address = address
+        answer.append(record)
+    return answer
+
+
+class Queries(list):
+    """Names queried, and the function called to answer the queries
+    """
+    answer = None
+
+
+class FakeDNSServer:
+    """DNS server answering queries for A records over UDP and TCP on localhost
+
+    - nx.*: NXDOMAIN
+    - big.*: truncated over UDP, answered over TCP
+    - drop.*: the first UDP query is not answered
+    - silent.*: UDP queries are not answered
+    - anything else: one A record
+    """
+
+    def __init__(self):
+        self.udp = green_socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.bind(('127.0.0.1', 0))
+        self.port = self.udp.getsockname()[1]
+        self.tcp = green_socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.tcp.bind(('127.0.0.1', self.port))
+        self.tcp.listen(16)
+
+        #: names queried over UDP
+        self.queries = []
+
+        #: addresses of the UDP clients
+        self.clients = set()
+
+        self.greenlets = [spawn(self._serve_udp), spawn(self._serve_tcp)]
+
+    def close(self):
+        for g in self.greenlets:
+            g.kill()
+        self.udp.close()
+        self.tcp.close()
+
+    def respond(self, wire, tcp=False):
+        query = dns.message.from_wire(wire)
+        qname = query.question[0].name
+        name = qname.to_text()
+        response = dns.message.make_response(query)
+        if name.startswith('nx.'):
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        elif name.startswith('big.') and not tcp:
+            response.flags |= dns.flags.TC
+        elif name.startswith('silent.') or (name.startswith('drop.') and
+                                            self.queries.count(name) == 1):
+            return None
+        else:
+            response.answer.append(dns.rrset.from_text(qname, 300, 'IN', 'A', '10.0.0.1'))
+
+        return response.to_wire()
+
+    def _serve_udp(self):
+        while True:
+            wire, addr = self.udp.recvfrom(65535)
+            self.clients.add(addr)
+            self.queries.append(dns.message.from_wire(wire).question[0].name.to_text())
+            response = self.respond(wire)
+            if response is not None:
+                self.udp.sendto(response, addr)
+
+    def _serve_tcp(self):
+        while True:
+            conn, addr = self.tcp.accept()
+            with conn:
+                length = struct.unpack('!H', conn.recv(2))[0]
+                response = self.respond(conn.recv(length), tcp=True)
+                conn.sendall(struct.pack('!H', len(response)) + response)
+
+
+@pytest.fixture
+def dns_server(monkeypatch):
+    server = FakeDNSServer()
+    r = greendns.resolver.get_resolver()
+    monkeypatch.setattr(r, 'nameservers', ['127.0.0.1'])
+    monkeypatch.setattr(r, 'port', server.port)
+    monkeypatch.setattr(r, 'timeout', 0.1)
+    monkeypatch.setattr(greendns, 'cache', greendns.DNSCache())
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Replace queries to nameservers with calls to the function set with `queries.answer`
+
+    :return: list of the names queried
+    """
+    names = Queries()
+
+    def query(name):
+        names.append(name)
+        sleep(0.01)
+        return names.answer(name)
+
+    monkeypatch.setattr(greendns, 'cache', greendns.DNSCache())
+    monkeypatch.setattr(greendns.resolver, 'query', query)
+    return names
+
+
+class TestCache:
+    def test_hit(self, queries):
+        queries.answer = lambda name: make_answer(60, '10.0.0.1')
+
+        assert greendns.gethostbyname('example.com') == '10.0.0.1'
+        assert greendns.gethostbyname('EXAMPLE.com') == '10.0.0.1'
+        assert queries == ['example.com']
+
+        stats = greendns.cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['size'] == 1
+
+    def test_ttl_expires(self, queries):
+        queries.answer = lambda name: make_answer(0.05, '10.0.0.1')
+
+        greendns.resolve('example.com')
+        greendns.resolve('example.com')
+        assert len(queries) == 1
+
+        sleep(0.06)
+        greendns.resolve('example.com')
+        assert len(queries) == 2
+
+    def test_negative(self, queries):
+        def answer(name):
+            raise greendns.dns.resolver.NXDOMAIN()
+
+        queries.answer = answer
+
+        for _ in range(3):
+            with pytest.raises(socket.gaierror) as exc_info:
+                greendns.resolve('nonexistent.invalid')
+            assert exc_info.value.errno == socket.EAI_NODATA
+
+        assert len(queries) == 1
+        assert greendns.cache.stats()['negative_hits'] == 2
+
+    def test_failure_expires(self, queries, monkeypatch):
+        def answer(name):
+            raise greendns.dns.exception.Timeout()
+
+        queries.answer = answer
+        monkeypatch.setattr(greendns, 'DNS_FAILURE_TTL', 0.05)
+
+        for _ in range(2):
+            with pytest.raises(socket.gaierror) as exc_info:
+                greendns.resolve('example.com')
+            assert exc_info.value.errno == socket.EAI_AGAIN
+        assert len(queries) == 1
+
+        sleep(0.06)
+        with pytest.raises(socket.gaierror):
+            greendns.resolve('example.com')
+        assert len(queries) == 2
+
+    def test_coalesced(self, queries):
+        queries.answer = lambda name: make_answer(60, '10.0.0.1')
+
+        gts = [spawn(greendns.gethostbyname, 'example.com') for _ in range(10)]
+        assert [gt.wait() for gt in gts] == ['10.0.0.1'] * 10
+        assert queries == ['example.com']
+        assert greendns.cache.stats()['coalesced'] == 9
+
+    def test_interrupted_query_wakes_waiters(self, queries):
+        release = Event()
+
+        def answer(name):
+            release.wait()
+            return make_answer(60, '10.0.0.1')
+
+        queries.answer = answer
+
+        first = spawn(greendns.resolve, 'example.com')
+        while not queries:
+            gyield()
+        second = spawn(greendns.resolve, 'example.com')
+        while not greendns.cache.coalesced:
+            gyield()
+        first.kill()
+
+        with pytest.raises(socket.gaierror):
+            second.wait()
+
+        # the next lookup makes a new query
+        release.send()
+        assert greendns.gethostbyname('example.com') == '10.0.0.1'
+        assert len(queries) == 2
+
+    def test_lru_eviction(self, queries):
+        queries.answer = lambda name: make_answer(60, '10.0.0.1')
+        greendns.cache.maxsize = 2
+
+        for name in ['a.example', 'b.example', 'a.example', 'c.example']:
+            greendns.resolve(name)
+
+        assert len(greendns.cache) == 2
+        assert greendns.cache.get('a.example') is not None
+        assert greendns.cache.get('b.example') is None
+
+
+class TestResolveMany:
+    def test_resolve_many(self, dns_server, monkeypatch):
+        # enough time for the server to answer all queries without retries
+        monkeypatch.setattr(greendns.resolver.get_resolver(), 'timeout', 5.0)
+        monkeypatch.setattr(greendns, 'DNS_BULK_WINDOW', 16)
+
+        names = ['host{}.example.com'.format(i) for i in range(100)]
+        results = dict(greendns.resolve_many(names))
+
+        assert sorted(results) == sorted(names)
+        assert all(rrset[0].address == '10.0.0.1' for rrset in results.values())
+        # one query per name, over a few sockets
+        assert len(dns_server.queries) == len(names)
+        assert len(dns_server.clients) == greendns.DNS_BULK_SOCKETS
+
+    def test_errors(self, dns_server):
+        results = list(greendns.resolve_many(['silent.example.com', 'nx.example.com',
+                                              'host.example.com']))
+
+        # answers are yielded as they arrive
+        assert [name for name, _ in results] == ['nx.example.com', 'host.example.com',
+                                                 'silent.example.com']
+        assert results[0][1].errno == socket.EAI_NODATA
+        assert results[1][1][0].address == '10.0.0.1'
+        assert isinstance(results[2][1], socket.gaierror)
+        assert results[2][1].errno == socket.EAI_AGAIN
+        assert dns_server.queries.count('silent.example.com.') == greendns.DNS_BULK_RETRIES + 1
+
+    def test_invalid_name(self, dns_server):
+        results = dict(greendns.resolve_many(['a' * 70 + '.example.com', 'host.example.com']))
+        assert isinstance(results['a' * 70 + '.example.com'], socket.gaierror)
+        assert results['a' * 70 + '.example.com'].errno == socket.EAI_NODATA
+        assert results['host.example.com'][0].address == '10.0.0.1'
+
+    def test_socket_greenlet_died(self, dns_server, monkeypatch):
+        def fail(*args):
+            raise RuntimeError('receive failed')
+
+        monkeypatch.setattr(greendns._BulkResolver, '_receive', fail)
+        with Timeout(5):
+            results = dict(greendns.resolve_many(['a.example.com', 'b.example.com']))
+        assert all(isinstance(error, socket.gaierror) for error in results.values())
+        assert sorted(results) == ['a.example.com', 'b.example.com']
+
+    def test_retry(self, dns_server):
+        results = dict(greendns.resolve_many(['drop.example.com']))
+        assert results['drop.example.com'][0].address == '10.0.0.1'
+        assert dns_server.queries.count('drop.example.com.') == 2
+
+    def test_truncated(self, dns_server):
+        results = dict(greendns.resolve_many(['big.example.com']))
+        assert results['big.example.com'][0].address == '10.0.0.1'
+
+    def test_cached(self, dns_server):
+        results = list(greendns.resolve_many(['a.example.com', 'A.example.com', 'nx.example.com']))
+        assert [name for name, _ in results] == ['a.example.com', 'nx.example.com']
+
+        # answered from the cache, including the error
+        results = dict(greendns.resolve_many(['a.example.com', 'nx.example.com']))
+        assert results['a.example.com'][0].address == '10.0.0.1'
+        assert isinstance(results['nx.example.com'], socket.gaierror)
+        assert len(dns_server.queries) == 2
+
+        assert greendns.gethostbyname('a.example.com') == '10.0.0.1'
+        assert len(dns_server.queries) == 2
@@ -0,0 +1,544 @@
+import errno
+import os
+from socket import timeout as socket_timeout
+import threading
+import time
+
+import greenlet
+import pytest
+
+from guv import spawn, gyield, sleep, trampoline, Timeout
+from guv.const import READ, WRITE
+from guv.exceptions import IOClosed
+from guv.greenio import socketpair, socket
+from guv.hubs import get_hub
+from guv.hubs import epoll
+
+try:
+    from guv.hubs import pyuv_cffi
+except ImportError:
+    pyuv_cffi = None
+
+try:
+    from guv.hubs import uring
+except ImportError:
+    uring = None
+
+
+def requires_hub(module):
+    return pytest.mark.skipif(module is None or not isinstance(get_hub(), module.Hub),
+                              reason='requires the {} hub'.format(getattr(module, '__name__', '')))
+
+
+@requires_hub(pyuv_cffi)
+class TestPersistentPollers:
+    def test_poller_reused(self):
+        hub = get_hub()
+        a, b = socketpair()
+
+        def echo():
+            for _ in range(3):
+                b.sendall(b.recv(1))
+
+        gt = spawn(echo)
+        poll_handles = set()
+        for _ in range(3):
+            a.sendall(b'x')
+            assert a.recv(1) == b'x'
+            poll_handles.add(id(hub.pollers[a.fileno()]))
+
+        gt.wait()
+        assert len(poll_handles) == 1
+
+        a.close()
+        b.close()
+
+    def test_poller_closed_with_socket(self):
+        hub = get_hub()
+        a, b = socketpair()
+
+        def send():
+            b.sendall(b'x')
+
+        spawn(send)
+        a.recv(1)
+        fd = a.fileno()
+        assert fd in hub.pollers
+
+        a.close()
+        assert fd not in hub.pollers
+        b.close()
+
+    def test_close_wakes_waiter(self):
+        a, b = socketpair()
+
+        def recv():
+            with pytest.raises(IOClosed):
+                a.recv(1)
+
+        gt = spawn(recv)
+        gyield()
+        a.close()
+        gt.wait()
+        b.close()
+
+
+def test_duplex():
+    """A reader and a writer greenlet can wait on the same socket at the same time
+    """
+    a, b = socketpair()
+    data = b'x' * 1024 * 1024
+    received = []
+
+    def read():
+        received.append(a.recv(1))
+
+    reader = spawn(read)
+    writer = spawn(a.sendall, data)
+    gyield()
+
+    hub = get_hub()
+    if not hub.completion_io:
+        assert hub.listeners[READ][a.fileno()].greenlet is reader
+        assert hub.listeners[WRITE][a.fileno()].greenlet is writer
+
+    if pyuv_cffi is not None and isinstance(hub, pyuv_cffi.Hub):
+        # both events are watched with one poll handle
+        poll_h = hub.pollers[a.fileno()]
+        assert poll_h.active
+        assert poll_h._events == READ | WRITE
+
+    b.sendall(b'y')
+    reader.wait()
+    assert received == [b'y']
+
+    n = 0
+    while n < len(data):
+        n += len(b.recv(65536))
+
+    writer.wait()
+    a.close()
+    b.close()
+
+
+def test_wait_already_ready():
+    """Waiting on a file descriptor which is still ready returns immediately
+    """
+    a, b = socketpair()
+    fd = a.fileno()
+    b.sendall(b'xy')
+    trampoline(fd, READ, timeout=1)
+    assert a.recv(1) == b'x'
+
+    # one byte is left unread
+    start = time.monotonic()
+    trampoline(fd, READ, timeout=1)
+    assert time.monotonic() - start < 0.5
+    assert a.recv(1) == b'y'
+
+    a.close()
+    b.close()
+
+
+class TestTimerHeap:
+    def test_timers_fire_in_order(self):
+        hub = get_hub()
+        fired = []
+        for seconds in [0.03, 0.01, 0.02]:
+            hub.schedule_call_global(seconds, fired.append, seconds)
+
+        sleep(0.05)
+        assert fired == [0.01, 0.02, 0.03]
+
+    def test_cancelled_timer_not_fired(self):
+        hub = get_hub()
+        fired = []
+        t1 = hub.schedule_call_global(0.01, fired.append, 1)
+        hub.schedule_call_global(0.02, fired.append, 2)
+        t1.cancel()
+        assert not t1.pending
+
+        sleep(0.03)
+        assert fired == [2]
+
+    def test_cancel_all_clears_heap(self):
+        hub = get_hub()
+        timers = [hub.schedule_call_global(60, lambda: None) for _ in range(100)]
+        for t in timers:
+            t.cancel()
+
+        assert not hub.timers
+
+    @requires_hub(pyuv_cffi)
+    def test_cancel_all_stops_timer_handle(self):
+        hub = get_hub()
+        timers = [hub.schedule_call_global(60, lambda: None) for _ in range(100)]
+        assert hub.timer_h.active
+
+        for t in timers:
+            t.cancel()
+
+        assert not hub.timer_h.active
+
+
+class TestCallbacks:
+    @pytest.fixture
+    def hub(self):
+        hub = get_hub()
+        budget = hub.callback_budget
+        hub.callback_budget = 10
+        yield hub
+        hub.callback_budget = budget
+
+    def test_kwargs(self, hub):
+        fired = []
+        hub.schedule_call_now(lambda *args, **kwargs: fired.append((args, kwargs)), 1, x=2)
+        gyield()
+        assert fired == [((1,), {'x': 2})]
+
+    def test_budget_defers_callbacks(self, hub):
+        deferred = hub.callbacks_deferred
+        fired = []
+        for i in range(25):
+            hub.schedule_call_now(fired.append, i)
+
+        gyield()
+        assert fired == list(range(25))
+        assert hub.callbacks_deferred > deferred
+
+    def test_io_not_starved(self, hub):
+        a, b = socketpair()
+        order = []
+
+        def recv():
+            a.recv(1)
+            order.append('io')
+
+        def schedule():
+            b.send(b'x')
+            for i in range(100):
+                hub.schedule_call_now(order.append, i)
+
+        gt = spawn(recv)
+        gyield()
+        # make the socket readable and schedule the callbacks in the same loop iteration
+        hub.schedule_call_global(0, schedule)
+
+        gt.wait()
+        assert order.index('io') < 50
+
+        a.close()
+        b.close()
+
+
+class TestScheduleCallThreadsafe:
+    def test_call_from_thread(self):
+        hub = get_hub()
+        current = greenlet.getcurrent()
+
+        hub.ref_threadsafe()
+        try:
+            thread = threading.Thread(target=hub.schedule_call_threadsafe,
+                                      args=(current.switch, 'done'))
+            thread.start()
+            assert hub.switch() == 'done'
+        finally:
+            hub.unref_threadsafe()
+
+        thread.join()
+
+    def test_batched_calls(self):
+        hub = get_hub()
+        current = greenlet.getcurrent()
+        results = []
+        n = 1000
+
+        def put():
+            for i in range(n):
+                hub.schedule_call_threadsafe(results.append, i)
+            hub.schedule_call_threadsafe(current.switch)
+
+        hub.ref_threadsafe()
+        try:
+            thread = threading.Thread(target=put)
+            thread.start()
+            hub.switch()
+        finally:
+            hub.unref_threadsafe()
+
+        thread.join()
+        assert results == list(range(n))
+
+    def test_wakes_up_waiting_hub(self):
+        """A call from another thread wakes up the hub while it is waiting for a timer
+        """
+        hub = get_hub()
+        current = greenlet.getcurrent()
+        timer = hub.schedule_call_global(10, current.throw, AssertionError('not woken up'))
+
+        def call():
+            time.sleep(0.05)
+            hub.schedule_call_threadsafe(current.switch, 'done')
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        try:
+            assert hub.switch() == 'done'
+        finally:
+            timer.cancel()
+
+        thread.join()
+
+
+class TestMetrics:
+    def test_loop_lag(self):
+        hub = get_hub()
+        count = hub.metrics.loop_lag.count
+
+        def block():
+            time.sleep(0.05)
+
+        # the timer of sleep() fires late, since the loop is blocked
+        spawn(block)
+        sleep(0.01)
+        lag = hub.metrics.snapshot()['loop_lag']
+        assert lag['count'] > count
+        assert lag['max'] >= 0.03
+        assert sum(n for _, n in lag['buckets']) == lag['count']
+
+    def test_poll_and_busy_time(self):
+        hub = get_hub()
+        sleep(0)
+        before = hub.metrics.snapshot()
+        sleep(0.05)
+        spawn(time.sleep, 0.05)
+        sleep(0.01)
+        after = hub.metrics.snapshot()
+
+        assert after['iterations'] > before['iterations']
+        assert after['poll_time'] - before['poll_time'] >= 0.04
+        assert after['busy_time'] - before['busy_time'] >= 0.05
+        assert after['max_busy_time'] >= 0.05
+        assert 0 < after['poll_ratio'] < 1
+
+    def test_gauges(self):
+        hub = get_hub()
+        a, b = socketpair()
+        gt = spawn(b.recv, 1)
+        timer = hub.schedule_call_global(10, lambda: None)
+        gyield()
+
+        snapshot = hub.metrics.snapshot()
+        assert snapshot['listeners'] >= 1
+        assert snapshot['poll_handles'] >= 1
+        assert snapshot['timers'] >= 1
+        assert snapshot['switches'] > 0
+        assert snapshot['switches_per_second'] > 0
+
+        a.send(b'x')
+        gt.wait()
+        timer.cancel()
+        a.close()
+        b.close()
+
+    def test_format_hub_listeners(self):
+        from guv.util import debug
+
+        a, b = socketpair()
+        gt = spawn(b.recv, 1)
+        gyield()
+        assert ', {})'.format(b.fileno()) in debug.format_hub_listeners()
+        assert debug.format_hub_timers().startswith('TIMERS:')
+
+        a.send(b'x')
+        gt.wait()
+        a.close()
+        b.close()
+
+
+class TestHubPerThread:
+    def run_in_thread(self, func):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def test_own_loop(self):
+        """Each thread has its own hub, with its own loop
+        """
+        def hub_loop():
+            hub = get_hub()
+            sleep(0.01)
+            loop = getattr(hub, 'loop', None)
+            hub.close()
+            return hub, loop
+
+        hub, loop = self.run_in_thread(hub_loop)
+        assert hub is not get_hub()
+        if loop is not None:
+            assert loop is not get_hub().loop
+
+    def test_close(self):
+        """A hub suspended in the middle of its loop is closed, abandoning the waiting greenlets
+        """
+        def serve():
+            hub = get_hub()
+            a, b = socketpair()
+            spawn(sleep, 10)
+            spawn(b.recv, 1)
+            a.send(b'x')
+            sleep(0.01)
+            hub.close()
+            a.close()
+            b.close()
+            return hub.dead
+
+        assert self.run_in_thread(serve)
+
+        # the hub of this thread is unaffected
+        sleep(0.01)
+
+
+@requires_hub(epoll)
+class TestEpollHub:
+    def test_registration_kept(self):
+        hub = get_hub()
+        a, b = socketpair()
+
+        def echo():
+            for _ in range(3):
+                b.sendall(b.recv(1))
+
+        gt = spawn(echo)
+        for _ in range(3):
+            a.sendall(b'x')
+            assert a.recv(1) == b'x'
+            assert a.fileno() in hub.registered
+
+        gt.wait()
+
+        fd = a.fileno()
+        a.close()
+        assert fd not in hub.registered
+        b.close()
+
+    def test_fd_reused_without_notify(self):
+        """A file descriptor closed and reused without notifying the hub can be waited on
+        """
+        r, w = os.pipe()
+        with pytest.raises(Timeout):
+            trampoline(r, READ, timeout=0.01)
+        os.close(r)
+        os.close(w)
+
+        r2, w2 = os.pipe()
+        try:
+            if r2 != r:
+                pytest.skip('the file descriptor was not reused')
+
+            spawn(os.write, w2, b'x')
+            trampoline(r2, READ, timeout=1)
+            assert os.read(r2, 1) == b'x'
+        finally:
+            os.close(r2)
+            os.close(w2)
+
+
+@requires_hub(uring)
+class TestUringHub:
+    def test_recv_into_completion(self):
+        hub = get_hub()
+        a, b = socketpair()
+
+        def send():
+            b.sendall(b'hello')
+
+        gt = spawn(send)
+        buf = bytearray(16)
+        assert hub.recv_into(a.fileno(), buf) == 5
+        assert buf[:5] == b'hello'
+
+        gt.wait()
+        assert not hub.pending
+        a.close()
+        b.close()
+
+    def test_recv_timeout(self):
+        a, b = socketpair()
+        a.settimeout(0.01)
+        with pytest.raises(socket_timeout):
+            a.recv(1)
+
+        assert not get_hub().pending
+        a.close()
+        b.close()
+
+    def test_accept(self):
+        server = socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+
+        def connect():
+            client = socket()
+            client.connect(server.getsockname())
+            client.sendall(b'x')
+            client.close()
+
+        gt = spawn(connect)
+        conn, addr = server.accept()
+        assert addr[0] == '127.0.0.1'
+        assert conn.recv(1) == b'x'
+
+        gt.wait()
+        conn.close()
+        server.close()
+
+    def test_close_cancels_operation(self):
+        a, b = socketpair()
+
+        def recv():
+            with pytest.raises(IOClosed):
+                a.recv(1)
+
+        gt = spawn(recv)
+        gyield()
+        a.close()
+        gt.wait()
+        assert not get_hub().pending
+        b.close()
+
+    def test_full_submission_queue_busy(self, monkeypatch):
+        """Entries prepared while the submission queue is full are not lost if the kernel asks for
+        completions to be reaped first
+        """
+        ring = uring.Ring(2)
+        try:
+            ring.prep(uring.IORING_OP_NOP, -1, user_data=1)
+            ring.enter(True)
+            ring.prep(uring.IORING_OP_NOP, -1, user_data=2)
+            ring.prep(uring.IORING_OP_NOP, -1, user_data=3)
+
+            enter = ring._enter
+            calls = []
+
+            def busy_once(*args):
+                calls.append(args)
+                if len(calls) == 1:
+                    raise OSError(errno.EBUSY, 'busy')
+                return enter(*args)
+
+            monkeypatch.setattr(ring, '_enter', busy_once)
+            ring.prep(uring.IORING_OP_NOP, -1, user_data=4)
+            assert len(calls) == 2
+            assert ring.backlog == [(1, 0)]
+
+            ring.enter()
+            completions = []
+            while len(completions) < 4:
+                ring.enter(True, 1)
+                completions += ring.reap()
+            assert completions == [(1, 0), (2, 0), (3, 0), (4, 0)]
+            assert not ring.backlog
+        finally:
+            ring.close()
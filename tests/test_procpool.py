@@ -0,0 +1,156 @@
+import os
+import time
+
+import pytest
+
+from guv import spawn, sleep
+from guv.procpool import ProcessPool, WorkerDied
+
+
+def square(x):
+    return x * x
+
+
+def add(x, y=0):
+    return x + y
+
+
+def fail(x):
+    raise ValueError(x)
+
+
+def busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+    return os.getpid()
+
+
+def sleep_then_return(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def exit_later(seconds):
+    # close the pipes to the parent process, which then waits for the exit of this process
+    os.closerange(3, 1024)
+    time.sleep(seconds)
+    os._exit(0)
+
+
+@pytest.fixture
+def pool():
+    pool = ProcessPool(2)
+    yield pool
+    pool.terminate()
+
+
+class TestProcessPool:
+    def test_execute(self, pool):
+        assert pool.execute(add, 1, y=2) == 3
+
+    def test_runs_in_other_process(self, pool):
+        assert pool.execute(os.getpid) != os.getpid()
+
+    def test_exception(self, pool):
+        with pytest.raises(ValueError):
+            pool.execute(fail, 'fail')
+
+    def test_unpicklable_task(self, pool):
+        with pytest.raises(Exception):
+            pool.execute(lambda: None)
+
+        # the pool is still usable
+        assert pool.execute(square, 3) == 9
+
+    def test_map_bulk(self, pool):
+        n = 1000
+        assert pool.map(square, range(n)) == [x * x for x in range(n)]
+
+        stats = pool.stats()
+        assert stats['completed'] == n
+        assert stats['outstanding'] == 0
+        # tasks submitted together are sent in a few batches, not one write per task
+        assert stats['batches_sent'] <= pool.size * 2
+
+    def test_imap_unordered_streams(self, pool):
+        # results are yielded as they complete, not when all tasks have completed
+        start = time.monotonic()
+        it = pool.imap_unordered(sleep_then_return, [0.5, 0.01])
+        assert next(it) == 0.01
+        assert time.monotonic() - start < 0.4
+        assert next(it) == 0.5
+
+    def test_result_not_held_back(self):
+        # the result of a quick task is sent back before a slow task queued after it completes
+        pool = ProcessPool(1)
+        try:
+            start = time.monotonic()
+            fast = pool.submit(square, 3)
+            slow = pool.submit(sleep_then_return, 0.5)
+            assert fast.wait() == 9
+            assert time.monotonic() - start < 0.4
+            assert slow.wait() == 0.5
+        finally:
+            pool.terminate()
+
+    def test_uses_all_workers(self, pool):
+        pids = set(pool.map(busy, [0.05] * 4))
+        assert len(pids) == 2
+
+    def test_hub_not_blocked(self, pool):
+        ticks = []
+
+        def tick():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                sleep(0.01)
+
+        gt = spawn(tick)
+        pool.execute(busy, 0.1)
+        gt.wait()
+
+        assert len(ticks) == 5
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.05
+
+    def test_worker_died(self, pool):
+        with pytest.raises(WorkerDied):
+            pool.execute(os._exit, 1)
+
+    def test_all_workers_died(self):
+        pool = ProcessPool(1)
+        with pytest.raises(WorkerDied):
+            pool.execute(os._exit, 1)
+        with pytest.raises(WorkerDied):
+            pool.execute(square, 1)
+
+        assert pool.stats()['outstanding'] == 0
+        assert not pool._waiters
+        pool.terminate()
+
+    def test_close_hub_not_blocked(self):
+        ticks = []
+
+        def tick():
+            while True:
+                ticks.append(time.monotonic())
+                sleep(0.01)
+
+        pool = ProcessPool(1)
+        pool.submit(exit_later, 0.2)
+        gt = spawn(tick)
+        start = time.monotonic()
+        pool.close()
+        gt.kill()
+
+        assert time.monotonic() - start >= 0.15
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+
+    def test_close(self):
+        pool = ProcessPool(2)
+        events = [pool.submit(square, x) for x in range(10)]
+        pool.close()
+
+        assert [e.wait() for e in events] == [x * x for x in range(10)]
+        with pytest.raises(RuntimeError):
+            pool.execute(square, 1)
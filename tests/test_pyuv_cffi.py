@@ -0,0 +1,160 @@
+import errno
+import mmap
+import os
+import socket
+import threading
+
+import pytest
+
+pyuv_cffi = pytest.importorskip('pyuv_cffi')
+
+
+@pytest.fixture
+def loop():
+    return pyuv_cffi.Loop()
+
+
+class TestHandles:
+    def test_timer_callback(self, loop):
+        fired = []
+        timer_h = pyuv_cffi.Timer(loop)
+        timer_h.start(fired.append, 0, 0)
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        assert fired == [timer_h]
+
+        # restart with a different callback
+        fired2 = []
+        timer_h.start(fired2.append, 0, 0)
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        assert fired == [timer_h]
+        assert fired2 == [timer_h]
+
+        timer_h.close()
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+
+    def test_close_callback(self, loop):
+        closed = []
+        check_h = pyuv_cffi.Check(loop)
+        assert check_h in pyuv_cffi.alive
+
+        check_h.close(closed.append)
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        assert closed == [check_h]
+        assert check_h not in pyuv_cffi.alive
+
+    def test_loop_handles(self, loop):
+        idle_h = pyuv_cffi.Idle(loop)
+        prepare_h = pyuv_cffi.Prepare(loop)
+        assert set(loop.handles) == {idle_h, prepare_h}
+
+        idle_h.close()
+        prepare_h.close()
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        assert loop.handles == []
+
+    def test_alive_count(self, loop):
+        count = pyuv_cffi.alive_count()
+        timer_count = pyuv_cffi.alive_count(pyuv_cffi.Timer)
+
+        handles = [pyuv_cffi.Timer(loop) for _ in range(3)] + [pyuv_cffi.Idle(loop)]
+        assert pyuv_cffi.alive_count() == count + 4
+        assert pyuv_cffi.alive_count(pyuv_cffi.Timer) == timer_count + 3
+        assert pyuv_cffi.alive_count(pyuv_cffi.Handle) == count + 4
+
+        for handle in handles:
+            handle.close()
+
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        assert pyuv_cffi.alive_count() == count
+        assert pyuv_cffi.alive_count(pyuv_cffi.Timer) == timer_count
+
+    def test_async_send_from_thread(self, loop):
+        fired = []
+
+        def cb(async_h):
+            fired.append(async_h)
+            async_h.close()
+
+        async_h = pyuv_cffi.Async(loop, cb)
+        thread = threading.Thread(target=async_h.send)
+        thread.start()
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        thread.join()
+        assert fired == [async_h]
+
+
+class TestFSRequests:
+    def test_fs_requests(self, loop, tmpdir):
+        path = str(tmpdir.join('file'))
+        results = {}
+
+        def done(name):
+            return lambda req: results.__setitem__(name, (req.error, req.result))
+
+        pyuv_cffi.fs_open(loop, path, os.O_CREAT | os.O_RDWR, 0o644, done('open'))
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        error, fd = results['open']
+        assert error == 0
+
+        pyuv_cffi.fs_write(loop, fd, b'hello world', 0, done('write'))
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        pyuv_cffi.fs_read(loop, fd, 5, 6, done('read'))
+        pyuv_cffi.fs_fstat(loop, fd, done('fstat'))
+        pyuv_cffi.fs_stat(loop, path + '-missing', done('stat'))
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        pyuv_cffi.fs_close(loop, fd, done('close'))
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+
+        assert results['write'] == (0, 11)
+        assert results['read'] == (0, b'world')
+        assert results['fstat'][1].st_size == 11
+        assert results['fstat'][1].st_mtime == os.stat(path).st_mtime
+        assert results['stat'] == (-errno.ENOENT, None)
+        assert results['close'] == (0, 0)
+        assert not pyuv_cffi.pending_requests
+
+    def test_large_read_buffer(self, loop, tmpdir):
+        path = tmpdir.join('file')
+        data = os.urandom(256 * 1024)
+        path.write_binary(data)
+        results = []
+
+        fd = os.open(str(path), os.O_RDONLY)
+        try:
+            for _ in range(2):
+                pyuv_cffi.fs_read(loop, fd, len(data), 0, lambda req: results.append(req.result))
+                loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+        finally:
+            os.close(fd)
+
+        assert results == [data, data]
+        buf = pyuv_cffi._get_buffer(len(data))
+        data_ptr = pyuv_cffi._buffer_data(buf)
+        assert int(pyuv_cffi.ffi.cast('uintptr_t', data_ptr)) % mmap.PAGESIZE == 0
+        assert (pyuv_cffi.ffi.cast('char *', data_ptr) + len(data)
+                <= pyuv_cffi.ffi.cast('char *', buf) + len(buf))
+
+
+class TestDNSRequests:
+    def test_getaddrinfo(self, loop):
+        results = []
+        pyuv_cffi.getaddrinfo(loop, 'localhost', 80, socket.AF_INET, socket.SOCK_STREAM,
+                              callback=results.append)
+        pyuv_cffi.getaddrinfo(loop, 'nonexistent.invalid', None, callback=results.append)
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+
+        assert results[0].error == 0
+        assert results[0].result == [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '',
+                                      ('127.0.0.1', 80))]
+        assert pyuv_cffi.error_name(results[1].error) in ('EAI_NONAME', 'EAI_AGAIN')
+        assert results[1].result is None
+        assert not pyuv_cffi.pending_requests
+
+    def test_getnameinfo(self, loop):
+        results = []
+        pyuv_cffi.getnameinfo(loop, ('127.0.0.1', 22), socket.NI_NUMERICHOST, results.append)
+        loop.run(pyuv_cffi.UV_RUN_DEFAULT)
+
+        assert results[0].result == ('127.0.0.1', 'ssh')
+        with pytest.raises(ValueError):
+            pyuv_cffi.getnameinfo(loop, ('localhost', 22), 0, results.append)
@@ -0,0 +1,72 @@
+import io
+import pstats
+import time
+
+from guv import spawn, sleep
+from guv.util.sampling import SamplingProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def handler():
+    busy(0.2)
+
+
+class TestSamplingProfiler:
+    def profile(self):
+        with SamplingProfiler(hz=200) as profiler:
+            gts = [spawn(handler) for _ in range(2)]
+            for gt in gts:
+                gt.wait()
+            sleep(0.1)
+        return profiler
+
+    def test_samples(self):
+        profiler = self.profile()
+        assert profiler.samples > 20
+
+        # samples taken while the hub waits for I/O are idle
+        assert profiler.idle_samples > 0
+        busy_samples = sum(n for stack, n in profiler.stacks.items()
+                           if busy.__code__ in stack)
+        assert busy_samples > 0.5 * (profiler.samples - profiler.idle_samples)
+
+    def test_collapsed(self):
+        profiler = self.profile()
+        out = io.StringIO()
+        profiler.write_collapsed(out)
+        lines = out.getvalue().splitlines()
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+        frames = stack.split(';')
+        assert frames[0].startswith('main (')
+        assert frames[1].startswith('handler (')
+        assert frames[-1].startswith('busy (')
+
+    def test_greenlets(self):
+        profiler = self.profile()
+        greenlets = [(entry, n) for entry, n in profiler.greenlet_stats()
+                     if entry.startswith('handler (')]
+        assert len(greenlets) == 2
+
+        entry, n = profiler.entry_point_stats()[0]
+        assert entry.startswith('handler (')
+        assert n == sum(n for _, n in greenlets)
+
+    def test_pstats(self, tmpdir):
+        profiler = self.profile()
+        stats = pstats.Stats(profiler)
+        func = (busy.__code__.co_filename, busy.__code__.co_firstlineno, 'busy')
+        samples, _, tt, ct, callers = stats.stats[func]
+        assert tt == ct == samples * profiler.interval
+        assert [caller[2] for caller in callers] == ['handler']
+
+        path = str(tmpdir.join('guv.pstats'))
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(5)
+        assert 'busy' in out.getvalue()
@@ -0,0 +1,210 @@
+import os
+import socket
+import time
+
+import pytest
+
+from guv import spawn, gyield, sleep
+from guv.green import select, selectors
+from guv.hubs import get_hub
+
+needs_epoll = pytest.mark.skipif(not hasattr(select, 'epoll'), reason='epoll not available')
+
+
+@pytest.fixture
+def pipe():
+    r, w = os.pipe()
+    yield r, w
+    for fd in r, w:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def listener_count():
+    hub = get_hub()
+    return sum(len(bucket) for bucket in hub.listeners.values())
+
+
+class TestPoll:
+    def test_ready(self, pipe):
+        r, w = pipe
+        p = select.poll()
+        p.register(r, select.POLLIN)
+        p.register(w, select.POLLOUT)
+        assert p.poll(0) == [(w, select.POLLOUT)]
+
+        os.write(w, b'x')
+        assert sorted(p.poll()) == [(r, select.POLLIN), (w, select.POLLOUT)]
+
+    def test_wait(self, pipe):
+        r, w = pipe
+        p = select.poll()
+        p.register(r, select.POLLIN)
+
+        gt = spawn(p.poll)
+        gyield()
+        assert not gt.dead
+        # a single listener, for the file descriptor of the mirrored epoll object
+        assert listener_count() == 1
+
+        os.write(w, b'x')
+        assert gt.wait() == [(r, select.POLLIN)]
+        assert listener_count() == 0
+
+    def test_timeout(self, pipe):
+        r, w = pipe
+        p = select.poll()
+        p.register(r, select.POLLIN)
+
+        start = time.monotonic()
+        assert p.poll(50) == []
+        assert 0.04 < time.monotonic() - start < 1
+
+    def test_modify_unregister(self, pipe):
+        r, w = pipe
+        p = select.poll()
+        p.register(r, select.POLLIN)
+        p.modify(r, select.POLLIN | select.POLLPRI)
+        p.unregister(r)
+        with pytest.raises(KeyError):
+            p.unregister(r)
+
+        os.write(w, b'x')
+        assert p.poll(0) == []
+
+    def test_hangup(self, pipe):
+        r, w = pipe
+        p = select.poll()
+        p.register(r, select.POLLIN)
+
+        gt = spawn(p.poll)
+        gyield()
+        os.close(w)
+        assert gt.wait() == [(r, select.POLLHUP)]
+
+    def test_regular_file(self, tmpdir):
+        with open(str(tmpdir.join('file')), 'w') as f:
+            p = select.poll()
+            p.register(f, select.POLLOUT)
+            assert p.poll() == [(f.fileno(), select.POLLOUT)]
+
+
+@needs_epoll
+class TestEpoll:
+    def test_wait(self, pipe):
+        r, w = pipe
+        with select.epoll() as ep:
+            ep.register(r, select.EPOLLIN)
+
+            def write():
+                sleep(0.01)
+                os.write(w, b'x')
+
+            spawn(write)
+            assert ep.poll() == [(r, select.EPOLLIN)]
+            # level-triggered, like select.epoll
+            assert ep.poll(0) == [(r, select.EPOLLIN)]
+
+            os.read(r, 1)
+            assert ep.poll(0.01) == []
+
+        assert ep.closed
+        assert listener_count() == 0
+
+    def test_many_fds(self):
+        pairs = [socket.socketpair() for _ in range(50)]
+        try:
+            with select.epoll() as ep:
+                for a, b in pairs:
+                    ep.register(a.fileno(), select.EPOLLIN)
+
+                for i in range(0, 50, 7):
+                    gt = spawn(ep.poll)
+                    gyield()
+                    assert listener_count() == 1
+
+                    pairs[i][1].send(b'x')
+                    assert gt.wait() == [(pairs[i][0].fileno(), select.EPOLLIN)]
+                    pairs[i][0].recv(1)
+        finally:
+            for a, b in pairs:
+                a.close()
+                b.close()
+
+    def test_maxevents(self):
+        pairs = [socket.socketpair() for _ in range(3)]
+        try:
+            with select.epoll() as ep:
+                for a, b in pairs:
+                    ep.register(a.fileno(), select.EPOLLIN)
+                    b.send(b'x')
+                assert len(ep.poll(maxevents=2)) == 2
+        finally:
+            for a, b in pairs:
+                a.close()
+                b.close()
+
+
+class TestSelectors:
+    def test_default_selector(self):
+        a, b = socket.socketpair()
+        try:
+            with selectors.DefaultSelector() as sel:
+                sel.register(a, selectors.EVENT_READ, 'data')
+
+                def send():
+                    sleep(0.01)
+                    b.send(b'x')
+
+                spawn(send)
+                events = sel.select()
+                assert [(key.fileobj, key.data, mask) for key, mask in events] == \
+                    [(a, 'data', selectors.EVENT_READ)]
+        finally:
+            a.close()
+            b.close()
+
+    @pytest.mark.parametrize('name', ['SelectSelector', 'PollSelector', 'EpollSelector'])
+    def test_selectors(self, name):
+        if not hasattr(selectors, name):
+            pytest.skip('{} not available'.format(name))
+
+        a, b = socket.socketpair()
+        try:
+            with getattr(selectors, name)() as sel:
+                sel.register(a, selectors.EVENT_READ)
+                assert sel.select(0.01) == []
+
+                gt = spawn(sel.select)
+                gyield()
+                assert not gt.dead
+
+                b.send(b'x')
+                assert [key.fileobj for key, _ in gt.wait()] == [a]
+        finally:
+            a.close()
+            b.close()
+
+    def test_concurrent(self):
+        # selectors waiting in several greenlets don't block each other
+        pairs = [socket.socketpair() for _ in range(5)]
+        selectors_ = [selectors.DefaultSelector() for _ in pairs]
+        try:
+            for sel, (a, b) in zip(selectors_, pairs):
+                sel.register(a, selectors.EVENT_READ)
+
+            gts = [spawn(sel.select) for sel in selectors_]
+            gyield()
+            for a, b in reversed(pairs):
+                b.send(b'x')
+
+            assert [[key.fileobj for key, _ in gt.wait()] for gt in gts] == \
+                [[a] for a, b in pairs]
+        finally:
+            for sel in selectors_:
+                sel.close()
+            for a, b in pairs:
+                a.close()
+                b.close()
@@ -0,0 +1,55 @@
+import os
+import threading
+
+import pytest
+
+import guv
+from guv import spawn, StopServe
+
+
+def handle(sock, addr):
+    sock.recv(16)
+    sock.sendall(str(threading.get_ident()).encode())
+    sock.close()
+
+
+def request(addr):
+    sock = guv.connect(addr)
+    sock.sendall(b'hello')
+    ident = sock.recv(64)
+    sock.close()
+    return ident
+
+
+def thread_count():
+    return len(os.listdir('/proc/self/task'))
+
+
+class TestServeThreads:
+    def test_requires_reuse_port(self):
+        sock = guv.listen(('127.0.0.1', 0))
+        with pytest.raises(ValueError):
+            guv.serve_threads(sock, handle, threads=2)
+        sock.close()
+
+    def test_serve_threads(self):
+        sock = guv.listen(('127.0.0.1', 0), reuse_port=True)
+        addr = sock.getsockname()
+        initial_count = thread_count()
+        server = spawn(guv.serve_threads, sock, handle, threads=4)
+
+        # connections are distributed between the listening sockets of all threads
+        idents = set()
+        for _ in range(200):
+            idents.add(request(addr))
+            if len(idents) == 4:
+                break
+        assert len(idents) > 1
+        assert thread_count() == initial_count + 3
+
+        server.kill(StopServe())
+        server.wait()
+
+        # the other threads have exited
+        assert thread_count() == initial_count
+        sock.close()
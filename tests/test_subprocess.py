@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+
+import pytest
+
+from guv import spawn, sleep
+from guv.green import os as green_os
+from guv.green import subprocess
+from guv.hubs import get_hub
+
+
+def fork_child(delay, status=0):
+    pid = os.fork()
+    if pid == 0:
+        time.sleep(delay)
+        os._exit(status)
+    return pid
+
+
+class TestWaitpid:
+    def test_waitpid(self):
+        pid = fork_child(0.05, 3)
+        start = time.monotonic()
+        rpid, status = green_os.waitpid(pid, 0)
+        assert rpid == pid
+        assert os.WEXITSTATUS(status) == 3
+        assert time.monotonic() - start < 1
+
+    def test_already_exited(self):
+        pid = fork_child(0)
+        time.sleep(0.05)
+        assert green_os.waitpid(pid, 0) == (pid, 0)
+
+    def test_concurrent(self):
+        pids = [fork_child(0.01 * i, i) for i in range(10)]
+        gts = [spawn(green_os.waitpid, pid, 0) for pid in pids]
+        results = [gt.wait() for gt in gts]
+        assert [os.WEXITSTATUS(status) for _, status in results] == list(range(10))
+        assert not get_hub().child_watchers
+
+    def test_no_polling(self):
+        pid = fork_child(0.2)
+        gt = spawn(green_os.waitpid, pid, 0)
+        sleep(0.05)
+
+        # the waiting greenlet isn't woken up periodically
+        hub = get_hub()
+        assert not [t for t in getattr(hub, 'timers', []) if not t.called]
+        assert gt.wait() == (pid, 0)
+
+    def test_only_watched_children_reaped(self):
+        other = fork_child(0)
+        pid = fork_child(0.05)
+        assert green_os.waitpid(pid, 0) == (pid, 0)
+
+        # the other child process is left to be reaped by whoever owns it
+        time.sleep(0.05)
+        assert os.waitpid(other, os.WNOHANG) == (other, 0)
+
+    def test_any_child(self):
+        pid = fork_child(0.05, 1)
+        rpid, status = green_os.waitpid(-1, 0)
+        assert rpid == pid
+        assert os.WEXITSTATUS(status) == 1
+
+
+class TestPopen:
+    def test_wait(self):
+        p = subprocess.Popen([sys.executable, '-c', 'import sys; sys.exit(5)'])
+        assert p.wait() == 5
+        assert p.returncode == 5
+
+    def test_wait_timeout(self):
+        p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(10)'])
+        with pytest.raises(subprocess.TimeoutExpired):
+            p.wait(timeout=0.1)
+
+        p.kill()
+        assert p.wait() == -9
+
+    def test_wait_status_lost(self):
+        # the child process was reaped by someone else: its status is unknown, not a success
+        p = subprocess.Popen(['false'])
+        os.waitpid(p.pid, 0)
+        assert p.wait() == -1
+
+    def test_concurrent_wait(self):
+        procs = [subprocess.Popen(['true']) for _ in range(10)]
+        gts = [spawn(p.wait) for p in procs]
+        assert [gt.wait() for gt in gts] == [0] * 10
+
+    def test_communicate(self):
+        # more data than fits in the pipes in both directions
+        data = os.urandom(1024 * 1024)
+        p = subprocess.Popen(['cat'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        assert p.communicate(data) == (data, b'')
+        assert p.returncode == 0
+        assert p.stdout.closed and p.stderr.closed
+
+    def test_communicate_text(self):
+        p = subprocess.Popen([sys.executable, '-c', 'import sys; sys.stdout.write(sys.stdin.read()); '
+                              'sys.stderr.write("err\\r\\n")'],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+        assert p.communicate('hello\n') == ('hello\n', 'err\n')
+
+    def test_communicate_concurrent(self):
+        # the pipes of each process are served without blocking the other greenlets
+        procs = [subprocess.Popen(['sh', '-c', 'sleep 0.1; echo {}'.format(i)],
+                                  stdout=subprocess.PIPE) for i in range(10)]
+        start = time.monotonic()
+        gts = [spawn(p.communicate) for p in procs]
+        assert [gt.wait() for gt in gts] == [('{}\n'.format(i).encode(), None) for i in range(10)]
+        assert time.monotonic() - start < 1
+
+    def test_communicate_timeout(self):
+        p = subprocess.Popen(['sh', '-c', 'echo start; sleep 0.2; echo end'],
+                             stdout=subprocess.PIPE)
+        with pytest.raises(subprocess.TimeoutExpired):
+            p.communicate(timeout=0.05)
+
+        # the output read so far isn't lost
+        assert p.communicate() == (b'start\nend\n', None)
+
+    def test_iter_lines(self):
+        p = subprocess.Popen(['sh', '-c', 'echo first; sleep 0.1; echo second; printf last; '
+                              'echo err >&2'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        lines = p.iter_lines()
+
+        # lines are received as soon as they are written
+        assert next(lines) == b'first\n'
+        assert p.poll() is None
+
+        assert list(lines) == [b'second\n', b'last']
+        assert p.communicate() == (b'', b'err\n')
+        assert p.returncode == 0
+
+    def test_iter_lines_input(self):
+        p = subprocess.Popen(['cat'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             universal_newlines=True)
+        lines = list(p.iter_lines('a\r\nb\nc\r'))
+        assert lines == ['a\n', 'b\n', 'c\n']
+        assert p.wait() == 0
+
+    def test_check_output(self):
+        assert subprocess.check_output(['echo', 'hello']) == b'hello\n'
+        assert subprocess.call(['false']) == 1
@@ -80,10 +80,14 @@ class TestCondition:
                 print('items: {}'.format(len(items)))
             print('done consume()')
 
-        spawn(produce)
-        spawn(consume)
+        producer = spawn(produce)
+        consumer = spawn(consume)
 
+        # wait for both greenlets instead of abandoning the main greenlet with `gyield(False)`,
+        # which lets the hub exit and leaves it dead for the tests which follow
         print('switch to hub')
-        gyield(False)
+        producer.wait()
+        consumer.wait()
+        assert len(items) == 10
         print('done test')
 
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from guv import spawn, sleep, Timeout
+from guv import tpool
+
+
+@pytest.fixture
+def pool():
+    pool = tpool.ThreadPool(4)
+    yield pool
+    pool.killall()
+
+
+class TestThreadPool:
+    def test_execute(self, pool):
+        assert pool.execute(lambda x, y=0: x + y, 1, y=2) == 3
+
+    def test_runs_in_other_thread(self, pool):
+        assert pool.execute(threading.current_thread) is not threading.current_thread()
+
+    def test_exception(self, pool):
+        def fail():
+            raise ValueError('fail')
+
+        with pytest.raises(ValueError):
+            pool.execute(fail)
+
+    def test_hub_not_blocked(self, pool):
+        ticks = []
+
+        def tick():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                sleep(0.01)
+
+        gt = spawn(tick)
+        pool.execute(time.sleep, 0.1)
+        assert len(ticks) == 5
+        gt.wait()
+
+    def test_concurrent_calls(self, pool):
+        start = time.monotonic()
+        gts = [spawn(pool.execute, time.sleep, 0.1) for _ in range(4)]
+        for gt in gts:
+            gt.wait()
+
+        # the calls run concurrently in 4 threads
+        assert time.monotonic() - start < 0.35
+        assert len(pool.threads) == 4
+
+    def test_timeout(self, pool):
+        with pytest.raises(Timeout):
+            with Timeout(0.01):
+                pool.execute(time.sleep, 0.1)
+
+        # the pool still works after the abandoned call completes
+        assert pool.execute(lambda: 1) == 1
+
+    def test_stats(self, pool):
+        for _ in range(3):
+            pool.execute(time.sleep, 0.01)
+
+        stats = pool.stats()
+        assert stats['size'] == 4
+        assert stats['completed'] == 3
+        assert stats['busy'] == 0
+        assert stats['queue_depth'] == 0
+        assert stats['mean_run_time'] >= 0.01
+        assert stats['max_latency'] >= stats['mean_run_time']
+
+    def test_shared_by_hubs(self, pool):
+        """The pool can be used by the hubs of several threads at once
+        """
+        def run():
+            gts = [spawn(pool.execute, abs, -i) for i in range(200)]
+            for gt in gts:
+                gt.wait()
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        assert stats['completed'] == 800
+        assert stats['busy'] == 0
+        assert len(pool.threads) <= pool.size
+
+
+def test_default_pool():
+    assert tpool.execute(sum, [1, 2, 3]) == 6
+    assert tpool.stats()['completed'] >= 1
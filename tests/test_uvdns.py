@@ -0,0 +1,71 @@
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from guv import spawn
+from guv.support import uvdns
+
+
+class TestUVDNS:
+    def test_getaddrinfo(self):
+        expected = socket.getaddrinfo('localhost', 80, 0, socket.SOCK_STREAM)
+        assert uvdns.getaddrinfo('localhost', 80, 0, socket.SOCK_STREAM) == expected
+
+    def test_getaddrinfo_numeric(self):
+        result = uvdns.getaddrinfo('127.0.0.1', 'http', socket.AF_INET, socket.SOCK_STREAM)
+        assert result == [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 80))]
+
+    def test_getaddrinfo_error(self):
+        with pytest.raises(socket.gaierror) as exc_info:
+            uvdns.getaddrinfo('nonexistent.invalid', 80)
+
+        assert exc_info.value.errno in (socket.EAI_NONAME, socket.EAI_AGAIN)
+
+    def test_error_thread_pool(self, monkeypatch, capsys):
+        # errors are raised to the caller only, without being printed by the hub
+        monkeypatch.setattr(uvdns, 'pyuv_cffi', None)
+        with pytest.raises(socket.gaierror):
+            uvdns.getaddrinfo('nonexistent.invalid', 80)
+
+        assert 'Traceback' not in capsys.readouterr().err
+
+    def test_gethostbyname(self):
+        assert uvdns.gethostbyname('localhost') == socket.gethostbyname('localhost')
+        assert uvdns.gethostbyname_ex('localhost')[2] == socket.gethostbyname_ex('localhost')[2]
+
+    def test_getnameinfo(self):
+        assert uvdns.getnameinfo(('127.0.0.1', 80), 0) == socket.getnameinfo(('127.0.0.1', 80), 0)
+        flags = socket.NI_NUMERICHOST | socket.NI_NUMERICSERV
+        assert uvdns.getnameinfo(('::1', 22, 0, 0), flags) == ('::1', '22')
+
+        with pytest.raises(socket.gaierror):
+            uvdns.getnameinfo(('localhost', 80), 0)
+
+    def test_concurrent(self):
+        threads = [spawn(uvdns.getaddrinfo, 'localhost', port) for port in range(100)]
+        for port, gt in enumerate(threads):
+            assert gt.wait()[0][4][1] == port
+
+    def test_without_libuv(self):
+        # if neither libuv nor greendns can be imported, guv falls back to this resolver, which
+        # then uses tpool
+        code = '\n'.join([
+            "import sys",
+            "sys.modules['pyuv_cffi'] = sys.modules['guv.support.greendns'] = None",
+            "import guv",
+            "from guv.green import socket",
+            "assert socket.dns_resolver == 'libuv'",
+            "assert guv.listen and guv.serve and guv.spawn",
+            "print(guv.spawn(socket.getaddrinfo, 'localhost', 80).wait()[0][4][1])",
+        ])
+        env = {k: v for k, v in os.environ.items()
+               if k not in ('GUV_HUB', 'GUV_DNS', 'GUV_NO_GREENDNS')}
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        result = subprocess.run([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+        assert b'Traceback' not in result.stderr
+        assert result.returncode == 0
+        assert result.stdout.split() == [b'80']
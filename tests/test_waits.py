@@ -0,0 +1,126 @@
+import io
+import socket
+
+import pytest
+
+from guv import spawn, sleep, Timeout
+from guv.event import Event
+from guv.greenio import socketpair
+from guv.hubs import get_hub
+from guv.queue import LightQueue
+from guv.semaphore import Semaphore
+from guv.util.waits import WaitProfiler
+
+
+def reader(sock):
+    sock.recv(1)
+
+
+def timed_out_reader(sock):
+    with Timeout(0.01, False):
+        sock.recv(1)
+
+
+def timed_out_socket_reader(sock):
+    sock.settimeout(0.01)
+    try:
+        sock.recv(1)
+    except socket.timeout:
+        pass
+    sock.settimeout(None)
+
+
+class TestWaitProfiler:
+    def test_reasons(self):
+        a, b = socketpair()
+        fd = a.fileno()
+        queue = LightQueue()
+        event = Event()
+        sem = Semaphore(0)
+        with WaitProfiler() as profiler:
+            gts = [spawn(reader, a), spawn(queue.get), spawn(event.wait), spawn(sem.acquire)]
+            sleep(0.05)
+            b.send(b'x')
+            queue.put(1)
+            event.send(1)
+            sem.release()
+            for gt in gts:
+                gt.wait()
+        a.close()
+        b.close()
+
+        reasons = {stats['reason']: stats for stats in profiler.reason_stats()}
+        assert set(reasons) >= {'read', 'sleep', 'queue get', 'event', 'lock'}
+        for reason in ['read', 'queue get', 'lock']:
+            assert reasons[reason]['count'] == 1
+            assert reasons[reason]['total'] >= 0.04
+        assert abs(sum(stats['share'] for stats in profiler.reason_stats()) - 1) < 1e-9
+
+        fd_stats, = profiler.fd_stats()
+        assert fd_stats['fd'] == fd
+        assert fd_stats['reason'] == 'read'
+
+    def test_call_site(self):
+        a, b = socketpair()
+        with WaitProfiler() as profiler:
+            gt = spawn(reader, a)
+            sleep(0.01)
+            b.send(b'x')
+            gt.wait()
+        a.close()
+        b.close()
+
+        stats, = [stats for stats in profiler.stats() if stats['reason'] == 'read']
+        assert stats['site'].startswith('reader ({}:'.format(__file__))
+        assert stats['buckets'][-1] == (None, 0)
+        assert sum(count for _, count in stats['buckets']) == 1
+
+        out = io.StringIO()
+        profiler.write_collapsed(out)
+        line, = [line for line in out.getvalue().splitlines() if line.startswith('main (')]
+        stack, us = line.rsplit(' ', 1)
+        frames = stack.split(';')
+        assert len(frames) == 3
+        assert frames[1].startswith('reader (')
+        assert frames[2] == '[read]'
+        assert int(us) > 5000
+
+    def test_timeouts(self):
+        a, b = socketpair()
+        with WaitProfiler() as profiler:
+            spawn(timed_out_reader, a).wait()
+            spawn(timed_out_socket_reader, a).wait()
+            gt = spawn(reader, a)
+            sleep(0.01)
+            b.send(b'x')
+            gt.wait()
+        a.close()
+        b.close()
+
+        stats = {stats['site'].split(' ')[0]: stats for stats in profiler.stats()
+                 if stats['reason'] == 'read'}
+        assert stats['timed_out_reader']['timeouts'] == 1
+        assert stats['timed_out_socket_reader']['timeouts'] == 1
+        assert stats['reader']['timeouts'] == 0
+
+    def test_bounded(self):
+        profiler = WaitProfiler(max_entries=1)
+        with profiler:
+            sleep(0)
+            sleep(0)
+            sleep(0.001)
+        stats = profiler.stats()
+        assert len(stats) == 2
+        assert sum(s['count'] for s in stats) == 3
+        assert '<other>' in profiler.format_stats()
+
+    def test_start_stop(self):
+        profiler = WaitProfiler()
+        profiler.start()
+        with pytest.raises(RuntimeError):
+            WaitProfiler().start()
+        profiler.stop()
+        assert get_hub().wait_profiler is None
+
+        sleep(0)
+        assert not profiler.stats()
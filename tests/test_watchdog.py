@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+from guv import spawn, sleep
+from guv.hubs import get_hub
+from guv.util import debug
+from guv.util.watchdog import Watchdog
+
+
+def hog(seconds):
+    """Keep the hub busy without yielding
+    """
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestWatchdog:
+    def test_detects_blocking(self):
+        events = []
+        reports = []
+
+        def callback(event):
+            events.append(event)
+            reports.append(event.ended)
+
+        with Watchdog(0.05, callback) as watchdog:
+            spawn(hog, 0.3)
+            sleep(0.01)
+            sleep(0.05)
+
+        # reported once when detected, and once when it ended
+        assert watchdog.detected == 1
+        assert reports == [False, True]
+        event = events[0]
+        assert event is events[1]
+        assert 0.2 < event.duration < 0.5
+        assert 'hog' in [frame.name for frame in event.stack]
+        assert 'hog' in event.format()
+
+    def test_idle_hub_not_reported(self):
+        events = []
+        with Watchdog(0.02, events.append):
+            sleep(0.1)
+            for _ in range(10):
+                spawn(hog, 0.005)
+                sleep(0.01)
+
+        assert not events
+
+    def test_hub_blocking_detection(self, caplog):
+        debug.hub_blocking_detection(True, 0.05)
+        try:
+            with caplog.at_level(logging.WARNING, logger='guv'):
+                spawn(hog, 0.2)
+                sleep(0.01)
+                sleep(0.05)
+        finally:
+            debug.hub_blocking_detection(False)
+
+        messages = [r.getMessage() for r in caplog.records]
+        assert any('hog' in m for m in messages)
+        assert any(m.startswith('Hub was blocked for') for m in messages)
+        assert get_hub().watchdog is None
+
+    def test_stopped_with_hub(self):
+        """The watchdog started for the hub of a thread is stopped when the hub is closed
+        """
+        result = []
+
+        def run():
+            hub = get_hub()
+            debug.hub_blocking_detection(True, 0.05)
+            watchdog = hub.watchdog
+            sleep(0.01)
+            hub.close()
+            result.append((watchdog, hub.watchdog))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+        watchdog, hub_watchdog = result[0]
+        assert hub_watchdog is None
+        assert watchdog._thread is None